@@ -3,11 +3,16 @@ import os
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import upload_routes, extraction_routes, generate_routes
-from config import DATASET_DIR, EXTRACTION_DIR
-
-print("Current working directory:", os.getcwd())
-print("Python path before modification:", sys.path)
+from routes import upload_routes, extraction_routes, generate_routes, search_routes, fine_tune_routes, metrics_routes
+from config import STARTUP_WARMUP, METRICS_ENABLED
+from services.extraction_pool import shutdown_pool, start_warm_up
+from services.job_manager import job_manager
+from services.file_catalog import file_catalog
+from services.search_index import search_index
+from services.llm_service import close_client
+from services.model_registry import model_registry
+from services.fine_tuner import fine_tune_scheduler
+from utils.http_metrics import MetricsMiddleware
 
 # Add the current directory and its parent to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,8 +20,6 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, current_dir)
 sys.path.insert(0, parent_dir)
 
-print("Python path after modification:", sys.path)
-
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -26,23 +29,22 @@ app = FastAPI()
 
 @app.on_event("startup")
 async def startup_event():
-    print(f"DATASET_DIR: {DATASET_DIR}")
-    print(f"EXTRACTION_DIR: {EXTRACTION_DIR}")
-    print(f"DATASET_DIR exists: {os.path.exists(DATASET_DIR)}")
-    print(f"EXTRACTION_DIR exists: {os.path.exists(EXTRACTION_DIR)}")
-    print(f"Files in DATASET_DIR: {os.listdir(DATASET_DIR)}")
-    print(f"Files in EXTRACTION_DIR: {os.listdir(EXTRACTION_DIR)}")
-    
-    for file in os.listdir(DATASET_DIR):
-        file_path = os.path.join(DATASET_DIR, file)
-        print(f"File: {file}, Readable: {os.access(file_path, os.R_OK)}")
-        print(f"File size: {os.path.getsize(file_path)} bytes")
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                first_line = f.readline().strip()
-                print(f"First line of {file}: {first_line}")
-        except Exception as e:
-            print(f"Error reading {file}: {str(e)}")
+    job_manager.restore()
+    fine_tune_scheduler.restore()
+    file_catalog.start_reconcile()
+    search_index.start()
+    model_registry.start()
+    if STARTUP_WARMUP:
+        start_warm_up()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    job_manager.shutdown()
+    fine_tune_scheduler.shutdown()
+    search_index.stop()
+    shutdown_pool()
+    await model_registry.stop()
+    await close_client()
 
 # Configure CORS
 app.add_middleware(
@@ -51,12 +53,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],  # Paginated endpoints report the full result size here
 )
+if METRICS_ENABLED:
+    # Added last, so it is the outermost middleware and times everything below it
+    app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(upload_routes.router, prefix="/api")
 app.include_router(extraction_routes.router, prefix="/api")
 app.include_router(generate_routes.router, prefix="/api")
+app.include_router(search_routes.router, prefix="/api")
+app.include_router(fine_tune_routes.router, prefix="/api")
+app.include_router(metrics_routes.router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -0,0 +1,87 @@
+"""Measure how long the backend takes to import and start, in fresh interpreters.
+
+Each run imports app.py, runs the startup handlers and serves one request in
+a new process, and checks that importing app.py did not import any of the
+heavy libraries meant to load on first use (spaCy, the Ollama client, the
+document readers). `--files` fills DATASET_DIR with small CSVs first;
+startup time should not depend on it. Exits non-zero when a heavy library is
+imported or the median import time is over `--max-import`, so it can run as
+a regression check. Run from the backend directory:
+
+    python benchmarks/bench_cold_start.py --runs 5 --files 2000 --max-import 1.5
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATASET_DIR
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (the Ollama client and httpx by the model registry's first background refresh), never on import
+DEFERRED_MODULES = ["spacy", "ollama", "httpx", "docx", "PyPDF4", "pdfplumber", "pypdfium2"]
+
+CHILD = """
+import sys, json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+loaded = [name for name in %r if name in sys.modules]
+from fastapi.testclient import TestClient
+client = TestClient(app.app)
+before_startup = time.perf_counter()
+with client:
+    ready = time.perf_counter()
+    client.get("/")
+    served = time.perf_counter()
+print(json.dumps({"import": imported - started, "startup": ready - before_startup,
+                  "first_request": served - ready, "loaded": loaded}))
+"""
+
+def run_once():
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD % (DEFERRED_MODULES,)], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--files", type=int, default=0, help="Dummy CSVs put in DATASET_DIR during the runs")
+    parser.add_argument("--max-import", type=float, default=None, help="Fail if the median import takes longer (s)")
+    args = parser.parse_args()
+
+    paths = [DATASET_DIR / f"bench_cold_start_{index}.csv" for index in range(args.files)]
+    for path in paths:
+        path.write_text("question,answer\nWhat?,That.\n", encoding='utf-8')
+    try:
+        runs = [run_once() for _ in range(args.runs)]
+    finally:
+        for path in paths:
+            path.unlink()
+
+    for phase in ("import", "startup", "first_request", "process"):
+        values = [run[phase] for run in runs]
+        print(f"{phase:>13}: median {statistics.median(values) * 1000:7.0f}ms, "
+              f"min {min(values) * 1000:7.0f}ms, max {max(values) * 1000:7.0f}ms")
+    loaded = sorted({name for run in runs for name in run["loaded"]})
+    failed = False
+    if loaded:
+        print(f"Imported by app.py but meant to load on first use: {', '.join(loaded)}")
+        failed = True
+    median_import = statistics.median(run["import"] for run in runs)
+    if args.max_import is not None and median_import > args.max_import:
+        print(f"Median import {median_import:.2f}s is over the {args.max_import:.2f}s limit")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure the dataset builder on synthetic extraction CSVs.
+
+Builds train/validation/test splits stratified by source and type, once
+streaming (hash split) and once with per-stratum reservoir caps, and
+reports throughput and peak Python memory (traced on a repeat run). Peak
+memory should stay flat as --rows grows. Run from the backend directory:
+
+    python benchmarks/bench_dataset_build.py --rows 200000 --files 4 --cap 2000
+"""
+import sys
+import os
+import csv
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXTRACTION_DIR
+from services.dataset_builder import build_dataset, split_paths, manifest_path
+
+SOURCES = [f"report_{index}.pdf" for index in range(20)]
+TYPES = ["fact", "procedure", "definition"]
+
+def write_source(path, n_rows, seed):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "answer", "source", "security classification", "type"])
+        for index in range(n_rows):
+            writer.writerow([f"What is item {index}?", f"Item {index} of batch {seed} is described here.",
+                             rng.choice(SOURCES), "UNCLASSIFIED", rng.choice(TYPES)])
+
+def remove_outputs(name):
+    for path in split_paths(name, ["train", "validation", "test"]).values():
+        path.unlink(missing_ok=True)
+        path.with_suffix('.arrow').unlink(missing_ok=True)
+    manifest_path(name).unlink(missing_ok=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000, help="Rows across all files")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--cap", type=int, default=2000, help="Per-stratum cap for the reservoir run")
+    args = parser.parse_args()
+
+    names = [f"bench_build_{index}.csv" for index in range(args.files)]
+    for index, name in enumerate(names):
+        write_source(EXTRACTION_DIR / name, args.rows // args.files, index)
+    try:
+        for label, cap in (("streaming", None), ("reservoir", args.cap)):
+            name = f"bench_build_{label}"
+            started = time.perf_counter()
+            manifest = build_dataset(name, names, stratify_by=["source", "type"], per_stratum_cap=cap)
+            elapsed = time.perf_counter() - started
+            remove_outputs(name)
+            # Memory is measured on a second run, since tracing slows the first one down several times
+            tracemalloc.start()
+            build_dataset(name, names, stratify_by=["source", "type"], per_stratum_cap=cap)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            counts = ", ".join(f"{split} {info['rows']}" for split, info in manifest["splits"].items())
+            print(f"{label}: {manifest['rows_seen']} rows in {elapsed:.2f}s "
+                  f"({manifest['rows_seen'] / elapsed:,.0f} rows/s), peak {peak / 2 ** 20:.1f} MiB; {counts}")
+            remove_outputs(name)
+    finally:
+        for name in names:
+            (EXTRACTION_DIR / name).unlink()
+
+if __name__ == "__main__":
+    main()
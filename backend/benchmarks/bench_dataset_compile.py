@@ -0,0 +1,74 @@
+"""Measure dataset compilation (tokenize + pack) on a synthetic question/answer CSV.
+
+Answers are sentence-sized, like the rows extraction produces, with a long
+tail of paragraph-sized ones. Reports tokenization and packing time, how
+full the packed sequences are against one padded sequence per example, and
+how long a repeat run takes from the cache. Run from the backend directory:
+
+    python benchmarks/bench_dataset_compile.py --rows 20000 --seq-len 512 2048
+"""
+import sys
+import os
+import csv
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import DATASET_DIR
+from services.dataset_compiler import compile_dataset, load_compiled, remove_compiled
+
+WORDS = ("sortie tanker airlift exercise logistics runway fuel maintenance squadron readiness "
+         "mission weather intelligence command support aircraft crew schedule").split()
+
+def write_dataset(path, n_rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "answer"])
+        for index in range(n_rows):
+            words = rng.randint(60, 400) if rng.random() < 0.1 else rng.randint(8, 40)
+            writer.writerow([f"What happened during event {index}?", " ".join(rng.choices(WORDS, k=words))])
+
+def check(index):
+    # Every example is intact and examples never overlap within a sequence
+    tokens, loss_mask, segments, _ = load_compiled(index["id"])
+    assert segments[:, 2].sum() == index["tokens"]
+    ends = segments[:, 1] + segments[:, 2]
+    same_sequence = segments[1:, 0] == segments[:-1, 0]
+    assert np.all(segments[1:, 1][same_sequence] >= ends[:-1][same_sequence])
+    assert int(loss_mask.sum()) == index["trainable_tokens"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seq-len", type=int, nargs="+", default=[512, 2048])
+    parser.add_argument("--tokenizer", default=None)
+    args = parser.parse_args()
+
+    name = "bench_compile.csv"
+    path = DATASET_DIR / name
+    write_dataset(path, args.rows)
+    try:
+        for seq_len in args.seq_len:
+            started = time.perf_counter()
+            index = compile_dataset(name, args.tokenizer, seq_len)
+            elapsed = time.perf_counter() - started
+            check(index)
+            started = time.perf_counter()
+            cached = compile_dataset(name, args.tokenizer, seq_len)
+            cached_elapsed = time.perf_counter() - started
+            print(f"seq_len {seq_len}: {args.rows} rows -> {index['sequences']} sequences in {elapsed:.2f}s "
+                  f"({args.rows / elapsed:,.0f} rows/s, {index['tokens'] / elapsed:,.0f} tokens/s)")
+            print(f"  filled {index['padding_efficiency']:.1%} packed vs {index['unpacked_padding_efficiency']:.1%} "
+                  f"one example per sequence; {index['truncated']} truncated")
+            print(f"  repeat run {cached_elapsed * 1000:.0f}ms (cached={cached['cached']})")
+            remove_compiled(index["id"])
+    finally:
+        path.unlink()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare per-fragment nlp() calls against the batched extraction engine.
+
+Run from the backend directory:
+
+    python benchmarks/bench_extraction_nlp.py --pages 200
+"""
+import sys
+import os
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+from config import SPACY_MODEL
+from services.extractor import clean_text, extract_fragments, get_nlp
+
+SUBJECTS = ["The squadron", "Each analyst", "The commander", "Our team", "The operator", "The report"]
+VERBS = ["reviewed", "approved", "documented", "collected", "described", "evaluated"]
+OBJECTS = ["the mission plan", "several maintenance logs", "the training schedule",
+           "new intelligence summaries", "the logistics request", "regional weather data"]
+TAILS = ["before the deadline", "during the exercise", "for the next quarter", "with great care"]
+
+def synthetic_pages(n_pages, sentences_per_page, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(1, n_pages + 1):
+        lines = [f"UNCLASSIFIED Page {page_number} of {n_pages}"]
+        for _ in range(sentences_per_page):
+            lines.append(f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(TAILS)}.")
+        pages.append("\n".join(lines))
+    return pages
+
+def legacy_extract(nlp, pages):
+    # The pre-engine flow: parse once for paragraphs, once for sentences and
+    # once more per fragment inside the filter.
+    def extract_paragraphs(text):
+        doc = nlp(text)
+        paragraphs, current = [], []
+        for sent in doc.sents:
+            current.append(sent.text.strip())
+            if sent.text.strip().endswith(('.', '!', '?')):
+                paragraphs.append(' '.join(current))
+                current = []
+        if current:
+            paragraphs.append(' '.join(current))
+        return paragraphs
+
+    def is_meaningful(text):
+        doc = nlp(text)
+        has_noun = any(token.pos_ == "NOUN" for token in doc)
+        has_verb = any(token.pos_ == "VERB" for token in doc)
+        text_chars = sum(1 for c in text if c.isalpha())
+        ratio = text_chars / len(text) if text else 0
+        return has_noun and has_verb and len(doc) > 5 and ratio > 0.7
+
+    paragraphs, sentences = [], []
+    for page in pages:
+        cleaned = clean_text(page)
+        paragraphs.extend(p for p in extract_paragraphs(cleaned) if is_meaningful(p))
+    for page in pages:
+        cleaned = clean_text(page)
+        sentences.extend(s.text.strip() for s in nlp(cleaned).sents if is_meaningful(s.text.strip()))
+    return paragraphs, sentences
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--sentences-per-page", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages, args.sentences_per_page)
+    full_nlp = spacy.load(SPACY_MODEL)
+    get_nlp()  # Load outside the timed region
+
+    start = time.perf_counter()
+    legacy = legacy_extract(full_nlp, pages)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = extract_fragments(pages, batch_size=args.batch_size, n_process=args.n_process)
+    batched_seconds = time.perf_counter() - start
+
+    print(f"Corpus: {args.pages} pages x {args.sentences_per_page} sentences")
+    print(f"before (per-fragment nlp): {legacy_seconds:8.2f}s  {args.pages / legacy_seconds:8.1f} pages/s  "
+          f"{len(legacy[0])} paragraphs, {len(legacy[1])} sentences")
+    print(f"after  (batched nlp.pipe): {batched_seconds:8.2f}s  {args.pages / batched_seconds:8.1f} pages/s  "
+          f"{len(batched[0])} paragraphs, {len(batched[1])} sentences")
+    print(f"speedup: {legacy_seconds / batched_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
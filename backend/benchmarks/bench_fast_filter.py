@@ -0,0 +1,86 @@
+"""Compare the "fast" extraction mode with the tagger-based spaCy filter.
+
+Reports throughput of both segmenters and how often the vectorized filter
+agrees with the spaCy noun/verb filter on the same candidate fragments.
+Needs en_core_web_sm installed. Run from the backend directory:
+
+    python benchmarks/bench_fast_filter.py --pages 200
+"""
+import sys
+import os
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.extractor import SEGMENTERS, clean_text, extract_fragments, is_meaningful_span, split_doc
+from services.text_quality import score_fragments
+
+from bench_extraction_nlp import synthetic_pages
+
+NOISE = [
+    "Table 4 2019 2020 2021 1,204 3,388 9,102",
+    "DISTRIBUTION STATEMENT A",
+    "Figure 12: Sortie rates by month",
+    "It is what it is and so it was for them.",
+    "Fuel, runway, hangar, tower, radar and ramp.",
+    "See also: Annex B, Annex C, Annex D.",
+]
+
+def noisy_pages(n_pages, sentences_per_page, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for page in synthetic_pages(n_pages, sentences_per_page, seed):
+        lines = page.split("\n")
+        for _ in range(max(1, sentences_per_page // 3)):
+            lines.insert(rng.randrange(1, len(lines) + 1), rng.choice(NOISE))
+        pages.append("\n".join(lines))
+    return pages
+
+def timed(pages, segmenter):
+    SEGMENTERS[segmenter].load()
+    start = time.perf_counter()
+    paragraphs, sentences = extract_fragments(pages, segmenter=segmenter)
+    return time.perf_counter() - start, len(paragraphs) + len(sentences)
+
+def agreement(pages):
+    # Judge the same candidate sentences with both filters
+    spacy_nlp = SEGMENTERS["spacy"].load()
+    sentencizer = SEGMENTERS["sentencizer"].load()
+    candidates = []
+    for doc in sentencizer.pipe(clean_text(page) for page in pages):
+        candidates.extend(span.text.strip() for span in split_doc(doc)[1])
+    spacy_keep = [is_meaningful_span(doc[:]) for doc in spacy_nlp.pipe(candidates)]
+    fast_keep = score_fragments(candidates)
+
+    both = sum(1 for s, f in zip(spacy_keep, fast_keep) if s and f)
+    agree = sum(1 for s, f in zip(spacy_keep, fast_keep) if s == bool(f))
+    precision = both / max(1, int(fast_keep.sum()))
+    recall = both / max(1, sum(spacy_keep))
+    return len(candidates), agree / max(1, len(candidates)), precision, recall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--sentences-per-page", type=int, default=12)
+    args = parser.parse_args()
+
+    if SEGMENTERS["spacy"].load() is None:
+        sys.exit("en_core_web_sm is required for the comparison; install it first.")
+
+    pages = noisy_pages(args.pages, args.sentences_per_page)
+    spacy_seconds, spacy_items = timed(pages, "spacy")
+    fast_seconds, fast_items = timed(pages, "fast")
+
+    print(f"Corpus: {args.pages} pages x {args.sentences_per_page} sentences plus noise lines")
+    print(f"spacy: {spacy_seconds:7.2f}s  {args.pages / spacy_seconds:9.1f} pages/s  {spacy_items} fragments kept")
+    print(f"fast:  {fast_seconds:7.2f}s  {args.pages / fast_seconds:9.1f} pages/s  {fast_items} fragments kept")
+    print(f"speedup: {spacy_seconds / fast_seconds:.1f}x")
+
+    total, agree, precision, recall = agreement(pages)
+    print(f"agreement with spaCy filter on {total} sentences: {agree:.1%} "
+          f"(precision {precision:.1%}, recall {recall:.1%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Load-test the chat and generate endpoints against the fake Ollama server.
+
+Starts benchmarks/fake_ollama.py and the API in-process, then has
+`--clients` concurrent clients send `--requests` chat/generate calls, a
+share of them streaming and a share abandoned early. At the same time a
+probe polls GET / to show whether slow generations hold up unrelated
+requests. Abandoned requests should show up as disconnected at the fake
+server, meaning the generation upstream was cancelled too. Run from the
+backend directory:
+
+    python benchmarks/bench_llm_load.py --clients 32 --requests 400 --parallel 4
+"""
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+from fake_ollama import create_app
+
+def start_server(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return f"p50 {pick(0.5):.0f}ms  p95 {pick(0.95):.0f}ms  max {samples[-1] * 1000:.0f}ms"
+
+async def one_request(client, rng, args, results):
+    kind = rng.choice(["chat", "generate"])
+    stream = rng.random() < args.stream_ratio
+    abandon = rng.random() < args.abandon_ratio
+    passage = f"Passage:\n{rng.randint(0, 10 ** 6)} sortie rates rose during the exercise"
+    url = f"/api/{'chat-with-model' if kind == 'chat' else 'generate-text'}/fake?stream={str(stream).lower()}"
+    body = {"messages": [{"role": "user", "content": passage}]} if kind == "chat" else {"prompt": passage}
+    started = time.perf_counter()
+    try:
+        if stream:
+            async with client.stream("POST", url, json=body) as response:
+                async for _ in response.aiter_text():
+                    if abandon:
+                        break
+        else:
+            await asyncio.wait_for(client.post(url, json=body), timeout=args.abandon_after if abandon else None)
+    except asyncio.TimeoutError:
+        pass
+    if abandon:
+        results["abandoned"] += 1
+    else:
+        results["stream" if stream else "plain"].append(time.perf_counter() - started)
+
+async def probe(client, stop, samples):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/")
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+async def drive(args, base_url):
+    rng = random.Random(0)
+    results = {"plain": [], "stream": [], "abandoned": 0}
+    probe_samples = []
+    limits = httpx.Limits(max_connections=args.clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, probe_samples))
+        slots = asyncio.Semaphore(args.clients)
+
+        async def limited():
+            async with slots:
+                await one_request(client, rng, args, results)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+    return results, probe_samples, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--parallel", type=int, default=4, help="Requests the fake server serves at once")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--abandon-ratio", type=float, default=0.1)
+    parser.add_argument("--abandon-after", type=float, default=0.05, help="Seconds before a plain request is abandoned")
+    parser.add_argument("--ollama-port", type=int, default=11435)
+    parser.add_argument("--api-port", type=int, default=8765)
+    args = parser.parse_args()
+
+    fake = create_app(args.parallel, args.token_delay)
+    start_server(fake, args.ollama_port)
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{args.ollama_port}"
+    from app import app
+    start_server(app, args.api_port)
+
+    results, probe_samples, elapsed = asyncio.run(drive(args, f"http://127.0.0.1:{args.api_port}"))
+    # Give the fake server a moment to notice the last disconnects
+    time.sleep(1)
+    completed = len(results["plain"]) + len(results["stream"])
+    print(f"{args.requests} requests from {args.clients} clients in {elapsed:.1f}s ({completed / elapsed:.1f} completed/s)")
+    print(f"  plain:  {len(results['plain']):>4}  {percentiles(results['plain'])}")
+    print(f"  stream: {len(results['stream']):>4}  {percentiles(results['stream'])}")
+    print(f"  abandoned by client: {results['abandoned']}")
+    print(f"  GET / while loaded ({len(probe_samples)} probes): {percentiles(probe_samples)}")
+    print(f"  fake Ollama: {fake.state.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure what the metrics instrumentation costs per request and per recorded value.
+
+Calls a minimal FastAPI app directly over ASGI (no network, no client), with
+and without MetricsMiddleware, and times the raw Counter.inc and
+Histogram.observe calls. Run from the backend directory:
+
+    python benchmarks/bench_metrics_overhead.py --requests 20000 --rounds 5
+"""
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from utils.metrics import Counter, Histogram, Registry
+from utils.http_metrics import MetricsMiddleware
+
+def make_app(instrumented):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+async def call(app, path):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+async def time_requests(app, n):
+    for index in range(100):
+        await call(app, f"/items/{index}")
+    started = time.perf_counter()
+    for index in range(n):
+        await call(app, f"/items/{index}")
+    return (time.perf_counter() - started) / n
+
+def time_calls(function, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        function()
+    return (time.perf_counter() - started) / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # Alternating rounds, best of each, to keep machine noise out of a difference of a few microseconds
+    apps = {False: make_app(False), True: make_app(True)}
+    best = {False: float('inf'), True: float('inf')}
+    for _ in range(args.rounds):
+        for instrumented, app in apps.items():
+            best[instrumented] = min(best[instrumented], asyncio.run(time_requests(app, args.requests)))
+    plain, instrumented = best[False], best[True]
+    print(f"request without metrics {plain * 1e6:7.1f}us, with metrics {instrumented * 1e6:7.1f}us "
+          f"(+{(instrumented - plain) * 1e6:.1f}us, {instrumented / plain - 1:+.1%})")
+
+    registry = Registry()
+    counter = Counter("bench_total", "Benchmark counter.", ["route"], registry=registry)
+    histogram = Histogram("bench_seconds", "Benchmark histogram.", ["route"], registry=registry)
+    n = args.requests * 10
+    print(f"Counter.inc {time_calls(lambda: counter.inc(route='/items/{item_id}'), n) * 1e6:.2f}us, "
+          f"Histogram.observe {time_calls(lambda: histogram.observe(0.02, route='/items/{item_id}'), n) * 1e6:.2f}us")
+
+if __name__ == "__main__":
+    main()
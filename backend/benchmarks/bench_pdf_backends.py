@@ -0,0 +1,83 @@
+"""Compare PDF text backends on generated PDFs: pages/sec and text fidelity.
+
+Run from the backend directory:
+
+    python benchmarks/bench_pdf_backends.py --pages 200
+"""
+import sys
+import os
+import time
+import random
+import difflib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pdf_backends import PDF_BACKENDS
+
+WORDS = ("mission logistics aircraft runway maintenance schedule analyst report weather "
+         "exercise training commander squadron fuel supply operator readiness review").split()
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one Helvetica text line per entry of each page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 11 Tf 14 TL 72 740 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+        xref_offset = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+def generated_pages(n_pages, lines_per_page, seed=0):
+    rng = random.Random(seed)
+    return [[" ".join(rng.choice(WORDS) for _ in range(10)).capitalize() + "." for _ in range(lines_per_page)]
+            for _ in range(n_pages)]
+
+def fidelity(expected_pages, extracted_pages):
+    expected = " ".join(" ".join(lines) for lines in expected_pages).split()
+    extracted = " ".join(extracted_pages).split()
+    return difflib.SequenceMatcher(None, expected, extracted, autojunk=False).ratio()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    args = parser.parse_args()
+
+    pages = generated_pages(args.pages, args.lines_per_page)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "generated.pdf")
+        write_pdf(pdf_path, pages)
+        print(f"Generated {args.pages} pages x {args.lines_per_page} lines ({os.path.getsize(pdf_path)} bytes)")
+        print(f"{'backend':<12} {'seconds':>8} {'pages/s':>9} {'fidelity':>9}")
+        for name, backend in PDF_BACKENDS.items():
+            if not backend.is_available():
+                print(f"{name:<12} {'not installed':>28}")
+                continue
+            start = time.perf_counter()
+            texts = backend.extract_pages(pdf_path)
+            seconds = time.perf_counter() - start
+            print(f"{name:<12} {seconds:8.2f} {len(texts) / seconds:9.1f} {fidelity(pages, texts):9.3f}")
+
+if __name__ == "__main__":
+    main()
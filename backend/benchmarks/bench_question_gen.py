@@ -0,0 +1,94 @@
+"""Run batch question generation against the fake Ollama server.
+
+Starts benchmarks/fake_ollama.py in-process, generates questions for a
+synthetic extraction CSV and reports rows/s, tokens/s and the concurrency
+the adaptive limiter settled on. With --interrupt-after the first run is
+cancelled after that many rows and a second run resumes from the
+checkpoint; the output is then checked row by row against the source.
+Run from the backend directory:
+
+    python benchmarks/bench_question_gen.py --rows 2000 --parallel 4 --interrupt-after 500
+"""
+import sys
+import os
+import csv
+import time
+import asyncio
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from services.question_gen import generate_questions
+from services.job_manager import JobCancelled
+
+from fake_ollama import create_app, fake_question
+from bench_extraction_nlp import synthetic_pages
+
+def start_server(port, parallel, token_delay, failure_rate):
+    config = uvicorn.Config(create_app(parallel, token_delay, failure_rate), host="127.0.0.1", port=port,
+                            log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def write_source(path, n_rows):
+    sentences = [line for page in synthetic_pages(n_rows // 10 + 1, 10) for line in page.split("\n")]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "answer", "source", "security classification", "type"])
+        for index in range(n_rows):
+            writer.writerow(["", f"{index} {sentences[index % len(sentences)]}", "bench.pdf", "UNCLASSIFIED", "sentence"])
+
+def run(source, output, host, max_concurrency, stop_after=None):
+    state = {}
+
+    def progress(**values):
+        state.update(values)
+
+    cancelled = (lambda: state.get("rows_done", 0) >= stop_after) if stop_after else None
+    try:
+        result = asyncio.run(generate_questions(source, output, "fake", host=host, max_concurrency=max_concurrency,
+                                                progress=progress, cancelled=cancelled))
+    except JobCancelled:
+        print(f"interrupted at row {state['rows_done']} (concurrency {state['concurrency']})")
+        return None
+    print(f"{result['rows']} rows ({result['rows'] - result['resumed_from']} this run) in "
+          f"{result['elapsed_seconds']}s: {result['rows_per_second']} rows/s, {result['tokens_per_second']} tokens/s, "
+          f"final concurrency {state['concurrency']}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--parallel", type=int, default=4, help="Requests the fake server serves at once")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--interrupt-after", type=int, default=None)
+    args = parser.parse_args()
+
+    start_server(args.port, args.parallel, args.token_delay, args.failure_rate)
+    host = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        source, output = Path(tmp) / "source.csv", Path(tmp) / "questions.csv"
+        write_source(source, args.rows)
+        if args.interrupt_after:
+            run(source, output, host, args.max_concurrency, stop_after=args.interrupt_after)
+        run(source, output, host, args.max_concurrency)
+
+        with open(source, newline='', encoding='utf-8') as f_in, open(output, newline='', encoding='utf-8') as f_out:
+            source_rows, output_rows = list(csv.DictReader(f_in)), list(csv.DictReader(f_out))
+        mismatched = sum(1 for a, b in zip(source_rows, output_rows)
+                         if b["answer"] != a["answer"] or b["question"] != fake_question(a["answer"]))
+        print(f"output rows: {len(output_rows)}/{len(source_rows)}, mismatched: {mismatched}")
+
+if __name__ == "__main__":
+    main()
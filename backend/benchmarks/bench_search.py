@@ -0,0 +1,69 @@
+"""Build a search index over a synthetic corpus and measure query latency.
+
+Run from the backend directory:
+
+    python benchmarks/bench_search.py --documents 10000
+"""
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.file_catalog import FileCatalog
+from services.search_index import SearchIndex
+
+WORDS = ("mission logistics aircraft runway maintenance schedule analyst report weather exercise training "
+         "commander squadron fuel supply operator readiness review airlift refuel hangar sortie convoy radar "
+         "inventory deployment briefing checklist inspection personnel ordnance satellite").split()
+RARE = ["aurora", "basilisk", "cobalt", "dervish", "ember", "falcon", "glacier", "harbinger"]
+
+def write_corpus(root: Path, n_documents, words_per_document, seed=0):
+    rng = random.Random(seed)
+    for number in range(n_documents):
+        folder = root / f"batch{number % 20:02d}"
+        folder.mkdir(exist_ok=True)
+        words = [rng.choice(WORDS) for _ in range(words_per_document)]
+        if rng.random() < 0.01:
+            words[rng.randrange(len(words))] = rng.choice(RARE)
+        (folder / f"doc{number:05d}.txt").write_text(" ".join(words), encoding='utf-8')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--words-per-document", type=int, default=400)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir) / "uploads"
+        root.mkdir()
+        write_corpus(root, args.documents, args.words_per_document)
+        catalog = FileCatalog(Path(tmp_dir) / "catalog.db", root)
+        index = SearchIndex(Path(tmp_dir) / "search.db", catalog)
+
+        start = time.perf_counter()
+        catalog.reconcile()
+        index.sync()
+        seconds = time.perf_counter() - start
+        print(f"Indexed {args.documents} documents in {seconds:.1f}s ({args.documents / seconds:.0f} docs/s)")
+
+        queries = ["aurora", "runway maintenance", '"fuel supply"', "sortie AND radar", "inspect*", "harbinger OR ember"]
+        print(f"{'query':<22} {'hits':>7} {'median ms':>10} {'p95 ms':>8}")
+        for query in queries:
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                total, _ = index.search(query, limit=20)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{query:<22} {total:>7} {statistics.median(timings):>10.1f} {p95:>8.1f}")
+
+if __name__ == "__main__":
+    main()
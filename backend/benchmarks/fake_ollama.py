@@ -0,0 +1,145 @@
+"""A stand-in for the Ollama HTTP API, for benchmarks and manual testing without a model.
+
+/api/generate and /api/chat reply after `--token-delay` seconds per
+generated token, with at most `--parallel` requests served at a time
+(Ollama's OLLAMA_NUM_PARALLEL); the rest queue. Both stream NDJSON unless
+"stream" is false. The reply is derived from the prompt's passage, so
+callers can check which prompt each reply belongs to. Requests mark their
+model loaded for their keep_alive (an empty prompt only loads it), which
+/api/ps reports. /stats counts requests and how many ended because the
+client went away. Run from the
+backend directory:
+
+    python benchmarks/fake_ollama.py --port 11435 --parallel 4
+"""
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+def passage_of(prompt):
+    return prompt.rsplit("Passage:\n", 1)[-1]
+
+def fake_question(passage):
+    return f"What about {' '.join(passage.split()[:4])}?"
+
+def create_app(parallel=4, token_delay=0.002, failure_rate=0.0, seed=0):
+    app = FastAPI()
+    slots = asyncio.Semaphore(parallel)
+    rng = random.Random(seed)
+    stats = app.state.stats = {"requests": 0, "active": 0, "completed": 0, "disconnected": 0}
+    loaded = app.state.loaded = {}  # model -> unload time (None: kept until told otherwise)
+
+    def keep_loaded(model, keep_alive):
+        if keep_alive is None:
+            keep_alive = "5m"
+        if isinstance(keep_alive, str):
+            keep_alive = float(keep_alive[:-1]) * {"s": 1, "m": 60, "h": 3600}[keep_alive[-1]]
+        if keep_alive == 0:
+            loaded.pop(model, None)
+        else:
+            loaded[model] = None if keep_alive < 0 else time.time() + keep_alive
+
+    def chunk(kind, body, content, done, **extra):
+        data = {"model": body.get("model"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done, **extra}
+        if kind == "chat":
+            data["message"] = {"role": "assistant", "content": content}
+        else:
+            data["response"] = content
+        return data
+
+    def durations(started, prompt, eval_count):
+        return {"total_duration": int((time.monotonic() - started) * 1e9), "load_duration": 0,
+                "prompt_eval_count": len(prompt.split()), "eval_count": eval_count,
+                "eval_duration": int(eval_count * token_delay * 1e9)}
+
+    async def stream_reply(kind, body, prompt, words, eval_count):
+        started = time.monotonic()
+        finished = False
+        try:
+            async with slots:
+                stats["active"] += 1
+                try:
+                    for index, word in enumerate(words):
+                        await asyncio.sleep(eval_count * token_delay / len(words))
+                        yield json.dumps(chunk(kind, body, word if index == 0 else " " + word, False)) + "\n"
+                finally:
+                    stats["active"] -= 1
+            yield json.dumps(chunk(kind, body, "", True, **durations(started, prompt, eval_count))) + "\n"
+            finished = True
+        finally:
+            stats["completed" if finished else "disconnected"] += 1
+
+    async def reply(request, kind):
+        body = await request.json()
+        stats["requests"] += 1
+        if rng.random() < failure_rate:
+            return JSONResponse(content={"error": "server busy"}, status_code=503)
+        keep_loaded(body.get("model"), body.get("keep_alive"))
+        prompt = body.get("prompt", "") if kind == "generate" else (body.get("messages") or [{}])[-1].get("content", "")
+        if not prompt:
+            return chunk(kind, body, "", True, load_duration=0)
+        words = fake_question(passage_of(prompt)).split()
+        eval_count = rng.randint(12, 30)
+        if body.get("stream", True):
+            return StreamingResponse(stream_reply(kind, body, prompt, words, eval_count),
+                                     media_type="application/x-ndjson")
+        started = time.monotonic()
+        async with slots:
+            stats["active"] += 1
+            try:
+                for _ in words:
+                    await asyncio.sleep(eval_count * token_delay / len(words))
+                    if await request.is_disconnected():
+                        stats["disconnected"] += 1
+                        return Response(status_code=499)
+            finally:
+                stats["active"] -= 1
+        stats["completed"] += 1
+        return chunk(kind, body, " ".join(words), True, **durations(started, prompt, eval_count))
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "fake:latest", "model": "fake:latest", "size": 0, "digest": "0" * 64}]}
+
+    @app.get("/api/ps")
+    async def ps():
+        now = time.time()
+        return {"models": [{"name": model, "model": model, "size": 0, "size_vram": 0, "digest": "0" * 64,
+                            "expires_at": "never" if expires is None else time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires))}
+                           for model, expires in loaded.items() if expires is None or expires > now]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return await reply(request, "generate")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await reply(request, "chat")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    import uvicorn
+    uvicorn.run(create_app(args.parallel, args.token_delay, args.failure_rate), host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -24,25 +24,135 @@ for dir_path in [UPLOAD_DIR, DATASET_DIR, EXTRACTION_DIR, OUTPUT_DIR, LOG_DIR]:
 MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100 MB
 ALLOWED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 
-print(f"DATASET_DIR: {DATASET_DIR}")  # Add this line for debugging
-print(f"EXTRACTION_DIR: {EXTRACTION_DIR}")  # Add this line for debugging
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+# Resumable uploads: sessions (metadata + partial data) and how long an idle one is kept
+UPLOAD_SESSION_DIR = DATA_DIR / "upload_sessions"
+UPLOAD_SESSION_TTL = 24 * 60 * 60  # seconds
+RESUMABLE_MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB
 
-print(f"UPLOAD_DIR: {UPLOAD_DIR}")
-print(f"OUTPUT_DIR: {OUTPUT_DIR}")
-print(f"LOG_DIR: {LOG_DIR}")
+# SQLite catalog of uploaded files and folders, reconciled with the disk at startup
+FILE_CATALOG_PATH = DATA_DIR / "catalog.db"
 
-for dir_path in [UPLOAD_DIR, DATASET_DIR, EXTRACTION_DIR, OUTPUT_DIR, LOG_DIR]:
-    print(f"{dir_path} exists: {dir_path.exists()}")
-    if dir_path.exists():
-        print(f"Contents of {dir_path}: {os.listdir(dir_path)}")
+# Full-text search index (SQLite FTS5) over uploaded documents, built in the background
+SEARCH_INDEX_PATH = DATA_DIR / "search.db"
+SEARCH_PDF_BACKEND = "pypdfium2"  # Preferred PDF backend for indexing; the rest of the chain is the fallback
+
+# Bulk downloads are zipped on the fly; these already compressed formats are
+# stored as-is rather than deflated again (use an empty set to deflate everything)
+ZIP_STORE_EXTENSIONS = {".pdf", ".docx"}
+ZIP_CHUNK_SIZE = 1024 * 1024  # 1 MB read per step while streaming an archive
+
+# Load the extraction segmenter (spaCy model) in the background at startup, in
+# each pool worker, instead of on the first extraction request. Off by default
+# so the server comes up without paying for it, e.g. STARTUP_WARMUP=1
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+
+# spaCy extraction pipeline
+SPACY_MODEL = "en_core_web_sm"
+SPACY_BATCH_SIZE = 32  # Pages handed to nlp.pipe per batch
+SPACY_N_PROCESS = 1  # Processes used by nlp.pipe
+DEFAULT_SEGMENTER = "spacy"  # "spacy" (tagger + parser), "sentencizer", "fast" or "regex"
+
+# Worker processes for multi-file extraction; 0 runs everything in-process
+EXTRACTION_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+CSV_FLUSH_ROWS = 1000  # Extracted rows buffered before each write to disk
+ARROW_OUTPUT = True  # Also write <name>.arrow (Arrow IPC) next to each extracted CSV; needs pyarrow
+
+# Duplicate removal across the fragments of an extraction request: "near"
+# (exact hash + MinHash/LSH over word shingles), "exact" or "off"
+DEDUP_MODE = "near"
+DEDUP_THRESHOLD = 0.8  # Estimated Jaccard similarity of word shingles at which two fragments are duplicates
+DEDUP_NUM_PERM = 64  # MinHash signature length
+DEDUP_BANDS = 16  # LSH bands; more bands find more candidate pairs (DEDUP_NUM_PERM must be a multiple)
+DEDUP_SHINGLE_SIZE = 3  # Words per shingle
+DEDUP_BATCH_ROWS = 2048  # Rows hashed per vectorized batch
+
+# PDF text backends, tried in order until one finds text ("pdfplumber", "pypdfium2", "pypdf4").
+# pypdfium2 is several times faster than pdfplumber's layout analysis.
+PDF_BACKEND_CHAIN = ["pdfplumber", "pypdfium2", "pypdf4"]
+PDF_PAGES_PER_TASK = 50  # PDFs longer than this are split into page ranges across workers
+
+# Content-addressed cache of per-document extraction results
+EXTRACTION_CACHE_DIR = DATA_DIR / "cache" / "extraction"
+EXTRACTION_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB, least recently used entries evicted first
+
+# Row-offset indexes for seekable CSV previews, rebuilt when a CSV's size or mtime changes
+CSV_INDEX_DIR = DATA_DIR / "cache" / "csv_index"
+
+# Background jobs
+JOB_WORKERS = 2  # Jobs that may run at the same time
+JOB_JOURNAL_PATH = LOG_DIR / "jobs.jsonl"
+
+# Ollama server
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# Chat/generate client: one pooled keep-alive connection set shared by all requests
+LLM_MAX_CONNECTIONS = 32
+LLM_MODEL_CONCURRENCY = 4  # Requests per model sent to Ollama at once; the rest wait their turn
+LLM_CONNECT_TIMEOUT = 5.0  # Seconds
+LLM_REQUEST_TIMEOUT = 300.0  # Seconds without any data from Ollama; each streamed token resets it
+LLM_DISCONNECT_POLL_INTERVAL = 0.5  # How often a waiting request checks whether its client went away
+LLM_KEEP_ALIVE = None  # How long Ollama keeps a model loaded after a request (e.g. "30m"); None is Ollama's default (5m)
+
+# Model registry: Ollama's models merged with the local .modelfile/.gguf files, refreshed in the background
+MODEL_REGISTRY_POLL_INTERVAL = 5  # Seconds between checks of the model directory for added/changed files
+MODEL_REGISTRY_TTL = 60  # Seconds between refreshes of Ollama's model list (digests, loaded models)
+# Models loaded at startup and kept in memory (keep_alive -1), e.g. PINNED_MODELS=mage,llama3
+PINNED_MODELS = [name.strip() for name in os.getenv("PINNED_MODELS", "").split(",") if name.strip()]
+
+# Opt-in cache of deterministic (temperature 0 or seeded) chat/generate replies
+LLM_CACHE_DIR = DATA_DIR / "cache" / "llm_responses"
+LLM_CACHE_MEMORY_ENTRIES = 256  # Most recently used replies kept in memory; older ones spill to disk
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB on disk, least recently used entries evicted first
+LLM_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+
+# Dataset builder: train/validation/test splits sampled from extraction CSVs in one pass
+BUILD_DEFAULT_SPLITS = {"train": 0.8, "validation": 0.1, "test": 0.1}
+BUILD_MAX_STRATA = 10000  # Distinct strata allowed; guards against stratifying on a free-text column
+
+# Dataset compilation: rows are tokenized, put through the chat template and packed into
+# fixed-length sequences; results are cached by dataset content, tokenizer and options
+COMPILED_DATASET_DIR = DATA_DIR / "compiled_datasets"
+TOKENIZER_DIR = BASE_DIR / "models" / "tokenizers"  # <name>/tokenizer.json (Hugging Face tokenizers format), read offline
+DEFAULT_TOKENIZER = "byte"  # Built-in UTF-8 byte tokenizer, needs no files
+COMPILE_SEQ_LEN = 2048  # Tokens per packed sequence
+COMPILE_BATCH_ROWS = 1024  # Rows tokenized per batch
+COMPILE_OVERFLOW = "truncate"  # Examples longer than a sequence: "truncate" or "drop"
+# Only the response part counts towards the loss; fields are the dataset's columns
+CHAT_TEMPLATE = {
+    "prompt": "<|user|>\n{question}\n<|assistant|>\n",
+    "response": "{answer}",
+}
+
+# Fine-tuning runs: queued by priority against these budgets (what each job declares,
+# not measured use), each trainer in its own subprocess
+FINE_TUNE_JOURNAL_PATH = LOG_DIR / "fine_tune_jobs.jsonl"
+FINE_TUNE_CPU_BUDGET = os.cpu_count() or 1  # CPUs the running trainers may declare in total
+FINE_TUNE_MEMORY_BUDGET_MB = 8192  # Memory the running trainers may declare in total; a trainer over its own share is stopped
+FINE_TUNE_NICE = 10  # Niceness of trainer processes, so training doesn't starve the API
+FINE_TUNE_STOP_TIMEOUT = 30  # Seconds a stopped trainer gets to write a checkpoint before it is killed
+FINE_TUNE_MONITOR_INTERVAL = 2.0  # Seconds between memory checks of running trainers
+FINE_TUNE_METRICS_KEPT = 5000  # Most recent metrics events per job kept in memory (all are in the run's metrics.jsonl)
+# Trainer name -> module run as `python -m <module> --config <run_config.json>`
+FINE_TUNE_TRAINERS = {"tiny": "services.tiny_trainer"}
+
+# Batch question generation for extracted CSVs
+QUESTION_GEN_MAX_CONCURRENCY = 8  # Upper bound on in-flight requests; the actual limit adapts to latency
+QUESTION_GEN_MIN_CONCURRENCY = 1
+QUESTION_GEN_TIMEOUT = 120  # Seconds per request
+QUESTION_GEN_RETRIES = 3  # Attempts per row on connection errors, 429 and 5xx
+QUESTION_GEN_CHECKPOINT_INTERVAL = 5.0  # Seconds between checkpoints of the partial output
+QUESTION_GEN_PROMPT = (
+    "Write one question that is answered by the following passage. "
+    "Reply with the question only.\n\nPassage:\n{answer}"
+)
+
+# Prometheus-format metrics at /api/metrics: request latency, extraction stage
+# timings, transfer throughput, Ollama latency and tokens, queue depths
+METRICS_ENABLED = True
+METRICS_TRANSFER_MIN_BYTES = 256 * 1024  # Smaller bodies are too quick for a meaningful bytes/sec
 
-# Add this line to the file
 BASE_MODELS_DIR = BASE_DIR / "models" / "base_models"
-BASE_MODELS_DIR.mkdir(parents=True, exist_ok=True)  # Create the directory if it doesn't exist
-
-print(f"BASE_MODELS_DIR: {BASE_MODELS_DIR}")
-print(f"BASE_MODELS_DIR exists: {BASE_MODELS_DIR.exists()}")
-if BASE_MODELS_DIR.exists():
-    print(f"Contents of BASE_MODELS_DIR: {list(BASE_MODELS_DIR.glob('*'))}")
-else:
-    print("BASE_MODELS_DIR does not exist")
\ No newline at end of file
+BASE_MODELS_DIR.mkdir(parents=True, exist_ok=True)
+FINE_TUNED_MODELS_DIR = BASE_DIR / "models" / "fine_tuned_models"  # One directory per fine-tuning run
+FINE_TUNED_MODELS_DIR.mkdir(parents=True, exist_ok=True)
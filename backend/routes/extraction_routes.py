@@ -2,27 +2,21 @@ import sys
 import os
 import csv
 from datetime import datetime
-import re
-import spacy
-import pdfplumber
-from docx import Document
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from fastapi.responses import JSONResponse
-from config import UPLOAD_DIR, EXTRACTION_DIR, DATASET_DIR
+from config import EXTRACTION_DIR, DATASET_DIR
 import logging
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
-from utils.file_utils import get_file_security_classification
-import itertools
-
-try:
-    import spacy
-    nlp = spacy.load("en_core_web_sm")
-except ImportError:
-    print("spaCy or its English model not found. Some features may not work as expected.")
-    spacy = None
-    nlp = None
+from services.extraction_jobs import EXTRACTION_JOB
+from services.job_manager import job_manager, COMPLETED
+from services.extraction_cache import extraction_cache
+from services.pdf_backends import PDF_BACKENDS
+from services.extractor import SEGMENTERS, FORMAT_HANDLERS, EXTRACTION_MODES
+from services import dataset_store
+from services.dedup import DEDUP_MODES
+from utils.csv_index import csv_row_index
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,163 +26,78 @@ router = APIRouter()
 class ExtractionRequest(BaseModel):
     filenames: List[str]
     csv_filename: str
-
-def extract_text_with_layout(file_path):
-    _, ext = os.path.splitext(file_path)
-    if ext.lower() == '.pdf':
-        return extract_from_pdf(file_path)
-    elif ext.lower() == '.docx':
-        return extract_from_docx(file_path)
-    elif ext.lower() == '.txt':
-        return extract_from_txt(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {ext}")
-
-def extract_from_pdf(file_path):
-    extracted_content = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                extracted_content.append(text)
-    return extracted_content
-
-def extract_from_docx(file_path):
-    doc = Document(file_path)
-    extracted_content = []
-    for para in doc.paragraphs:
-        if para.text.strip():
-            extracted_content.append(para.text.strip())
-    return extracted_content
-
-def extract_from_txt(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
-    return [content]
-
-def extract_paragraphs(text):
-    if nlp:
-        doc = nlp(text)
-        paragraphs = []
-        current_paragraph = []
-        for sent in doc.sents:
-            current_paragraph.append(sent.text.strip())
-            if sent.text.strip().endswith('.') or sent.text.strip().endswith('!') or sent.text.strip().endswith('?'):
-                paragraphs.append(' '.join(current_paragraph))
-                current_paragraph = []
-        if current_paragraph:
-            paragraphs.append(' '.join(current_paragraph))
-        return paragraphs
-    else:
-        return text.split('\n\n')
-
-def extract_sentences(text):
-    if nlp:
-        doc = nlp(text)
-        return [sent.text.strip() for sent in doc.sents]
-    else:
-        return re.split(r'(?<=[.!?])\s+', text)
-
-def is_meaningful_text(text):
-    if nlp:
-        doc = nlp(text)
-        has_noun = any(token.pos_ == "NOUN" for token in doc)
-        has_verb = any(token.pos_ == "VERB" for token in doc)
-        is_long_enough = len(doc) > 5
-        text_chars = sum(1 for c in text if c.isalpha())
-        total_chars = len(text)
-        text_ratio = text_chars / total_chars if total_chars > 0 else 0
-        return has_noun and has_verb and is_long_enough and text_ratio > 0.7
-    else:
-        words = text.split()
-        return len(words) > 5 and any(word.isalpha() for word in words)
-
-def clean_text(text):
-    # Remove headers, footers, and page numbers
-    cleaned_text = re.sub(r'^.*?Page \d+.*?$', '', text, flags=re.MULTILINE)
-    # Remove extra whitespace
-    cleaned_text = ' '.join(cleaned_text.split())
-    return cleaned_text
+    use_cache: bool = True
+    pdf_backend: Optional[str] = None  # Preferred PDF text backend; falls back along PDF_BACKEND_CHAIN
+    segmenter: Optional[str] = None  # "spacy", "sentencizer", "fast" or "regex"; overrides mode
+    mode: str = "full"  # "full" (tagger-based filter) or "fast" (sentencizer + vectorized filter)
+    dedup: Optional[str] = None  # "near", "exact" or "off"; defaults to DEDUP_MODE
+    dedup_against_datasets: bool = False  # Also drop rows already present in the training datasets
 
 @router.post("/extract/")
 async def extract_file_content(request: ExtractionRequest):
-    results = []
-    extracted_content = []
-
-    for filename in request.filenames:
-        try:
-            file_path = Path(UPLOAD_DIR) / filename
-            if not file_path.exists():
-                results.append({"filename": filename, "status": "File not found"})
-                continue
-
-            # Extract content with layout information
-            raw_content = extract_text_with_layout(str(file_path))
-            logger.info(f"Raw content extracted from {filename}: {len(raw_content)} items")
-
-            # Get the security classification for this file
-            security_classification = get_file_security_classification(filename)
-
-            # First pass: Extract paragraphs
-            for content in raw_content:
-                cleaned_content = clean_text(content)
-                paragraphs = extract_paragraphs(cleaned_content)
-                for para in paragraphs:
-                    if is_meaningful_text(para):
-                        extracted_content.append({
-                            "answer": para,
-                            "source": filename,
-                            "security_classification": security_classification,
-                            "type": "paragraph"
-                        })
-
-            # Second pass: Extract sentences
-            for content in raw_content:
-                cleaned_content = clean_text(content)
-                sentences = extract_sentences(cleaned_content)
-                for sentence in sentences:
-                    if is_meaningful_text(sentence):
-                        extracted_content.append({
-                            "answer": sentence,
-                            "source": filename,
-                            "security_classification": security_classification,
-                            "type": "sentence"
-                        })
-
-            results.append({"filename": filename, "status": "Content extracted successfully"})
-        except Exception as e:
-            logger.error(f"Error extracting content from {filename}: {str(e)}")
-            results.append({"filename": filename, "status": f"Error: {str(e)}"})
-
-    logger.info(f"Total extracted items: {len(extracted_content)}")
-
-    # Create CSV file
-    current_date = datetime.now().strftime('%Y%m%d_%H%M%S')
-    csv_filename = f"{request.csv_filename}_{current_date}.csv"
-    csv_path = Path(EXTRACTION_DIR) / csv_filename
-    csv_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-        csv_writer = csv.writer(csvfile)
-        csv_writer.writerow(["question", "answer", "source", "security classification", "type"])
-        for item in extracted_content:
-            csv_writer.writerow([
-                "",  # question (empty for now)
-                item["answer"],
-                item["source"],
-                item["security_classification"],
-                item["type"]
-            ])
-
-    logger.info(f"CSV file created: {csv_path}")
-
+    if request.pdf_backend is not None and request.pdf_backend not in PDF_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown PDF backend: {request.pdf_backend}")
+    if request.segmenter is not None and request.segmenter not in SEGMENTERS:
+        raise HTTPException(status_code=400, detail=f"Unknown segmenter: {request.segmenter}")
+    if request.mode not in EXTRACTION_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown extraction mode: {request.mode}")
+    if request.dedup is not None and request.dedup not in DEDUP_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown dedup mode: {request.dedup}")
+    params = request.dict()
+    params["segmenter"] = request.segmenter or EXTRACTION_MODES[request.mode]
+    # The work runs on a background job; the client polls /extract/jobs/{job_id}
+    job = job_manager.submit(EXTRACTION_JOB, params)
+    return JSONResponse(content={
+        "status": "Extraction job queued",
+        "job_id": job["id"]
+    }, status_code=202)
+
+@router.get("/extract/jobs/")
+async def list_extraction_jobs():
+    return JSONResponse(content=job_manager.list(EXTRACTION_JOB), status_code=200)
+
+@router.get("/extract/jobs/{job_id}")
+async def get_extraction_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    return JSONResponse(content=job, status_code=200)
+
+@router.post("/extract/jobs/{job_id}/cancel")
+async def cancel_extraction_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    return JSONResponse(content=job, status_code=200)
+
+@router.get("/extract/jobs/{job_id}/result")
+async def get_extraction_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    if job["status"] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Extraction job is {job['status']}")
+    return JSONResponse(content=job["result"], status_code=200)
+
+@router.get("/extract/options/")
+async def list_extraction_options():
     return JSONResponse(content={
-        "status": "Extraction process completed",
-        "results": results,
-        "csv_file": str(csv_path.name),
-        "extracted_items_count": len(extracted_content)
+        "formats": sorted(FORMAT_HANDLERS),
+        "segmenters": list(SEGMENTERS),
+        "modes": list(EXTRACTION_MODES),
+        "dedup_modes": list(DEDUP_MODES),
+        "pdf_backends": [{"name": name, "available": backend.is_available()} for name, backend in PDF_BACKENDS.items()]
     }, status_code=200)
 
+@router.get("/extract/cache/stats")
+async def get_extraction_cache_stats():
+    return JSONResponse(content=extraction_cache.stats(), status_code=200)
+
+@router.delete("/extract/cache/")
+async def clear_extraction_cache():
+    extraction_cache.clear()
+    return JSONResponse(content={"message": "Extraction cache cleared"}, status_code=200)
+
 @router.get("/csv-files/")
 async def get_csv_files():
     try:
@@ -198,7 +107,8 @@ async def get_csv_files():
                 file_path = os.path.join(EXTRACTION_DIR, f)
                 csv_files.append({
                     "name": f,
-                    "created_at": datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
+                    "created_at": datetime.fromtimestamp(os.path.getctime(file_path)).isoformat(),
+                    "has_arrow": dataset_store.fresh_arrow_path(file_path) is not None
                 })
         logger.info(f"CSV files found: {csv_files}")
         logger.info(f"EXTRACTION_DIR: {EXTRACTION_DIR}")
@@ -207,21 +117,24 @@ async def get_csv_files():
         logger.error(f"Error fetching CSV files: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching CSV files: {str(e)}")
 
+# Plain def: the first preview of a new or changed CSV scans the whole file for
+# its row index, so FastAPI runs it in the threadpool, off the event loop
 @router.get("/csv-preview/{filename}")
-async def get_csv_preview(filename: str, rows: int = 1000):  # Default to 1000 rows, but allow it to be configurable
+def get_csv_preview(filename: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=0),
+                    columns: Optional[str] = None, rows: int = Query(1000, ge=0)):
+    # `rows` is the original page size parameter; `limit` takes precedence
+    file_path = Path(EXTRACTION_DIR) / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="CSV file not found")
+    selected = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
     try:
-        file_path = Path(EXTRACTION_DIR) / filename
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="CSV file not found")
-        
-        with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-            csv_reader = csv.DictReader(csvfile)
-            data = list(itertools.islice(csv_reader, rows))  # Use itertools.islice for efficiency
-        
-        return JSONResponse(content=data, status_code=200)
-    except Exception as e:
-        logger.error(f"Error fetching CSV preview for {filename}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error fetching CSV preview: {str(e)}")
+        total, data = dataset_store.preview_rows(file_path, offset, rows if limit is None else limit, selected)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown column(s): {e.args[0]}")
+    except (csv.Error, UnicodeDecodeError) as e:
+        logger.error(f"Error reading CSV file {filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading CSV file: {str(e)}")
+    return JSONResponse(content=data, status_code=200, headers={"X-Total-Count": str(total)})
 
 @router.post("/rename-csv/")
 async def rename_csv_file(request: dict = Body(...)):
@@ -242,6 +155,10 @@ async def rename_csv_file(request: dict = Body(...)):
     
     try:
         old_path.rename(new_path)
+        # Keep the Arrow sibling paired with its CSV
+        if dataset_store.arrow_path_for(old_path).exists():
+            dataset_store.arrow_path_for(old_path).rename(dataset_store.arrow_path_for(new_path))
+        csv_row_index.move(old_path, new_path)
         return JSONResponse(content={"message": f"CSV file renamed from '{old_name}' to '{new_name}' successfully"}, status_code=200)
     except Exception as e:
         logger.error(f"Error renaming CSV file: {str(e)}")
@@ -256,6 +173,9 @@ async def delete_csv_file(filename: str):
     
     try:
         os.remove(file_path)
+        if dataset_store.arrow_path_for(file_path).exists():
+            os.remove(dataset_store.arrow_path_for(file_path))
+        csv_row_index.forget(file_path)
         return JSONResponse(content={"message": f"CSV file '{filename}' deleted successfully"}, status_code=200)
     except Exception as e:
         logger.error(f"Error deleting CSV file: {str(e)}")
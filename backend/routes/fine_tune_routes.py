@@ -0,0 +1,115 @@
+import re
+import time
+import asyncio
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from config import DATASET_DIR, FINE_TUNE_TRAINERS
+from services.fine_tuner import fine_tune_scheduler, resolve_base_model
+from services.job_manager import FINISHED_STATES, INTERRUPTED, CANCELLED, FAILED
+from utils.sse import sse_event, SSE_HEADERS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+RUN_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+METRICS_POLL_INTERVAL = 0.5
+
+class FineTuneRequest(BaseModel):
+    dataset: str  # File in DATASET_DIR (CSV or view)
+    base_model: str  # Name from /available-models/
+    trainer: str = "tiny"
+    run_name: Optional[str] = None  # Output directory under FINE_TUNED_MODELS_DIR; generated if omitted
+    priority: int = 0  # Higher runs first
+    cpus: int = 1
+    memory_mb: int = 1024
+    hyperparameters: dict = {}
+    resume: bool = False  # Continue from the run's latest checkpoint
+
+def _get_job(job_id: str):
+    job = fine_tune_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Fine-tuning job not found")
+    return job
+
+def _submit(params: dict):
+    if not (DATASET_DIR / params["dataset"]).is_file():
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if resolve_base_model(params["base_model"]) is None:
+        raise HTTPException(status_code=404, detail="Base model not found")
+    if not RUN_NAME_RE.match(params["run_name"]):
+        raise HTTPException(status_code=400, detail="Invalid run name")
+    if params["cpus"] < 1 or params["memory_mb"] < 1:
+        raise HTTPException(status_code=400, detail="cpus and memory_mb must be positive")
+    if fine_tune_scheduler.active_job(params["run_name"]) is not None:
+        raise HTTPException(status_code=409, detail=f"Run '{params['run_name']}' is already queued or running")
+    try:
+        job = fine_tune_scheduler.submit(params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"status": "Fine-tuning job queued", "job_id": job["id"], "job": job},
+                        status_code=202)
+
+@router.post("/fine-tune/jobs/")
+async def start_fine_tune(request: FineTuneRequest):
+    params = request.dict()
+    if not params["run_name"]:
+        dataset_stem = params["dataset"].split(".")[0]
+        params["run_name"] = f"{params['base_model']}-{dataset_stem}-{time.strftime('%Y%m%d-%H%M%S')}"
+    return _submit(params)
+
+@router.get("/fine-tune/jobs/")
+async def list_fine_tune_jobs():
+    return JSONResponse(content=fine_tune_scheduler.list(), status_code=200)
+
+@router.get("/fine-tune/jobs/{job_id}")
+async def get_fine_tune_job(job_id: str):
+    return JSONResponse(content=_get_job(job_id), status_code=200)
+
+@router.post("/fine-tune/jobs/{job_id}/cancel")
+async def cancel_fine_tune_job(job_id: str):
+    _get_job(job_id)
+    return JSONResponse(content=fine_tune_scheduler.cancel(job_id), status_code=200)
+
+@router.post("/fine-tune/jobs/{job_id}/resume")
+async def resume_fine_tune_job(job_id: str):
+    # Queues a new job for the same run; the trainer continues from its latest checkpoint
+    job = _get_job(job_id)
+    if job["status"] not in (INTERRUPTED, CANCELLED, FAILED):
+        raise HTTPException(status_code=409, detail=f"Fine-tuning job is {job['status']}")
+    return _submit(dict(job["params"], resume=True))
+
+@router.get("/fine-tune/jobs/{job_id}/metrics")
+async def get_fine_tune_metrics(job_id: str, after: int = Query(0)):
+    _get_job(job_id)
+    return JSONResponse(content=fine_tune_scheduler.metrics(job_id, after), status_code=200)
+
+@router.get("/fine-tune/jobs/{job_id}/metrics/stream")
+async def stream_fine_tune_metrics(job_id: str, request: Request, after: int = Query(0)):
+    """Server-sent events: each trainer event (metrics, checkpoint, ...) as it arrives, then `status` once the job ends."""
+    _get_job(job_id)
+
+    async def events():
+        seen = after
+        while not await request.is_disconnected():
+            job = fine_tune_scheduler.get(job_id)
+            for event in fine_tune_scheduler.metrics(job_id, seen):
+                seen = event["seq"]
+                yield sse_event(event["event"], event)
+            if job["status"] in FINISHED_STATES:
+                yield sse_event("status", job)
+                return
+            await asyncio.sleep(METRICS_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/fine-tune/resources")
+async def get_fine_tune_resources():
+    return JSONResponse(content=fine_tune_scheduler.resources(), status_code=200)
+
+@router.get("/fine-tune/trainers")
+async def get_fine_tune_trainers():
+    return JSONResponse(content=sorted(FINE_TUNE_TRAINERS), status_code=200)
@@ -1,30 +1,54 @@
 import os
+import re
 import shutil
-from fastapi import APIRouter, HTTPException, Body, Query
-from fastapi.responses import StreamingResponse, JSONResponse
+import time
+import asyncio
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from pathlib import Path
-from config import DATASET_DIR, EXTRACTION_DIR, BASE_MODELS_DIR
+from config import DATASET_DIR, EXTRACTION_DIR, LLM_DISCONNECT_POLL_INTERVAL, BUILD_DEFAULT_SPLITS
 import csv
 import json
 import logging
 import traceback
-from services.llm_service import initialize_model, chat_with_model, generate_text
+from services.llm_service import initialize_model, chat_with_model, generate_text, is_timeout
+from services.response_cache import response_cache
+from services.model_registry import model_registry
+from utils.sse import token_events, SSE_HEADERS
+from services import dataset_store
+from services.dataset_compiler import (COMPILE_JOB, OVERFLOW_MODES, available_tokenizers, resolve_key, read_index,
+                                       list_compiled, remove_compiled)
+from services.dataset_builder import BUILD_JOB, read_manifest, split_paths
+from services.question_gen import QUESTION_JOB, CHECKPOINT_SUFFIX, question_job_paths, job_checkpoint
+from services.job_manager import job_manager, FINISHED_STATES, INTERRUPTED, CANCELLED, FAILED
+from pydantic import BaseModel
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DATASET_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+class QuestionGenerationRequest(BaseModel):
+    source_file: str  # CSV in EXTRACTION_DIR
+    dataset_name: str  # Written to DATASET_DIR/<dataset_name>.csv
+    model: str
+    max_concurrency: Optional[int] = None
+    options: Optional[dict] = None  # Ollama generation options, e.g. {"temperature": 0.2}
+
 @router.get("/training-datasets/")
 async def get_training_datasets():
     try:
         datasets = []
         logger.info(f"Listing files in DATASET_DIR: {DATASET_DIR}")
         for file in os.listdir(DATASET_DIR):
-            if file.endswith('.csv'):
+            if file.endswith('.csv') or dataset_store.is_view(file):
                 file_path = os.path.join(DATASET_DIR, file)
                 datasets.append({
                     "name": file,
-                    "created_at": os.path.getctime(file_path)
+                    "created_at": os.path.getctime(file_path),
+                    "view": dataset_store.is_view(file)
                 })
         logger.info(f"Found {len(datasets)} training datasets")
         return JSONResponse(content=datasets, status_code=200)
@@ -33,66 +57,41 @@ async def get_training_datasets():
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error fetching training datasets: {str(e)}")
 
+# Plain def: the first preview of a new or changed CSV scans the whole file for
+# its row index, so FastAPI runs it in the threadpool, off the event loop
 @router.get("/csv-preview/{filename}")
-async def get_csv_preview(filename: str, rows: int = 100):
-    logger.info(f"Received request for CSV preview: {filename}")
+def get_csv_preview(filename: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=0),
+                    columns: Optional[str] = None, rows: int = Query(100, ge=0)):
+    # `rows` is the original page size parameter; `limit` takes precedence
+    file_path = Path(DATASET_DIR) / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="CSV file not found")
+    selected = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
     try:
-        file_path = Path(DATASET_DIR) / filename
-        logger.info(f"Looking for file at: {file_path}")
-        logger.info(f"DATASET_DIR: {DATASET_DIR}")
-        logger.info(f"File exists: {file_path.exists()}")
-
-        if not file_path.exists():
-            logger.error(f"File not found: {file_path}")
-            raise HTTPException(status_code=404, detail="CSV file not found")
-
-        logger.info(f"File size: {file_path.stat().st_size} bytes")
-
-        data = []
-        try:
-            with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-                logger.info(f"File opened successfully")
-                content = csvfile.read(1000)  # Read first 1000 characters
-                logger.info(f"File content (first 1000 characters): {content}")
-                csvfile.seek(0)  # Reset file pointer to the beginning
-                csv_reader = csv.DictReader(csvfile)
-                logger.info(f"CSV reader created")
-                logger.info(f"CSV headers: {csv_reader.fieldnames}")
-                for i, row in enumerate(csv_reader):
-                    if i >= rows:
-                        break
-                    data.append(row)
-                    if i == 0:
-                        logger.info(f"First row: {row}")
-                    if i % 10 == 0:  # Log every 10th row
-                        logger.info(f"Row {i} read successfully")
-        except csv.Error as e:
-            logger.error(f"CSV Error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error reading CSV file: {str(e)}")
-        except UnicodeDecodeError as e:
-            logger.error(f"Unicode Decode Error: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error decoding CSV file. It might not be in UTF-8 encoding.")
-
-        if not data:
-            logger.warning(f"No data read from the CSV file: {filename}")
-            return JSONResponse(content=[], status_code=200)
-
-        logger.info(f"Successfully read {len(data)} rows from {filename}")
-        return JSONResponse(content=data, status_code=200)
-    except Exception as e:
-        logger.error(f"Error fetching CSV preview: {str(e)}")
-        logger.error(f"Exception type: {type(e).__name__}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Error fetching CSV preview: {str(e)}")
+        total, data = dataset_store.preview_rows(file_path, offset, rows if limit is None else limit, selected)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown column(s): {e.args[0]}")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (csv.Error, UnicodeDecodeError) as e:
+        logger.error(f"Error reading CSV file {filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading CSV file: {str(e)}")
+    return JSONResponse(content=data, status_code=200, headers={"X-Total-Count": str(total)})
 
 @router.post("/generate-dataset/")
 async def generate_dataset(request: dict):
+    # mode "copy" (default) copies the CSV and its Arrow file; mode "view" writes a
+    # <name>.view.json over the source's Arrow file instead, optionally narrowed
+    # to `columns` and to rows whose values are in `filters` ({column: [values]}).
     try:
         source_file = request.get("sourceFile")
         dataset_name = request.get("datasetName")
+        mode = request.get("mode", "copy")
 
         if not source_file or not dataset_name:
             raise HTTPException(status_code=400, detail="Both sourceFile and datasetName are required")
+        if mode not in ("copy", "view"):
+            raise HTTPException(status_code=400, detail="mode must be 'copy' or 'view'")
 
         source_path = Path(EXTRACTION_DIR) / source_file
         if not source_path.exists():
@@ -101,57 +100,342 @@ async def generate_dataset(request: dict):
         # Create the datasets directory if it doesn't exist
         Path(DATASET_DIR).mkdir(parents=True, exist_ok=True)
 
+        if mode == "view":
+            view_path = Path(DATASET_DIR) / f"{dataset_name}{dataset_store.VIEW_SUFFIX}"
+            try:
+                rows = dataset_store.create_view(view_path, source_path, request.get("columns"), request.get("filters"))
+            except KeyError as e:
+                raise HTTPException(status_code=400, detail=f"Unknown column(s): {e.args[0]}")
+            except (ValueError, RuntimeError) as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            return JSONResponse(content={"message": f"Dataset view '{dataset_name}' created successfully", "rows": rows},
+                                status_code=200)
+
         # Copy the file to the datasets directory with the new name
         destination_path = Path(DATASET_DIR) / f"{dataset_name}.csv"
         shutil.copy2(source_path, destination_path)
+        arrow_path = dataset_store.fresh_arrow_path(source_path)
+        if arrow_path is not None:
+            shutil.copy2(arrow_path, dataset_store.arrow_path_for(destination_path))
 
         return JSONResponse(content={"message": f"Dataset '{dataset_name}' created successfully"}, status_code=200)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating dataset: {str(e)}")
 
+def _dataset_path(filename: str, source: str) -> Path:
+    base_dir = DATASET_DIR if source == "datasets" else EXTRACTION_DIR
+    file_path = Path(base_dir) / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return file_path
+
+@router.get("/dataset-stats/{filename}")
+def get_dataset_stats(filename: str, source: str = Query("datasets", regex="^(datasets|extraction)$")):
+    file_path = _dataset_path(filename, source)
+    if not dataset_store.arrow_available():
+        raise HTTPException(status_code=501, detail="pyarrow is not installed")
+    try:
+        return dataset_store.dataset_stats(dataset_store.load_table(file_path))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/dataset-export/{filename}")
+def export_dataset_csv(filename: str, source: str = Query("datasets", regex="^(datasets|extraction)$")):
+    """Download a dataset as CSV; views are rendered from their Arrow source."""
+    file_path = _dataset_path(filename, source)
+    export_name = filename[:-len(dataset_store.VIEW_SUFFIX)] + ".csv" if dataset_store.is_view(filename) else filename
+    headers = {"Content-Disposition": f"attachment;filename={export_name}"}
+    if not dataset_store.is_view(file_path):
+        return FileResponse(file_path, media_type="text/csv", headers=headers)
+    try:
+        table = dataset_store.open_dataset(file_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return StreamingResponse(dataset_store.iter_csv(table), media_type="text/csv", headers=headers)
+
+def _active_question_job(dataset_name: str):
+    for job in job_manager.list(QUESTION_JOB):
+        if job["params"]["dataset_name"] == dataset_name and job["status"] not in FINISHED_STATES:
+            return job
+    return None
+
+def _submit_question_job(params: dict):
+    source_path, output_path = question_job_paths(params)
+    if not source_path.exists():
+        raise HTTPException(status_code=404, detail="Source CSV file not found")
+    if _active_question_job(params["dataset_name"]) is not None:
+        raise HTTPException(status_code=409, detail=f"Questions for '{params['dataset_name']}' are already being generated")
+    checkpoint_path = output_path.with_name(output_path.name + CHECKPOINT_SUFFIX)
+    if output_path.exists() and not checkpoint_path.exists():
+        raise HTTPException(status_code=409, detail=f"Dataset '{params['dataset_name']}' already exists")
+    # A leftover checkpoint for the same output, model and options makes the job resume from it;
+    # one written with another model or options is started over
+    resuming = job_checkpoint(params) is not None
+    job = job_manager.submit(QUESTION_JOB, params)
+    return JSONResponse(content={
+        "status": "Question generation job queued",
+        "job_id": job["id"],
+        "resuming": resuming
+    }, status_code=202)
+
+@router.post("/generate-questions/")
+async def generate_questions(request: QuestionGenerationRequest):
+    if request.max_concurrency is not None and request.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    return _submit_question_job(request.dict())
+
+@router.get("/generate-questions/jobs/")
+async def list_question_jobs():
+    return JSONResponse(content=job_manager.list(QUESTION_JOB), status_code=200)
+
+@router.get("/generate-questions/jobs/{job_id}")
+async def get_question_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None or job["kind"] != QUESTION_JOB:
+        raise HTTPException(status_code=404, detail="Question generation job not found")
+    return JSONResponse(content=job, status_code=200)
+
+@router.post("/generate-questions/jobs/{job_id}/cancel")
+async def cancel_question_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None or job["kind"] != QUESTION_JOB:
+        raise HTTPException(status_code=404, detail="Question generation job not found")
+    return JSONResponse(content=job_manager.cancel(job_id), status_code=200)
+
+@router.post("/generate-questions/jobs/{job_id}/resume")
+async def resume_question_job(job_id: str):
+    # Queues a new job with the same parameters; it picks up the checkpoint the old one left
+    job = job_manager.get(job_id)
+    if job is None or job["kind"] != QUESTION_JOB:
+        raise HTTPException(status_code=404, detail="Question generation job not found")
+    if job["status"] not in (INTERRUPTED, CANCELLED, FAILED):
+        raise HTTPException(status_code=409, detail=f"Question generation job is {job['status']}")
+    return _submit_question_job(job["params"])
+
+class BuildDatasetRequest(BaseModel):
+    name: str  # Writes DATASET_DIR/<name>_<split>.csv and <name>.manifest.json
+    sources: List[str]  # CSVs in EXTRACTION_DIR, read in order; all need the same columns
+    splits: Optional[Dict[str, float]] = None  # {split: ratio}; defaults to BUILD_DEFAULT_SPLITS
+    stratify_by: List[str] = []  # e.g. ["source", "type"]
+    seed: int = 0
+    per_stratum_cap: Optional[int] = None  # Keep at most this many rows per stratum (reservoir sample)
+    stratum_caps: Dict[str, int] = {}  # Caps for single strata, keyed by their values joined with "|"
+    fraction: Optional[float] = None  # Keep this share of rows before splitting
+    filters: Dict[str, List[str]] = {}  # {column: [values]} rows must match
+
+@router.post("/build-dataset/")
+async def build_dataset(request: BuildDatasetRequest):
+    if not DATASET_NAME_RE.match(request.name):
+        raise HTTPException(status_code=400, detail="Invalid dataset name")
+    if not request.sources:
+        raise HTTPException(status_code=400, detail="At least one source file is required")
+    for source in request.sources:
+        if not (EXTRACTION_DIR / source).is_file():
+            raise HTTPException(status_code=404, detail=f"Source CSV file not found: {source}")
+    with open(EXTRACTION_DIR / request.sources[0], 'r', newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f), [])
+    missing = [column for column in request.stratify_by + list(request.filters) if column not in header]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown column(s): {', '.join(missing)}")
+    splits = request.splits or BUILD_DEFAULT_SPLITS
+    if any(ratio < 0 for ratio in splits.values()) or sum(splits.values()) <= 0:
+        raise HTTPException(status_code=400, detail="Split ratios must be non-negative and not all zero")
+    if request.fraction is not None and not 0 < request.fraction <= 1:
+        raise HTTPException(status_code=400, detail="fraction must be in (0, 1]")
+    caps = list(request.stratum_caps.values()) + ([request.per_stratum_cap] if request.per_stratum_cap is not None else [])
+    if any(cap < 0 for cap in caps):
+        raise HTTPException(status_code=400, detail="Stratum caps must be non-negative")
+    existing = [path.name for path in split_paths(request.name, splits).values() if path.exists()]
+    if existing:
+        raise HTTPException(status_code=409, detail=f"Dataset file(s) already exist: {', '.join(existing)}")
+    for job in job_manager.list(BUILD_JOB):
+        if job["params"]["name"] == request.name and job["status"] not in FINISHED_STATES:
+            raise HTTPException(status_code=409, detail=f"Dataset '{request.name}' is already being built")
+    job = job_manager.submit(BUILD_JOB, request.dict())
+    return JSONResponse(content={"status": "Dataset build job queued", "job_id": job["id"]}, status_code=202)
+
+@router.get("/build-dataset/jobs/{job_id}")
+async def get_build_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None or job["kind"] != BUILD_JOB:
+        raise HTTPException(status_code=404, detail="Dataset build job not found")
+    return JSONResponse(content=job, status_code=200)
+
+@router.get("/dataset-manifest/{name}")
+async def get_dataset_manifest(name: str):
+    manifest = read_manifest(name) if DATASET_NAME_RE.match(name) else None
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Dataset manifest not found")
+    return JSONResponse(content=manifest, status_code=200)
+
+class CompileDatasetRequest(BaseModel):
+    dataset: str  # File in DATASET_DIR (CSV or view)
+    tokenizer: Optional[str] = None  # From /tokenizers/; defaults to DEFAULT_TOKENIZER
+    seq_len: Optional[int] = None  # Defaults to COMPILE_SEQ_LEN
+    overflow: Optional[str] = None  # "truncate" or "drop"; defaults to COMPILE_OVERFLOW
+
+@router.post("/compile-dataset/")
+async def compile_dataset(request: CompileDatasetRequest):
+    if not (DATASET_DIR / request.dataset).is_file():
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if request.tokenizer and request.tokenizer not in available_tokenizers():
+        raise HTTPException(status_code=404, detail="Tokenizer not found")
+    if request.seq_len is not None and request.seq_len < 16:
+        raise HTTPException(status_code=400, detail="seq_len must be at least 16")
+    if request.overflow and request.overflow not in OVERFLOW_MODES:
+        raise HTTPException(status_code=400, detail=f"overflow must be one of {', '.join(OVERFLOW_MODES)}")
+    params = request.dict()
+    try:
+        # Hashing a large dataset takes a moment; keep it off the event loop
+        key = await asyncio.to_thread(resolve_key, params["dataset"], params["tokenizer"], params["seq_len"],
+                                      None, params["overflow"])
+    except Exception as e:
+        logger.error(f"Error checking compiled datasets: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error compiling dataset: {str(e)}")
+    index = read_index(key)
+    if index is not None:
+        return JSONResponse(content={"status": "Dataset already compiled", "compiled": dict(index, cached=True)},
+                            status_code=200)
+    # Matched on the resolved key, so omitted options and their defaults count as the same job
+    params["key"] = key
+    for job in job_manager.list(COMPILE_JOB):
+        if job["params"].get("key") == key and job["status"] not in FINISHED_STATES:
+            return JSONResponse(content={"status": "Dataset compilation already queued", "job_id": job["id"]},
+                                status_code=202)
+    job = job_manager.submit(COMPILE_JOB, params)
+    return JSONResponse(content={"status": "Dataset compilation job queued", "job_id": job["id"]}, status_code=202)
+
+@router.get("/compile-dataset/jobs/{job_id}")
+async def get_compile_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None or job["kind"] != COMPILE_JOB:
+        raise HTTPException(status_code=404, detail="Dataset compilation job not found")
+    return JSONResponse(content=job, status_code=200)
+
+@router.get("/compiled-datasets/")
+async def get_compiled_datasets():
+    return JSONResponse(content=list_compiled(), status_code=200)
+
+@router.delete("/compiled-datasets/{compiled_id}")
+async def delete_compiled_dataset(compiled_id: str):
+    if not compiled_id.isalnum() or not remove_compiled(compiled_id):
+        raise HTTPException(status_code=404, detail="Compiled dataset not found")
+    return JSONResponse(content={"message": f"Compiled dataset {compiled_id} deleted"}, status_code=200)
+
+@router.get("/tokenizers/")
+async def get_tokenizers():
+    return JSONResponse(content=available_tokenizers(), status_code=200)
+
+async def _until_disconnected(request: Request, awaitable):
+    """Await `awaitable`, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=LLM_DISCONNECT_POLL_INTERVAL)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            logger.info(f"Client disconnected, cancelled {request.url.path}")
+            raise HTTPException(status_code=499, detail="Client closed request")
+
+async def _sse_response(started, chunks):
+    # Token deltas as `token` events, then a `stats` event (or an `error` event)
+    return StreamingResponse(token_events(await chunks, started), media_type="text/event-stream",
+                             headers=SSE_HEADERS)
+
 @router.post("/initialize-model/{model_name}")
 async def init_model(model_name: str):
     try:
-        initialize_model(model_name)
+        await initialize_model(model_name)
         return JSONResponse(content={"message": f"Model {model_name} initialized successfully"}, status_code=200)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error initializing model: {str(e)}")
 
 @router.post("/chat-with-model/{model_name}")
-async def chat(model_name: str, messages: list = Body(...), stream: bool = Query(False)):
+async def chat(model_name: str, request: Request, messages: list = Body(...), options: Optional[dict] = Body(None),
+               cache: bool = Body(False), stream: bool = Query(False)):
+    # `cache` only takes effect for deterministic options (temperature 0 or a fixed seed)
+    started = time.perf_counter()
     try:
-        response = chat_with_model(model_name, messages, stream)
         if stream:
-            return StreamingResponse(response, media_type="text/event-stream")
+            return await _sse_response(started, chat_with_model(model_name, messages, stream, options, cache))
+        response = await _until_disconnected(request, chat_with_model(model_name, messages, False, options, cache))
         return JSONResponse(content=response, status_code=200)
+    except HTTPException:
+        raise
     except Exception as e:
+        if is_timeout(e):
+            logger.error(f"Timed out chatting with model: {str(e)}")
+            raise HTTPException(status_code=504, detail="Timed out waiting for the model")
         logger.error(f"Error chatting with model: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error chatting with model: {str(e)}")
 
 @router.post("/generate-text/{model_name}")
-async def generate(model_name: str, prompt: str = Body(...), stream: bool = Query(False)):
+async def generate(model_name: str, request: Request, prompt: str = Body(...), options: Optional[dict] = Body(None),
+                   cache: bool = Body(False), stream: bool = Query(False)):
+    started = time.perf_counter()
     try:
-        response = generate_text(model_name, prompt, stream)
         if stream:
-            return StreamingResponse(response, media_type="text/event-stream")
+            return await _sse_response(started, generate_text(model_name, prompt, stream, options, cache))
+        response = await _until_disconnected(request, generate_text(model_name, prompt, False, options, cache))
         return JSONResponse(content=response, status_code=200)
+    except HTTPException:
+        raise
     except Exception as e:
+        if is_timeout(e):
+            logger.error(f"Timed out generating text: {str(e)}")
+            raise HTTPException(status_code=504, detail="Timed out waiting for the model")
         logger.error(f"Error generating text: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating text: {str(e)}")
 
+@router.get("/llm-cache/stats")
+async def get_llm_cache_stats():
+    return JSONResponse(content=response_cache.stats(), status_code=200)
+
+@router.delete("/llm-cache/")
+async def clear_llm_cache():
+    response_cache.clear()
+    return JSONResponse(content={"message": "LLM response cache cleared"}, status_code=200)
+
 # Add this new route
 @router.get("/available-models/")
 async def get_available_models():
+    # Served from the model registry, which watches BASE_MODELS_DIR in the background
+    return JSONResponse(content=model_registry.local_names(), status_code=200)
+
+@router.get("/models/")
+async def get_models(refresh: bool = Query(False)):
     try:
-        logger.info(f"Searching for models in: {BASE_MODELS_DIR}")
-        models = []
-        for file in BASE_MODELS_DIR.glob('*'):
-            logger.info(f"Found file: {file}")
-            if file.is_file() and file.suffix.lower() in ['.modelfile', '.gguf']:
-                models.append(file.stem)
-        logger.info(f"Found models: {models}")
-        return JSONResponse(content=models, status_code=200)
+        if refresh:
+            await model_registry.refresh(force=True)
+        return JSONResponse(content={"models": model_registry.models(), **model_registry.status()}, status_code=200)
     except Exception as e:
-        logger.error(f"Error fetching available models: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Error fetching available models: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error fetching models: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching models: {str(e)}")
+
+async def _load_model(action, model_name):
+    try:
+        return JSONResponse(content=await action(model_name), status_code=200)
+    except Exception as e:
+        if is_timeout(e):
+            logger.error(f"Timed out loading model {model_name}: {str(e)}")
+            raise HTTPException(status_code=504, detail="Timed out waiting for the model")
+        logger.error(f"Error loading model {model_name}: {str(e)}")
+        status_code = 404 if getattr(e, 'status_code', None) == 404 else 500
+        raise HTTPException(status_code=status_code, detail=f"Error loading model: {str(e)}")
+
+@router.post("/models/{model_name}/warm")
+async def warm_model(model_name: str):
+    return await _load_model(model_registry.warm, model_name)
+
+@router.post("/models/{model_name}/pin")
+async def pin_model(model_name: str):
+    return await _load_model(model_registry.pin, model_name)
+
+@router.delete("/models/{model_name}/pin")
+async def unpin_model(model_name: str):
+    return await _load_model(model_registry.unpin, model_name)
\ No newline at end of file
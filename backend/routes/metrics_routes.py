@@ -0,0 +1,44 @@
+import logging
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from config import METRICS_ENABLED
+from services.job_manager import job_manager
+from services.fine_tuner import fine_tune_scheduler
+from services.search_index import search_index
+from services.response_cache import response_cache
+from services.extraction_cache import extraction_cache
+from utils.metrics import REGISTRY, CONTENT_TYPE, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Queue depths and cache counters that other services already keep are read
+# when scraped, so they cost nothing between scrapes.
+
+Gauge("background_jobs", "Background jobs (extraction, question generation, builds, compiles) by kind and status.",
+      ["kind", "status"]).set_function(job_manager.status_counts)
+
+def _fine_tune_resources():
+    resources = fine_tune_scheduler.resources()
+    return {("queued",): resources["queued"], ("running",): resources["running"]}
+
+Gauge("fine_tune_jobs", "Fine-tuning jobs waiting for budget or running.", ["state"]).set_function(_fine_tune_resources)
+Gauge("fine_tune_cpus_in_use", "CPUs declared by running fine-tuning jobs.").set_function(
+    lambda: {(): fine_tune_scheduler.resources()["cpus_in_use"]})
+Gauge("search_index_pending_documents", "Documents waiting to be (re)indexed for search.").set_function(
+    lambda: {(): search_index.pending})
+
+def _cache_lookups(cache):
+    return lambda: {("hit",): cache.hits, ("miss",): cache.misses}
+
+Counter("llm_cache_lookups_total", "Response cache lookups for deterministic chat/generate calls.",
+        ["result"]).set_function(_cache_lookups(response_cache))
+Counter("extraction_cache_lookups_total", "Extraction cache lookups.", ["result"]).set_function(
+    _cache_lookups(extraction_cache))
+
+@router.get("/metrics")
+async def get_metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from typing import Optional
+import sqlite3
+import logging
+from services.search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Plain def: FastAPI runs it in the threadpool, so SQLite work never blocks the event loop
+@router.get("/search")
+def search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=200), offset: int = Query(0, ge=0),
+           folder: Optional[str] = None):
+    try:
+        total, hits = search_index.search(q, limit, offset, folder)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {str(e)}")
+    return JSONResponse(content={"query": q, "total": total, "hits": hits}, headers={"X-Total-Count": str(total)})
+
+# Plain def too: status() waits on the index lock, which indexing holds while it writes
+@router.get("/search/status")
+def search_status():
+    return search_index.status()
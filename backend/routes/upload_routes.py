@@ -4,22 +4,24 @@ import os
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Path
+from fastapi import APIRouter, HTTPException, Body, Path, Request, Query
 from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, HTMLResponse
 from pathlib import Path
 from utils.validators import validate_file_extension  # Changed this line
-from config import UPLOAD_DIR, ALLOWED_EXTENSIONS
-import zipfile
-from io import BytesIO
+from utils.zip_stream import iter_zip
+from config import (UPLOAD_DIR, ALLOWED_EXTENSIONS, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, RESUMABLE_MAX_UPLOAD_SIZE,
+                    ZIP_STORE_EXTENSIONS, ZIP_CHUNK_SIZE)
 import logging
 import shutil
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 import json
-from PyPDF4 import PdfFileReader, PdfFileWriter  # Changed from PyPDF2 to PyPDF4
 import io
-from docx import Document
+from services.extraction_cache import extraction_cache
+from services import upload_store
+from services.upload_store import UploadTooLarge, OffsetMismatch, ChecksumMismatch, MultipartError, MultipartFile
+from services.file_catalog import file_catalog, SORT_COLUMNS
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -50,6 +52,7 @@ async def create_folder(folder: FolderCreate):
     if folder_path.exists():
         raise HTTPException(status_code=400, detail="Folder already exists")
     folder_path.mkdir(parents=True, exist_ok=True)
+    file_catalog.upsert_folder(folder_path)
     return {"message": f"Folder '{folder.name}' created successfully"}
 
 @router.post("/rename_folder/")
@@ -61,6 +64,7 @@ async def rename_folder(folder: FolderRename):
     if new_path.exists():
         raise HTTPException(status_code=400, detail="New folder name already exists")
     old_path.rename(new_path)
+    file_catalog.move(old_path, new_path)
     return {"message": f"Folder renamed from '{folder.old_name}' to '{folder.new_name}' successfully"}
 
 @router.post("/rename_file/")
@@ -97,6 +101,7 @@ async def rename_file(file_rename: FileRename):
                 logger.info(f"Renaming metadata file from {old_metadata_path} to {new_metadata_path}")
                 old_metadata_path.rename(new_metadata_path)
                 logger.info(f"Metadata file renamed successfully")
+            file_catalog.move(old_path, new_path)
         else:
             logger.info(f"Old and new paths are the same, no renaming needed")
         
@@ -111,71 +116,151 @@ async def delete_folder(folder_path: str):
     if not full_path.exists():
         raise HTTPException(status_code=404, detail="Folder not found")
     shutil.rmtree(full_path)
+    file_catalog.remove(full_path)
     return {"message": f"Folder '{folder_path}' deleted successfully"}
 
 @router.get("/files/")
-async def list_files(folder: Optional[str] = ""):
+async def list_files(folder: Optional[str] = "", offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1),
+                     sort: str = "name", order: str = "asc", file_type: Optional[str] = Query(None, alias="type"),
+                     classification: Optional[str] = None):
     base_folder = Path(UPLOAD_DIR) / folder if folder else Path(UPLOAD_DIR)
     if not base_folder.exists():
         raise HTTPException(status_code=404, detail="Folder not found")
-    
-    files_and_folders = []
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}. Use one of {list(SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
 
-    for item in base_folder.iterdir():
-        relative_path = item.relative_to(UPLOAD_DIR)
-        if item.is_file() and not item.name.endswith('.metadata'):
-            stats = item.stat()
-            metadata_path = item.with_suffix('.metadata')
-            security_classification = "Unclassified"
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    security_classification = metadata.get("security_classification", "Unclassified")
-            
+    total, entries = file_catalog.list_entries(folder or "", offset, limit, sort, order == "desc", file_type, classification)
+    files_and_folders = []
+    for entry in entries:
+        if entry["type"] == "folder":
             files_and_folders.append({
-                "name": item.name,
-                "type": get_file_type(item.name),
-                "size": stats.st_size,
-                "uploadDate": datetime.fromtimestamp(stats.st_mtime).isoformat(),
-                "path": str(relative_path),
-                "securityClassification": security_classification
+                "name": entry["name"],
+                "type": "folder",
+                "path": entry["path"]
             })
-        elif item.is_dir():
+        else:
             files_and_folders.append({
-                "name": item.name,
-                "type": "folder",
-                "path": str(relative_path)
+                "name": entry["name"],
+                "type": entry["type"],
+                "size": entry["size"],
+                "uploadDate": datetime.fromtimestamp(entry["mtime"]).isoformat(),
+                "path": entry["path"],
+                "securityClassification": entry["security_classification"]
             })
 
-    return files_and_folders
+    return JSONResponse(content=files_and_folders, headers={"X-Total-Count": str(total)})
 
-def get_file_type(file_name: str) -> str:
-    extension = Path(file_name).suffix.lower()
-    if extension == '.pdf':
-        return 'PDF'
-    elif extension == '.docx':
-        return 'DOCX'
-    elif extension == '.txt':
-        return 'TXT'
-    else:
-        return 'Unknown'
+# Allowance for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
 
 @router.post("/upload/")
-async def upload_files(file: UploadFile = File(...), folder: Optional[str] = ""):
+async def upload_files(request: Request, folder: Optional[str] = ""):
+    # The multipart body is parsed here as it arrives instead of by FastAPI,
+    # which would receive and spool all of it before the handler ran. An
+    # oversized upload is cut off at the first chunk over the limit and the
+    # connection is closed instead of draining the rest.
+    too_large = JSONResponse(content={"detail": f"File exceeds the maximum upload size of {MAX_UPLOAD_SIZE} bytes"},
+                             status_code=413, headers={"Connection": "close"})
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+        return too_large
+    filename = None
     try:
-        folder_path = Path(UPLOAD_DIR) / folder
-        folder_path.mkdir(parents=True, exist_ok=True)
-        
-        file_path = folder_path / file.filename
-        content = await file.read()
-        with file_path.open("wb") as buffer:
-            buffer.write(content)
+        upload = MultipartFile(request.stream(), request.headers.get("content-type", ""),
+                               MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD)
+        filename = await upload.open()
+        file_path = Path(UPLOAD_DIR) / folder / filename
+        await upload_store.write_stream(upload.chunks(), file_path, MAX_UPLOAD_SIZE)
 
-        return JSONResponse(content={"filename": file.filename, "status": "File uploaded successfully"}, status_code=200)
+        return JSONResponse(content={"filename": filename, "status": "File uploaded successfully"}, status_code=200)
+    except UploadTooLarge:
+        logger.warning(f"Rejected upload of {filename}: larger than {MAX_UPLOAD_SIZE} bytes")
+        return too_large
+    except MultipartError as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=400)
     except Exception as e:
         logger.error(f"Unexpected error during file upload: {str(e)}")
         return JSONResponse(content={"detail": f"An unexpected error occurred: {str(e)}"}, status_code=500)
 
+# Resumable uploads: POST /uploads/ starts a session, PUT /uploads/{id}?offset=N
+# sends the raw bytes of a chunk, GET /uploads/{id} reports the offset to
+# resume from, and POST /uploads/{id}/finalize verifies the checksum and
+# moves the file into place.
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    total_size: int
+    folder: str = ""
+    sha256: Optional[str] = None
+
+class UploadSessionFinalize(BaseModel):
+    sha256: Optional[str] = None
+
+def _session_response(session):
+    return {
+        "session_id": session["session_id"],
+        "filename": session["filename"],
+        "folder": session["folder"],
+        "total_size": session["total_size"],
+        "offset": session["offset"],
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+    }
+
+def _offset_conflict(error: OffsetMismatch):
+    return JSONResponse(content={"detail": str(error), "offset": error.offset}, status_code=409)
+
+@router.post("/uploads/")
+async def create_upload_session(request: UploadSessionCreate):
+    if not validate_file_extension(request.filename, ALLOWED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {Path(request.filename).suffix}")
+    if request.total_size < 0:
+        raise HTTPException(status_code=400, detail="total_size must not be negative")
+    if request.total_size > RESUMABLE_MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"File exceeds the maximum upload size of {RESUMABLE_MAX_UPLOAD_SIZE} bytes")
+    session = upload_store.create_session(request.filename, request.folder, request.total_size, request.sha256)
+    return JSONResponse(content=_session_response(session), status_code=201)
+
+@router.get("/uploads/{session_id}")
+async def get_upload_session(session_id: str):
+    try:
+        return _session_response(upload_store.get_session(session_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+@router.put("/uploads/{session_id}")
+async def upload_chunk(session_id: str, offset: int, request: Request):
+    try:
+        session = await upload_store.write_chunk(session_id, offset, request.stream())
+        return _session_response(session)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except OffsetMismatch as e:
+        return _offset_conflict(e)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@router.post("/uploads/{session_id}/finalize")
+async def finalize_upload_session(session_id: str, request: UploadSessionFinalize = Body(UploadSessionFinalize())):
+    try:
+        result = await upload_store.finalize_session(session_id, request.sha256)
+        return {**result, "status": "File uploaded successfully"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except OffsetMismatch as e:
+        return _offset_conflict(e)
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.delete("/uploads/{session_id}")
+async def abort_upload_session(session_id: str):
+    try:
+        upload_store.abort_session(session_id)
+        return {"status": "Upload session aborted"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
 @router.delete("/files/{filename:path}")
 async def delete_file(filename: str):
     try:
@@ -185,6 +270,8 @@ async def delete_file(filename: str):
         logger.debug(f"Attempting to delete file: {file_path}")
         if file_path.exists():
             os.remove(file_path)
+            extraction_cache.invalidate(file_path)
+            file_catalog.remove(file_path)
             logger.info(f"File {filename} deleted successfully")
             
             if metadata_path.exists():
@@ -213,6 +300,8 @@ async def bulk_delete(request: BulkDeleteRequest):
         if file_path.exists():
             try:
                 os.remove(file_path)
+                extraction_cache.invalidate(file_path)
+                file_catalog.remove(file_path)
                 deleted_files.append(filename)
                 logger.info(f"Successfully deleted file: {filename}")
                 
@@ -230,44 +319,44 @@ class BulkDownloadRequest(BaseModel):
     filenames: List[str]
     current_folder: str = ""
 
+def iter_download_entries(request: BulkDownloadRequest):
+    # Folders are walked lazily, so the first bytes go out before the whole
+    # selection has been listed.
+    for filename in request.filenames:
+        file_path = Path(UPLOAD_DIR) / request.current_folder / filename
+        if file_path.is_file():
+            # Skip metadata files
+            if not file_path.name.endswith('.metadata'):
+                yield file_path, str(file_path.relative_to(UPLOAD_DIR))
+        elif file_path.is_dir():
+            # If it's a directory, add all its contents recursively, excluding metadata files
+            for root, _, files in os.walk(file_path):
+                for file in files:
+                    if not file.endswith('.metadata'):
+                        file_full_path = Path(root) / file
+                        yield file_full_path, str(file_full_path.relative_to(UPLOAD_DIR))
+        else:
+            logger.warning(f"Item not found: {filename}")
+
+def stream_zip(request: BulkDownloadRequest):
+    try:
+        yield from iter_zip(iter_download_entries(request), ZIP_STORE_EXTENSIONS, ZIP_CHUNK_SIZE)
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated archive
+        logger.error(f"Error streaming zip file: {str(e)}")
+        raise
+
 @router.post("/bulk-download/")
 async def bulk_download(request: BulkDownloadRequest):
     logger.info(f"Received request to download files: {request.filenames}")
     logger.info(f"Current folder: {request.current_folder}")
     zip_filename = "downloaded_files.zip"
-    s = BytesIO()
-    
-    try:
-        with zipfile.ZipFile(s, "w") as zf:
-            for filename in request.filenames:
-                file_path = Path(UPLOAD_DIR) / request.current_folder / filename
-                if file_path.is_file():
-                    # Skip metadata files
-                    if not file_path.name.endswith('.metadata'):
-                        arcname = str(file_path.relative_to(UPLOAD_DIR))
-                        zf.write(file_path, arcname=arcname)
-                        logger.info(f"Added file to zip: {arcname}")
-                elif file_path.is_dir():
-                    # If it's a directory, add all its contents recursively, excluding metadata files
-                    for root, _, files in os.walk(file_path):
-                        for file in files:
-                            if not file.endswith('.metadata'):
-                                file_full_path = Path(root) / file
-                                arcname = str(file_full_path.relative_to(UPLOAD_DIR))
-                                zf.write(file_full_path, arcname=arcname)
-                                logger.info(f"Added file to zip: {arcname}")
-                else:
-                    logger.warning(f"Item not found: {filename}")
-        
-        s.seek(0)
-        return StreamingResponse(
-            iter([s.getvalue()]), 
-            media_type="application/zip",
-            headers={"Content-Disposition": f"attachment;filename={zip_filename}"}
-        )
-    except Exception as e:
-        logger.error(f"Error creating zip file: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error creating zip file: {str(e)}")
+    # A sync generator, so Starlette reads and compresses in its threadpool
+    return StreamingResponse(
+        stream_zip(request),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment;filename={zip_filename}"}
+    )
 
 class FileMoveRequest(BaseModel):
     file_path: str
@@ -300,6 +389,7 @@ async def move_file(request: FileMoveRequest):
     
     try:
         shutil.move(str(source_path), str(new_file_path))
+        file_catalog.move(source_path, new_file_path)
         logger.info(f"File moved successfully to {new_file_path}")
         return {"message": f"File moved successfully to {request.target_folder}"}
     except Exception as e:
@@ -333,6 +423,7 @@ async def update_security_classification(request: dict):
         
         with open(metadata_path, 'w') as f:
             json.dump(metadata, f)
+        file_catalog.set_classification(file_path, new_classification)
         
         logger.info(f"Security classification updated successfully for {filename}")
         return {"message": f"Security classification for {filename} updated to {new_classification}"}
@@ -359,6 +450,7 @@ async def delete_pdf_page(request: dict):
     if not full_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
     
+    from PyPDF4 import PdfFileReader, PdfFileWriter
     try:
         with open(full_path, 'rb') as file:
             pdf = PdfFileReader(file)
@@ -370,6 +462,8 @@ async def delete_pdf_page(request: dict):
             
             with open(full_path, 'wb') as output_file:
                 writer.write(output_file)
+        extraction_cache.invalidate(full_path)
+        file_catalog.upsert_file(full_path)
         
         return {"success": True, "message": f"Page {page_number} deleted successfully"}
     except Exception as e:
@@ -382,6 +476,7 @@ async def preview_docx(file_path: str):
     if not full_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
     
+    from docx import Document
     try:
         doc = Document(full_path)
         html_content = "<html><body>"
@@ -0,0 +1,292 @@
+import io
+import csv
+import json
+import time
+import random
+import hashlib
+import logging
+from bisect import bisect_right
+from contextlib import ExitStack
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from config import (DATASET_DIR, EXTRACTION_DIR, ARROW_OUTPUT, CSV_FLUSH_ROWS, BUILD_DEFAULT_SPLITS,
+                    BUILD_MAX_STRATA)
+from utils.csv_writer import ChunkedCsvWriter
+from utils.arrow_writer import ChunkedArrowWriter, arrow_available
+from services.extraction_cache import file_sha256, HASH_CHUNK_SIZE
+from services.job_manager import job_manager, JobCancelled
+
+logger = logging.getLogger(__name__)
+
+BUILD_JOB = "dataset_build"
+BUILDER_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+CANCEL_CHECK_ROWS = 10000
+
+class _HashingReader(io.RawIOBase):
+    """Raw reader that hashes the bytes it passes on, so a source is hashed in the same pass that parses it."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.digest = hashlib.sha256()
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def close(self):
+        # Closing the text wrapper on top only reaches this object; pass it on to the file
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+    def readinto(self, buffer):
+        count = self._raw.readinto(buffer)
+        if count:
+            self.digest.update(memoryview(buffer)[:count])
+            self.bytes_read += count
+        return count
+
+def split_paths(name: str, splits) -> Dict[str, Path]:
+    return {split: DATASET_DIR / f"{name}_{split}.csv" for split in splits}
+
+def manifest_path(name: str) -> Path:
+    return DATASET_DIR / f"{name}{MANIFEST_SUFFIX}"
+
+def read_manifest(name: str) -> Optional[dict]:
+    path = manifest_path(name)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _unit_hash(*parts) -> float:
+    """Deterministic number in [0, 1) for the given parts."""
+    digest = hashlib.blake2b("\x1f".join(parts).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+def _split_counts(total: int, ratios: List[float]) -> List[int]:
+    # Largest remainder, so the counts add up to `total` and each is within one of its share
+    exact = [total * ratio for ratio in ratios]
+    counts = [int(value) for value in exact]
+    by_remainder = sorted(range(len(ratios)), key=lambda index: exact[index] - counts[index], reverse=True)
+    for index in by_remainder[:total - sum(counts)]:
+        counts[index] += 1
+    return counts
+
+class _Reservoir:
+    """Uniform sample of at most `cap` rows from a stream (Algorithm R)."""
+
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.rows = []
+        self.seen = 0
+
+    def offer(self, row, rng: random.Random):
+        self.seen += 1
+        if len(self.rows) < self.cap:
+            self.rows.append(row)
+        else:
+            index = rng.randrange(self.seen)
+            if index < self.cap:
+                self.rows[index] = row
+
+class _SplitWriter:
+    """CSV (and Arrow) output for one split, registered on the build's ExitStack once started."""
+
+    def __init__(self, stack: ExitStack, path: Path):
+        self._stack = stack
+        self._path = path
+        self._outputs = []
+
+    def start(self, header):
+        # The Arrow copy is entered first so it is committed last and is never older than its CSV
+        if ARROW_OUTPUT and arrow_available():
+            self._outputs.append(self._stack.enter_context(
+                ChunkedArrowWriter(self._path.with_suffix('.arrow'), header, chunk_rows=CSV_FLUSH_ROWS)))
+        self._outputs.append(self._stack.enter_context(ChunkedCsvWriter(self._path, header, chunk_rows=CSV_FLUSH_ROWS)))
+
+    def write_row(self, row):
+        for output in self._outputs:
+            output.write_row(row)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def abort(self):
+        for output in self._outputs:
+            output.abort()
+
+def build_dataset(name: str, sources: List[str], splits: Optional[Dict[str, float]] = None,
+                  stratify_by: Optional[List[str]] = None, seed: int = 0, per_stratum_cap: Optional[int] = None,
+                  stratum_caps: Optional[Dict[str, int]] = None, fraction: Optional[float] = None,
+                  filters: Optional[Dict[str, List[str]]] = None,
+                  progress: Optional[Callable] = None, cancelled: Optional[Callable] = None) -> dict:
+    """Sample extraction CSVs into <name>_<split>.csv files in DATASET_DIR, reading each source once.
+
+    Rows are grouped into strata by the `stratify_by` columns (one stratum if
+    none). `fraction` keeps a deterministic share of rows first.
+
+    A stratum with a cap (`stratum_caps` for its label, the stratum's values
+    joined by "|", else `per_stratum_cap`) keeps a uniform reservoir sample
+    of at most that many rows, split across `splits` in exact proportions
+    and written after the sources are read. Memory is bounded by the caps.
+
+    Every other stratum is streamed straight to a split picked by a hash of
+    the seed, stratum and answer text. Memory stays constant, each stratum
+    is split in proportion on average, and repeated answers always land in
+    the same split, so they can't leak from train into test.
+
+    The same sources, options and seed always give the same splits. A
+    <name>.manifest.json next to them records the sources (with content
+    hashes), the options and the per-stratum counts.
+    """
+    splits = splits or BUILD_DEFAULT_SPLITS
+    stratify_by = stratify_by or []
+    stratum_caps = stratum_caps or {}
+    filters = {column: set(values) for column, values in (filters or {}).items()}
+    split_names = list(splits)
+    total_ratio = sum(splits.values())
+    if not split_names or total_ratio <= 0 or any(ratio < 0 for ratio in splits.values()):
+        raise ValueError("Split ratios must be non-negative and not all zero")
+    ratios = [splits[split] / total_ratio for split in split_names]
+    boundaries = list(accumulate(ratios))[:-1]
+    rng = random.Random(seed)
+    started = time.time()
+
+    header = None
+    source_records = []
+    strata: Dict[str, dict] = {}
+    reservoirs: Dict[str, _Reservoir] = {}
+    rows_seen = rows_filtered = 0
+    paths = split_paths(name, split_names)
+
+    with ExitStack() as stack:
+        # Started once the first header has been read
+        writers = {split: _SplitWriter(stack, path) for split, path in paths.items()}
+
+        try:
+            for file_index, source in enumerate(sources):
+                source_path = EXTRACTION_DIR / source
+                hashing = _HashingReader(open(source_path, 'rb'))
+                with io.TextIOWrapper(io.BufferedReader(hashing, HASH_CHUNK_SIZE), encoding='utf-8', newline='') as f:
+                    reader = csv.reader(f)
+                    source_header = next(reader, None)
+                    if source_header is None:
+                        raise ValueError(f"{source} is empty")
+                    if header is None:
+                        header = source_header
+                        missing = [column for column in stratify_by + list(filters) if column not in header]
+                        if missing:
+                            raise ValueError(f"Unknown column(s): {', '.join(missing)}")
+                        key_indexes = [header.index(column) for column in stratify_by]
+                        filter_indexes = [(header.index(column), values) for column, values in filters.items()]
+                        text_index = header.index("answer") if "answer" in header else None
+                        for writer in writers.values():
+                            writer.start(header)
+                    elif source_header != header:
+                        raise ValueError(f"{source} has different columns from {sources[0]}")
+
+                    source_rows = 0
+                    for row in reader:
+                        source_rows += 1
+                        rows_seen += 1
+                        if rows_seen % CANCEL_CHECK_ROWS == 0:
+                            if cancelled and cancelled():
+                                raise JobCancelled()
+                            if progress:
+                                progress(rows_seen=rows_seen)
+                        if len(row) != len(header) or any(row[index] not in values for index, values in filter_indexes):
+                            rows_filtered += 1
+                            continue
+                        stratum = "|".join(row[index] for index in key_indexes)
+                        text = row[text_index] if text_index is not None else "\x1f".join(row)
+                        if fraction is not None and _unit_hash("sample", str(seed), stratum, text) >= fraction:
+                            rows_filtered += 1
+                            continue
+                        counts = strata.get(stratum)
+                        if counts is None:
+                            if len(strata) >= BUILD_MAX_STRATA:
+                                raise ValueError(f"More than {BUILD_MAX_STRATA} strata; stratify by fewer or "
+                                                 "coarser columns")
+                            counts = strata[stratum] = {"seen": 0, "selected": dict.fromkeys(split_names, 0)}
+                            cap = stratum_caps.get(stratum, per_stratum_cap)
+                            if cap is not None:
+                                reservoirs[stratum] = _Reservoir(cap)
+                        counts["seen"] += 1
+                        reservoir = reservoirs.get(stratum)
+                        if reservoir is not None:
+                            reservoir.offer(row, rng)
+                        else:
+                            split = split_names[bisect_right(boundaries, _unit_hash("split", str(seed), stratum, text))]
+                            counts["selected"][split] += 1
+                            writers[split].write_row(row)
+                source_records.append({"file": source, "sha256": hashing.digest.hexdigest(),
+                                       "bytes": hashing.bytes_read, "rows": source_rows})
+                if progress:
+                    progress(files_done=file_index + 1, files_total=len(sources), rows_seen=rows_seen)
+
+            if reservoirs:
+                # Shuffle each capped stratum's sample, cut it by the ratios, then shuffle each split's share
+                selected = {split: [] for split in split_names}
+                for stratum in sorted(reservoirs):
+                    sample = reservoirs[stratum].rows
+                    rng.shuffle(sample)
+                    start = 0
+                    for split, count in zip(split_names, _split_counts(len(sample), ratios)):
+                        selected[split].extend(sample[start:start + count])
+                        strata[stratum]["selected"][split] = count
+                        start += count
+                for split in split_names:
+                    rng.shuffle(selected[split])
+                    writers[split].write_rows(selected[split])
+                    selected[split] = None
+            if cancelled and cancelled():
+                raise JobCancelled()
+        except BaseException:
+            for writer in writers.values():
+                writer.abort()
+            raise
+
+    rows_selected = {split: sum(counts["selected"][split] for counts in strata.values()) for split in split_names}
+    manifest = {
+        "name": name,
+        "builder_version": BUILDER_VERSION,
+        "created_at": time.time(),
+        "seconds": round(time.time() - started, 2),
+        "params": {
+            "sources": sources,
+            "splits": splits,
+            "stratify_by": stratify_by,
+            "seed": seed,
+            "per_stratum_cap": per_stratum_cap,
+            "stratum_caps": stratum_caps,
+            "fraction": fraction,
+            "filters": {column: sorted(values) for column, values in filters.items()},
+            "sampling": "hash" if not reservoirs else "reservoir" if len(reservoirs) == len(strata) else "mixed",
+        },
+        "sources": source_records,
+        "rows_seen": rows_seen,
+        "rows_filtered": rows_filtered,
+        "splits": {split: {"file": paths[split].name, "rows": rows_selected[split],
+                           "sha256": file_sha256(paths[split])} for split in split_names},
+        "strata": strata,
+    }
+    tmp_path = manifest_path(name).with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(manifest_path(name))
+    logger.info(f"Built dataset {name} from {len(sources)} file(s): {rows_seen} rows seen, "
+                f"{sum(rows_selected.values())} selected into {', '.join(split_names)}")
+    return manifest
+
+def run_build_job(job):
+    params = job.params
+    return build_dataset(params["name"], params["sources"], params.get("splits"), params.get("stratify_by"),
+                         params.get("seed", 0), params.get("per_stratum_cap"), params.get("stratum_caps"),
+                         params.get("fraction"), params.get("filters"),
+                         progress=job.update, cancelled=lambda: job.cancelled)
+
+job_manager.register(BUILD_JOB, run_build_job)
@@ -0,0 +1,354 @@
+import json
+import time
+import shutil
+import tempfile
+import hashlib
+import logging
+from bisect import bisect_left, insort
+from string import Formatter
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from config import (DATA_DIR, DATASET_DIR, COMPILED_DATASET_DIR, TOKENIZER_DIR, DEFAULT_TOKENIZER, COMPILE_SEQ_LEN,
+                    COMPILE_BATCH_ROWS, COMPILE_OVERFLOW, CHAT_TEMPLATE)
+from services import dataset_store
+from services.extraction_cache import file_sha256
+from services.job_manager import job_manager, JobCancelled
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+COMPILE_JOB = "dataset_compile"
+COMPILER_VERSION = 1  # Bump when the output format changes, so old cache entries are not reused
+INDEX_FILE = "index.json"
+TOKENS_FILE = "tokens.bin"
+LOSS_MASK_FILE = "loss_mask.bin"
+SEGMENTS_FILE = "segments.npy"
+OVERFLOW_MODES = ("truncate", "drop")
+
+class ByteTokenizer:
+    """UTF-8 bytes as token ids 0-255, plus pad, bos and eos."""
+    name = "byte"
+    fingerprint = "byte-v1"
+    vocab_size = 259
+    pad_id, bos_id, eos_id = 256, 257, 258
+
+    def encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        return [np.frombuffer(text.encode('utf-8'), dtype=np.uint8).astype(np.uint32) for text in texts]
+
+class LocalTokenizer:
+    """A Hugging Face tokenizer.json from TOKENIZER_DIR/<name>/; encode_batch runs in parallel in Rust."""
+
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        self.fingerprint = file_sha256(path)
+        self._tokenizer = Tokenizer.from_file(str(path))
+        self.vocab_size = self._tokenizer.get_vocab_size(with_added_tokens=True)
+        special = {}
+        config_path = path.parent / "tokenizer_config.json"
+        if config_path.exists():
+            with open(config_path, 'r', encoding='utf-8') as f:
+                special = json.load(f)
+        self.bos_id = self._token_id(special.get("bos_token"))
+        self.eos_id = self._token_id(special.get("eos_token"))
+        pad_id = self._token_id(special.get("pad_token"))
+        self.pad_id = pad_id if pad_id is not None else (self.eos_id if self.eos_id is not None else 0)
+
+    def _token_id(self, token):
+        if isinstance(token, dict):
+            token = token.get("content")
+        return self._tokenizer.token_to_id(token) if token else None
+
+    def encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        encodings = self._tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [np.asarray(encoding.ids, dtype=np.uint32) for encoding in encodings]
+
+def available_tokenizers() -> List[str]:
+    names = [ByteTokenizer.name]
+    if TOKENIZER_DIR.exists():
+        names.extend(sorted(path.parent.name for path in TOKENIZER_DIR.glob("*/tokenizer.json")))
+    return names
+
+def load_tokenizer(name: str):
+    if name == ByteTokenizer.name:
+        return ByteTokenizer()
+    path = TOKENIZER_DIR / name / "tokenizer.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Tokenizer not found: {name}")
+    if Tokenizer is None:
+        raise RuntimeError("The tokenizers package is not installed; only the byte tokenizer is available")
+    return LocalTokenizer(name, path)
+
+def dataset_hash(dataset_path: Path) -> str:
+    if not dataset_store.is_view(dataset_path):
+        return file_sha256(dataset_path)
+    # A view is its definition plus the content of the file it reads from
+    with open(dataset_path, 'rb') as f:
+        definition = f.read()
+    source_path = DATA_DIR / json.loads(definition)["source"]
+    return hashlib.sha256(definition + file_sha256(source_path).encode()).hexdigest()
+
+def compile_key(dataset_digest: str, tokenizer, seq_len: int, template: dict, overflow: str) -> str:
+    payload = {"dataset": dataset_digest, "tokenizer": tokenizer.fingerprint, "seq_len": seq_len,
+               "template": template, "overflow": overflow, "version": COMPILER_VERSION}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+def compiled_dir(key: str) -> Path:
+    return COMPILED_DATASET_DIR / key
+
+def read_index(key: str) -> Optional[dict]:
+    index_path = compiled_dir(key) / INDEX_FILE
+    if not index_path.exists():
+        return None
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def list_compiled() -> List[dict]:
+    if not COMPILED_DATASET_DIR.exists():
+        return []
+    indexes = [read_index(path.name) for path in COMPILED_DATASET_DIR.iterdir() if path.is_dir()]
+    return sorted((index for index in indexes if index), key=lambda index: index["created_at"], reverse=True)
+
+def load_compiled(key: str) -> Tuple[np.memmap, np.memmap, np.ndarray, dict]:
+    """Memory-map a compiled dataset: tokens and loss mask (sequences x seq_len) and its segments.
+
+    Each row of `segments` is (sequence, start, length) of one example; a
+    trainer uses them to keep attention (and position ids) within examples.
+    """
+    index = read_index(key)
+    if index is None:
+        raise FileNotFoundError(f"Compiled dataset not found: {key}")
+    shape = (index["sequences"], index["seq_len"])
+    directory = compiled_dir(key)
+    tokens = np.memmap(directory / TOKENS_FILE, dtype=index["dtype"], mode='r', shape=shape)
+    loss_mask = np.memmap(directory / LOSS_MASK_FILE, dtype=np.uint8, mode='r', shape=shape)
+    return tokens, loss_mask, np.load(directory / SEGMENTS_FILE), index
+
+def pack_lengths(lengths: np.ndarray, seq_len: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Best-fit decreasing bin packing of example lengths into sequences of `seq_len`.
+
+    Returns the sequence and offset of every example and the number of
+    sequences. Each example goes, longest first, into the sequence with the
+    least free space that still fits it; the free-space values are kept
+    sorted, so a lookup is a bisect rather than a scan over all sequences.
+    """
+    sequences = np.empty(len(lengths), dtype=np.int64)
+    offsets = np.empty(len(lengths), dtype=np.int64)
+    used = []
+    spaces = []  # distinct free-space values that some sequence has, ascending
+    by_space = {}  # free space -> sequences with that much room
+    for example in np.argsort(-lengths, kind='stable'):
+        length = int(lengths[example])
+        position = bisect_left(spaces, length)
+        if position < len(spaces):
+            space = spaces[position]
+            bucket = by_space[space]
+            sequence = bucket.pop()
+            if not bucket:
+                del by_space[space]
+                spaces.pop(position)
+        else:
+            sequence, space = len(used), seq_len
+            used.append(0)
+        sequences[example] = sequence
+        offsets[example] = used[sequence]
+        used[sequence] += length
+        remaining = space - length
+        if remaining:
+            bucket = by_space.get(remaining)
+            if bucket is None:
+                by_space[remaining] = [sequence]
+                insort(spaces, remaining)
+            else:
+                bucket.append(sequence)
+    return sequences, offsets, len(used)
+
+def _template_fields(part: str) -> List[str]:
+    return [field for _, field, _, _ in Formatter().parse(part) if field]
+
+def _encode_rows(batch: dict, tokenizer, template: dict, seq_len: int, overflow: str):
+    """Token ids and loss mask of each row: [bos] prompt response [eos], the mask set on response and eos."""
+    rows = [{name: "" if value is None else value for name, value in zip(batch, values)}
+            for values in zip(*batch.values())]
+    prompts = tokenizer.encode_batch([template["prompt"].format(**row) for row in rows])
+    responses = tokenizer.encode_batch([template["response"].format(**row) for row in rows])
+    head = [tokenizer.bos_id] if tokenizer.bos_id is not None else []
+    tail = [tokenizer.eos_id] if tokenizer.eos_id is not None else []
+    examples, truncated, dropped = [], 0, 0
+    for prompt, response in zip(prompts, responses):
+        prompt = np.concatenate([np.asarray(head, dtype=np.uint32), prompt])
+        response = np.concatenate([response, np.asarray(tail, dtype=np.uint32)])
+        tokens = np.concatenate([prompt, response])
+        mask = np.concatenate([np.zeros(len(prompt), dtype=np.uint8), np.ones(len(response), dtype=np.uint8)])
+        if len(tokens) > seq_len:
+            if overflow == "drop":
+                dropped += 1
+                continue
+            tokens, mask = tokens[:seq_len], mask[:seq_len]
+            truncated += 1
+        if mask.any():
+            examples.append((tokens, mask))
+        else:
+            # Truncation left nothing to learn from
+            dropped += 1
+    return examples, truncated, dropped
+
+def _resolve(dataset_name, tokenizer_name, seq_len, template, overflow):
+    tokenizer = load_tokenizer(tokenizer_name or DEFAULT_TOKENIZER)
+    seq_len = seq_len or COMPILE_SEQ_LEN
+    template = template or CHAT_TEMPLATE
+    overflow = overflow or COMPILE_OVERFLOW
+    if overflow not in OVERFLOW_MODES:
+        raise ValueError(f"Unknown overflow mode: {overflow}")
+    digest = dataset_hash(DATASET_DIR / dataset_name)
+    return tokenizer, seq_len, template, overflow, digest, compile_key(digest, tokenizer, seq_len, template, overflow)
+
+def resolve_key(dataset_name: str, tokenizer_name: Optional[str] = None, seq_len: Optional[int] = None,
+                template: Optional[dict] = None, overflow: Optional[str] = None) -> str:
+    """Key of the compilation these options produce, with defaults filled in (`None` and the default match)."""
+    return _resolve(dataset_name, tokenizer_name, seq_len, template, overflow)[-1]
+
+def find_compiled(dataset_name: str, tokenizer_name: Optional[str] = None, seq_len: Optional[int] = None,
+                  template: Optional[dict] = None, overflow: Optional[str] = None) -> Optional[dict]:
+    """Index of an existing compilation of the dataset with these options, or None."""
+    index = read_index(resolve_key(dataset_name, tokenizer_name, seq_len, template, overflow))
+    return dict(index, cached=True) if index else None
+
+def compile_dataset(dataset_name: str, tokenizer_name: Optional[str] = None, seq_len: Optional[int] = None,
+                    template: Optional[dict] = None, overflow: Optional[str] = None,
+                    progress: Optional[Callable] = None, cancelled: Optional[Callable] = None) -> dict:
+    """Tokenize a dataset from DATASET_DIR and pack it into fixed-length sequences.
+
+    Returns the compiled dataset's index (statistics included). The same
+    dataset content, tokenizer and options are only compiled once.
+    """
+    tokenizer, seq_len, template, overflow, digest, key = _resolve(
+        dataset_name, tokenizer_name, seq_len, template, overflow)
+    dataset_path = DATASET_DIR / dataset_name
+    index = read_index(key)
+    if index is not None:
+        logger.info(f"Compiled dataset {key} for {dataset_name} is cached")
+        return dict(index, cached=True)
+
+    started = time.perf_counter()
+    table = dataset_store.load_table(dataset_path)
+    fields = {name for part in template.values() for name in _template_fields(part)}
+    missing = fields - set(table.column_names)
+    if missing:
+        raise ValueError(f"Dataset has no column(s) {', '.join(sorted(missing))} used by the chat template")
+
+    COMPILED_DATASET_DIR.mkdir(parents=True, exist_ok=True)
+    # Unique per run, so two jobs compiling the same key never share (or delete) each other's scratch files
+    work_dir = Path(tempfile.mkdtemp(dir=COMPILED_DATASET_DIR, prefix=f".{key}."))
+    try:
+        # Examples are written to a flat scratch file as they are tokenized, so memory
+        # holds only their lengths until the packing is known
+        lengths, truncated, dropped, rows_done = [], 0, 0, 0
+        with open(work_dir / "examples.bin", 'wb') as tokens_out, open(work_dir / "examples_mask.bin", 'wb') as mask_out:
+            for batch in table.select(sorted(fields)).to_batches(COMPILE_BATCH_ROWS):
+                if cancelled and cancelled():
+                    raise JobCancelled()
+                examples, batch_truncated, batch_dropped = _encode_rows(
+                    batch.to_pydict(), tokenizer, template, seq_len, overflow)
+                if examples:
+                    np.concatenate([tokens for tokens, _ in examples]).tofile(tokens_out)
+                    np.concatenate([mask for _, mask in examples]).tofile(mask_out)
+                    lengths.extend(len(tokens) for tokens, _ in examples)
+                truncated += batch_truncated
+                dropped += batch_dropped
+                rows_done += batch.num_rows
+                if progress:
+                    progress(rows_done=rows_done, rows_total=table.num_rows, stage="tokenizing")
+        if not lengths:
+            raise ValueError("Dataset has no examples to compile")
+
+        if progress:
+            progress(stage="packing")
+        lengths = np.asarray(lengths, dtype=np.int64)
+        sequences, offsets, sequence_count = pack_lengths(lengths, seq_len)
+
+        dtype = np.uint16 if tokenizer.vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+        total = int(lengths.sum())
+        flat_tokens = np.memmap(work_dir / "examples.bin", dtype=np.uint32, mode='r', shape=(total,))
+        flat_mask = np.memmap(work_dir / "examples_mask.bin", dtype=np.uint8, mode='r', shape=(total,))
+        # Where each scratch token lands in the (sequences x seq_len) output, computed for all tokens at once
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        destinations = np.repeat(sequences * seq_len + offsets - starts, lengths) + np.arange(total)
+        tokens = np.memmap(work_dir / TOKENS_FILE, dtype=dtype, mode='w+', shape=(sequence_count, seq_len))
+        tokens[:] = tokenizer.pad_id
+        tokens.reshape(-1)[destinations] = flat_tokens
+        tokens.flush()
+        loss_mask = np.memmap(work_dir / LOSS_MASK_FILE, dtype=np.uint8, mode='w+', shape=(sequence_count, seq_len))
+        loss_mask.reshape(-1)[destinations] = flat_mask
+        loss_mask.flush()
+        trainable = int(flat_mask.sum())
+        del tokens, loss_mask, flat_tokens, flat_mask
+
+        segments = np.stack([sequences, offsets, lengths], axis=1).astype(np.int32)
+        np.save(work_dir / SEGMENTS_FILE, segments[np.lexsort((offsets, sequences))])
+        (work_dir / "examples.bin").unlink()
+        (work_dir / "examples_mask.bin").unlink()
+
+        index = {
+            "id": key,
+            "dataset": dataset_name,
+            "dataset_hash": digest,
+            "tokenizer": tokenizer.name,
+            "tokenizer_fingerprint": tokenizer.fingerprint,
+            "vocab_size": tokenizer.vocab_size,
+            "pad_id": tokenizer.pad_id,
+            "seq_len": seq_len,
+            "template": template,
+            "overflow": overflow,
+            "dtype": np.dtype(dtype).name,
+            "rows": table.num_rows,
+            "examples": len(lengths),
+            "truncated": truncated,
+            "dropped": dropped,
+            "sequences": sequence_count,
+            "tokens": total,
+            "trainable_tokens": trainable,
+            "padding_tokens": sequence_count * seq_len - total,
+            # Share of sequence slots holding real tokens, packed vs. one example per padded sequence
+            "padding_efficiency": round(total / (sequence_count * seq_len), 4),
+            "unpacked_padding_efficiency": round(total / (len(lengths) * seq_len), 4),
+            "max_example_tokens": int(lengths.max()),
+            "mean_example_tokens": round(float(lengths.mean()), 1),
+            "seconds": round(time.perf_counter() - started, 2),
+            "created_at": time.time(),
+            "version": COMPILER_VERSION,
+        }
+        with open(work_dir / INDEX_FILE, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        target = compiled_dir(key)
+        try:
+            work_dir.rename(target)
+        except OSError:
+            if not target.exists():
+                raise
+            # Compiled concurrently by another job; both results are identical
+            shutil.rmtree(work_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    logger.info(f"Compiled {dataset_name} into {sequence_count} sequences of {seq_len} tokens "
+                f"({index['padding_efficiency']:.1%} filled, {index['unpacked_padding_efficiency']:.1%} unpacked)")
+    return dict(index, cached=False)
+
+def remove_compiled(key: str) -> bool:
+    target = compiled_dir(key)
+    if not target.is_dir():
+        return False
+    shutil.rmtree(target)
+    return True
+
+def run_compile_job(job):
+    return compile_dataset(job.params["dataset"], job.params.get("tokenizer"), job.params.get("seq_len"),
+                           job.params.get("template"), job.params.get("overflow"),
+                           progress=job.update, cancelled=lambda: job.cancelled)
+
+job_manager.register(COMPILE_JOB, run_compile_job)
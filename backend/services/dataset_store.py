@@ -0,0 +1,165 @@
+import io
+import os
+import csv
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import DATA_DIR
+from utils.csv_index import csv_row_index
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.csv
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Datasets are CSV files, optionally with a columnar Arrow IPC sibling
+# (<name>.arrow) written by the same job, or views: <name>.view.json files
+# naming an Arrow source plus a column projection and row filters.
+ARROW_SUFFIX = ".arrow"
+VIEW_SUFFIX = ".view.json"
+EXPORT_BATCH_ROWS = 10000
+# Columns with at most this many distinct values get a value breakdown in stats
+STATS_MAX_VALUES = 50
+
+def arrow_available() -> bool:
+    return pa is not None
+
+def is_view(path) -> bool:
+    return Path(path).name.endswith(VIEW_SUFFIX)
+
+def arrow_path_for(csv_path) -> Path:
+    return Path(csv_path).with_suffix(ARROW_SUFFIX)
+
+def fresh_arrow_path(csv_path) -> Optional[Path]:
+    """Return the Arrow sibling of a CSV if it exists and the CSV was not modified after it."""
+    csv_path = Path(csv_path)
+    arrow_path = arrow_path_for(csv_path)
+    if pa is None or not arrow_path.exists():
+        return None
+    if csv_path.exists() and arrow_path.stat().st_mtime < csv_path.stat().st_mtime:
+        return None
+    return arrow_path
+
+def read_arrow(arrow_path) -> "pa.Table":
+    # Memory-mapped: column buffers point into the page cache and nothing is
+    # parsed or copied until a slice is converted to Python objects.
+    source = pa.memory_map(str(arrow_path), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+def _filter_mask(table, filters: Dict[str, List[str]]):
+    mask = None
+    for column, values in filters.items():
+        column_mask = pc.is_in(table[column], value_set=pa.array(values, type=table.schema.field(column).type))
+        mask = column_mask if mask is None else pc.and_(mask, column_mask)
+    return mask
+
+def _check_columns(table, names):
+    missing = [name for name in names if name not in table.column_names]
+    if missing:
+        raise KeyError(", ".join(missing))
+
+def read_view(view_path) -> "pa.Table":
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; dataset views cannot be read")
+    with open(view_path, 'r', encoding='utf-8') as f:
+        view = json.load(f)
+    source_path = Path(DATA_DIR) / view["source"]
+    if not source_path.exists():
+        raise FileNotFoundError(f"Source of view {Path(view_path).name} no longer exists: {view['source']}")
+    table = read_arrow(source_path)
+    if view.get("filters"):
+        table = table.filter(_filter_mask(table, view["filters"]))
+    if view.get("columns"):
+        table = table.select(view["columns"])
+    return table
+
+def open_dataset(path) -> Optional["pa.Table"]:
+    """Arrow table of a view, or of a CSV with a fresh Arrow sibling; None if there is only the CSV."""
+    if is_view(path):
+        return read_view(path)
+    arrow_path = fresh_arrow_path(path)
+    return read_arrow(arrow_path) if arrow_path else None
+
+def load_table(path) -> "pa.Table":
+    """Like open_dataset, but parses a CSV-only dataset (all columns as strings) instead of returning None."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    table = open_dataset(path)
+    if table is None:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), [])
+        convert_options = pa.csv.ConvertOptions(column_types={name: pa.string() for name in header},
+                                                strings_can_be_null=False)
+        table = pa.csv.read_csv(str(path), convert_options=convert_options)
+    return table
+
+def preview_rows(path, offset: int, limit: int, columns: Optional[List[str]] = None) -> Tuple[int, List[dict]]:
+    """Return (total rows, rows offset..offset+limit) from Arrow when available, else via the CSV row index.
+
+    Raises KeyError for unknown columns.
+    """
+    table = open_dataset(path)
+    if table is None:
+        total, _, rows = csv_row_index.read_rows(path, offset, limit, columns)
+        return total, rows
+    if columns:
+        _check_columns(table, columns)
+        table = table.select(columns)
+    return table.num_rows, table.slice(offset, limit).to_pylist()
+
+def create_view(view_path: Path, source_csv: Path, columns: Optional[List[str]] = None,
+                filters: Optional[Dict[str, List[str]]] = None) -> int:
+    """Write a view over the Arrow sibling of `source_csv` and return its row count."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; dataset views need it")
+    arrow_path = fresh_arrow_path(source_csv)
+    if arrow_path is None:
+        raise ValueError(f"{Path(source_csv).name} has no up-to-date Arrow file to build a view on")
+    table = read_arrow(arrow_path)
+    _check_columns(table, list(columns or []) + list((filters or {}).keys()))
+    view = {
+        "source": Path(arrow_path).resolve().relative_to(Path(DATA_DIR).resolve()).as_posix(),
+        "columns": columns,
+        "filters": filters,
+        "created_at": time.time(),
+    }
+    tmp_path = Path(str(view_path) + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(view, f, indent=2)
+    os.replace(tmp_path, view_path)
+    return read_view(view_path).num_rows
+
+def dataset_stats(table) -> dict:
+    columns = {}
+    for name in table.column_names:
+        column = table[name]
+        lengths = pc.utf8_length(column) if pa.types.is_string(column.type) else None
+        distinct = pc.count_distinct(column).as_py()
+        entry = {"nulls": column.null_count, "distinct": distinct}
+        if lengths is not None and table.num_rows:
+            entry["empty"] = pc.sum(pc.equal(lengths, 0)).as_py() or 0
+            entry["mean_length"] = round(pc.mean(lengths).as_py() or 0, 1)
+            entry["max_length"] = pc.max(lengths).as_py()
+        if distinct <= STATS_MAX_VALUES:
+            entry["values"] = {str(item["values"]): item["counts"] for item in pc.value_counts(column).to_pylist()}
+        columns[name] = entry
+    return {"rows": table.num_rows, "columns": columns}
+
+def iter_csv(table, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[str]:
+    """Yield a table as CSV text, one record batch at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table.column_names)
+    for batch in table.to_batches(max_chunksize=batch_rows):
+        writer.writerows(zip(*(column.to_pylist() for column in batch.columns)))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
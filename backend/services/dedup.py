@@ -0,0 +1,275 @@
+import re
+import csv
+import zlib
+import hashlib
+import logging
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from config import DATASET_DIR, DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE, DEDUP_BATCH_ROWS
+
+logger = logging.getLogger(__name__)
+
+# "near" drops exact and near duplicates, "exact" only identical texts
+# (after lowercasing and ignoring punctuation), "off" keeps every row.
+DEDUP_MODES = ("near", "exact", "off")
+
+WORD_RE = re.compile(r"\w+")
+PERM_CHUNK = 16  # Permutations hashed at once; bounds the (perms x shingles) scratch array
+SHIFT = np.uint64(32)
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def _random_uint64(rng, shape) -> np.ndarray:
+    return rng.integers(0, np.iinfo(np.uint64).max, size=shape, dtype=np.uint64, endpoint=True)
+
+class _WordHashes(dict):
+    def __missing__(self, word):
+        value = self[word] = zlib.crc32(word.encode('utf-8'))
+        return value
+
+class _KeyTable:
+    """Append-only uint64 key -> id table kept as sorted NumPy segments.
+
+    Segments are merged while the newer one is at least half the size of the
+    one before it, so there are O(log n) of them and every key is re-sorted
+    O(log n) times. Memory is 16 bytes per key, far below a dict of ints.
+    """
+
+    def __init__(self):
+        self._segments: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self._segments)
+
+    def add(self, keys: np.ndarray, ids: np.ndarray):
+        if not len(keys):
+            return
+        order = np.argsort(keys, kind='stable')
+        self._segments.append((keys[order], ids[order]))
+        while len(self._segments) > 1 and len(self._segments[-2][0]) <= 2 * len(self._segments[-1][0]):
+            newer_keys, newer_ids = self._segments.pop()
+            older_keys, older_ids = self._segments.pop()
+            keys = np.concatenate([older_keys, newer_keys])
+            ids = np.concatenate([older_ids, newer_ids])
+            # Stable, so for a repeated key the older id still comes first
+            order = np.argsort(keys, kind='stable')
+            self._segments.append((keys[order], ids[order]))
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Earliest id stored under each key, or -1."""
+        found = np.full(len(keys), -1, dtype=np.int64)
+        for segment_keys, segment_ids in self._segments:
+            positions = np.minimum(np.searchsorted(segment_keys, keys), len(segment_keys) - 1)
+            hit = (segment_keys[positions] == keys) & (found < 0)
+            found[hit] = segment_ids[positions[hit]]
+        return found
+
+class Deduplicator:
+    """Finds rows whose text repeats an earlier row exactly or nearly.
+
+    Exact duplicates are matched on a hash of the normalized words. Near
+    duplicates use MinHash signatures over word shingles, bucketed by LSH
+    bands; a bucket collision counts only if the two signatures agree on at
+    least `threshold` of their positions (the estimated Jaccard similarity).
+    Texts are processed in batches and all hashing is vectorized, so the
+    cost grows linearly with the number of rows.
+    """
+
+    def __init__(self, mode: str = "near", threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_BANDS, shingle_size: int = DEDUP_SHINGLE_SIZE, seed: int = 1):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.mode = mode
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: ((a * x + b) mod 2^64) >> 32, with odd a
+        self._a = (_random_uint64(rng, (num_perm, 1)) | np.uint64(1))
+        self._b = _random_uint64(rng, (num_perm, 1))
+        self._shingle_mix = _random_uint64(rng, shingle_size) | np.uint64(1)
+        self._band_mix = _random_uint64(rng, (bands, num_perm // bands)) | np.uint64(1)
+        self._word_hashes = _WordHashes()
+        self._exact = _KeyTable()
+        self._buckets = _KeyTable()  # band key -> row in self._signatures
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._signature_count = 0
+        self._signature_ids = np.empty(0, dtype=np.int64)  # Row id of each stored signature
+        self._count = 0
+        self.seeded = 0
+        self.rows_in = 0
+        self.exact_removed = 0
+        self.near_removed = 0
+        self.matched_existing = 0
+
+    def minhash(self, docs_words: List[List[str]]) -> np.ndarray:
+        """MinHash signatures (one uint32 row per document) over word shingles."""
+        k = self.shingle_size
+        hashes, lengths = [], []
+        lookup = self._word_hashes.__getitem__
+        for words in docs_words:
+            hashes.extend(map(lookup, words))
+            # Texts shorter than a shingle become a single zero-padded shingle
+            if len(words) < k:
+                hashes.extend([0] * (k - len(words)))
+            lengths.append(max(len(words), k))
+        word_array = np.array(hashes, dtype=np.uint64)
+        lengths = np.array(lengths, dtype=np.int64)
+        counts = lengths - k + 1
+        word_starts = np.cumsum(lengths) - lengths
+        shingle_starts = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum()) + np.repeat(word_starts - shingle_starts, counts)
+        shingles = np.zeros(len(positions), dtype=np.uint64)
+        for j in range(k):
+            shingles += word_array[positions + j] * self._shingle_mix[j]
+        shingles >>= SHIFT
+
+        signatures = np.empty((len(docs_words), self.num_perm), dtype=np.uint32)
+        for start in range(0, self.num_perm, PERM_CHUNK):
+            stop = start + PERM_CHUNK
+            hashed = (self._a[start:stop] * shingles + self._b[start:stop]) >> SHIFT
+            signatures[:, start:stop] = np.minimum.reduceat(hashed, shingle_starts, axis=1).T
+        return signatures
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        rows = signatures.reshape(len(signatures), self.bands, -1).astype(np.uint64)
+        # Each band has its own multipliers, so equal slices in different bands get different keys
+        return (rows * self._band_mix).sum(axis=2, dtype=np.uint64)
+
+    def _store_signatures(self, signatures: np.ndarray) -> np.ndarray:
+        needed = self._signature_count + len(signatures)
+        if needed > len(self._signatures):
+            grown = np.empty((max(needed, 2 * len(self._signatures)), self.num_perm), dtype=np.uint32)
+            grown[:self._signature_count] = self._signatures[:self._signature_count]
+            self._signatures = grown
+        rows = np.arange(self._signature_count, needed, dtype=np.int64)
+        self._signatures[rows] = signatures
+        self._signature_count = needed
+        return rows
+
+    def _first_in_batch(self, keys: np.ndarray) -> np.ndarray:
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return first[inverse.reshape(-1)]
+
+    def check(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (id of the earlier row each text duplicates or -1, mask of exact matches).
+
+        Row ids count every text ever checked or seeded, in order. Texts that
+        are not duplicates are indexed, so later batches are checked against them.
+        """
+        n = len(texts)
+        ids = np.arange(self._count, self._count + n, dtype=np.int64)
+        self._count += n
+        matches = np.full(n, -1, dtype=np.int64)
+        if self.mode == "off" or not n:
+            return matches, np.zeros(n, dtype=bool)
+
+        docs_words = [WORD_RE.findall(text.lower()) for text in texts]
+        exact_keys = np.array([_hash64(" ".join(words)) for words in docs_words], dtype=np.uint64)
+        matches = self._exact.lookup(exact_keys)
+        earlier = ids[self._first_in_batch(exact_keys)]
+        matches = np.where((matches < 0) & (earlier < ids), earlier, matches)
+        exact = matches >= 0
+        self._exact.add(exact_keys[~exact], ids[~exact])
+        if self.mode == "exact":
+            return matches, exact
+
+        candidates = np.flatnonzero(~exact)
+        if not len(candidates):
+            return matches, exact
+        signatures = self.minhash([docs_words[i] for i in candidates])
+        band_keys = self._band_keys(signatures)
+        m = len(candidates)
+
+        # Buckets already indexed by earlier batches
+        stored_rows = self._buckets.lookup(band_keys.reshape(-1)).reshape(m, self.bands)
+        similarity = np.zeros((m, self.bands))
+        hit = stored_rows >= 0
+        if hit.any():
+            rows, bands = np.nonzero(hit)
+            similarity[rows, bands] = (self._signatures[stored_rows[rows, bands]] == signatures[rows]).mean(axis=1)
+        stored_match = similarity >= self.threshold
+
+        # Buckets shared with an earlier text of this batch
+        batch_first = (self._first_in_batch(band_keys.reshape(-1)) // self.bands).reshape(m, self.bands)
+        batch_similarity = np.zeros((m, self.bands))
+        earlier = batch_first < np.arange(m)[:, None]
+        if earlier.any():
+            rows, bands = np.nonzero(earlier)
+            batch_similarity[rows, bands] = (signatures[batch_first[rows, bands]] == signatures[rows]).mean(axis=1)
+        batch_match = batch_similarity >= self.threshold
+
+        near = np.full(m, -1, dtype=np.int64)
+        has_batch = batch_match.any(axis=1)
+        near[has_batch] = ids[candidates[batch_first[has_batch, batch_match[has_batch].argmax(axis=1)]]]
+        has_stored = stored_match.any(axis=1)
+        stored_signature_rows = stored_rows[has_stored, stored_match[has_stored].argmax(axis=1)]
+        near[has_stored] = self._signature_ids[stored_signature_rows]
+        matches[candidates] = near
+
+        kept = near < 0
+        signature_rows = self._store_signatures(signatures[kept])
+        self._signature_ids = np.concatenate([self._signature_ids, ids[candidates[kept]]])
+        bucket_keys = band_keys[kept]
+        self._buckets.add(bucket_keys.reshape(-1), np.repeat(signature_rows, self.bands))
+        return matches, exact
+
+    def seed(self, texts: Iterable[str], batch_rows: int = DEDUP_BATCH_ROWS):
+        """Index existing texts so new rows repeating them are dropped; the texts themselves are not counted."""
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= batch_rows:
+                self.check(batch)
+                batch = []
+        if batch:
+            self.check(batch)
+        self.seeded = self._count
+
+    def filter(self, rows: List[list], text_index: int) -> List[list]:
+        """Drop the rows whose text at `text_index` duplicates an earlier or seeded one."""
+        matches, exact = self.check([row[text_index] or "" for row in rows])
+        duplicate = matches >= 0
+        self.rows_in += len(rows)
+        self.exact_removed += int(exact.sum())
+        self.near_removed += int((duplicate & ~exact).sum())
+        self.matched_existing += int((duplicate & (matches < self.seeded)).sum())
+        return [row for row, is_duplicate in zip(rows, duplicate) if not is_duplicate]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "rows_in": self.rows_in,
+            "rows_removed": self.exact_removed + self.near_removed,
+            "exact_removed": self.exact_removed,
+            "near_removed": self.near_removed,
+            "matched_existing": self.matched_existing,
+        }
+
+def dedup_rows(rows: Iterable[list], deduplicator: Deduplicator, text_index: int,
+               batch_rows: int = DEDUP_BATCH_ROWS) -> Iterator[list]:
+    """Pass rows through `deduplicator` in batches, yielding the kept ones in order."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield from deduplicator.filter(batch, text_index)
+            batch = []
+    if batch:
+        yield from deduplicator.filter(batch, text_index)
+
+def iter_dataset_texts(dataset_dir: Optional[Path] = None, column: str = "answer") -> Iterator[str]:
+    """Yield the `column` values of every CSV dataset in `dataset_dir`."""
+    for path in sorted(Path(dataset_dir or DATASET_DIR).glob("*.csv")):
+        try:
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if row.get(column):
+                        yield row[column]
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            logger.warning(f"Skipping {path.name} while seeding dedup: {str(e)}")
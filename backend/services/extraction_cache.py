@@ -0,0 +1,187 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+from config import UPLOAD_DIR, EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES
+from services.extractor import pipeline_signature
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(file_path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """Extraction results keyed by file content hash plus pipeline version.
+
+    Each entry is a gzipped JSON file holding the per-page raw text and the
+    filtered paragraphs and sentences of one document. Entry mtimes record
+    last use, and the least recently used entries are evicted once the cache
+    grows past `max_bytes`. A small path index remembers which entries were
+    produced from which uploaded file, both to skip re-hashing unchanged files
+    and to drop entries when a file is replaced or edited.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._index_path = self.cache_dir / "path_index.json"
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._index = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _load(self):
+        if self._loaded:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if self._index_path.exists():
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except ValueError:
+                logger.warning("Extraction cache path index is corrupt; starting fresh")
+                self._index = {}
+        self._total_bytes = sum(entry.stat().st_size for entry in self.cache_dir.glob("*.json.gz"))
+        self._signature = pipeline_signature()
+        self._version = self._options_version(None)
+        self._loaded = True
+
+    def _options_version(self, options):
+        # Per-request settings that change the output (e.g. the PDF backend
+        # chain) are hashed into the key next to the pipeline signature.
+        signature = dict(self._signature, options=options or {})
+        return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _save_index(self):
+        tmp_path = self._index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _relative(self, file_path) -> str:
+        return Path(file_path).resolve().relative_to(Path(UPLOAD_DIR).resolve()).as_posix()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.json.gz"
+
+    def key_for(self, file_path, options: Optional[dict] = None) -> str:
+        """Return the cache key of a file, re-hashing only if its size or mtime changed."""
+        stats = os.stat(file_path)
+        relative_path = self._relative(file_path)
+        with self._lock:
+            self._load()
+            version = self._options_version(options)
+            known = self._index.get(relative_path)
+            if known and known["size"] == stats.st_size and known["mtime"] == stats.st_mtime:
+                return f"{known['sha256']}-{version}"
+        sha256 = file_sha256(file_path)
+        with self._lock:
+            self._index[relative_path] = {"size": stats.st_size, "mtime": stats.st_mtime, "sha256": sha256}
+            self._save_index()
+        return f"{sha256}-{version}"
+
+    def get(self, file_path, options: Optional[dict] = None) -> Optional[dict]:
+        key = self.key_for(file_path, options)
+        entry_path = self._entry_path(key)
+        with self._lock:
+            try:
+                with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                    result = json.load(f)
+                os.utime(entry_path)  # Mark as recently used
+                self.hits += 1
+                return result
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            except (OSError, ValueError):
+                logger.warning(f"Discarding unreadable extraction cache entry {key}")
+                self._remove(entry_path)
+                self.misses += 1
+                return None
+
+    def put(self, file_path, result: dict, options: Optional[dict] = None):
+        key = self.key_for(file_path, options)
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path.with_suffix('.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(result, f)
+        with self._lock:
+            if entry_path.exists():
+                self._total_bytes -= entry_path.stat().st_size
+            os.replace(tmp_path, entry_path)
+            self._total_bytes += entry_path.stat().st_size
+            self._evict()
+
+    def invalidate(self, file_path):
+        """Forget everything cached for an uploaded file that was replaced or edited."""
+        relative_path = self._relative(file_path)
+        with self._lock:
+            self._load()
+            known = self._index.pop(relative_path, None)
+            if known is None:
+                return
+            # Another upload may share the same content; keep its entries
+            if not any(other["sha256"] == known["sha256"] for other in self._index.values()):
+                for entry_path in self.cache_dir.glob(f"{known['sha256']}-*.json.gz"):
+                    self._remove(entry_path)
+            self._save_index()
+            self.invalidations += 1
+        logger.info(f"Invalidated extraction cache for {relative_path}")
+
+    def _remove(self, entry_path):
+        try:
+            size = entry_path.stat().st_size
+            entry_path.unlink()
+            self._total_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        entries = sorted(self.cache_dir.glob("*.json.gz"), key=lambda entry: entry.stat().st_mtime)
+        for entry_path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(entry_path)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            for entry_path in self.cache_dir.glob("*.json.gz"):
+                self._remove(entry_path)
+            self._index = {}
+            self._save_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": sum(1 for _ in self.cache_dir.glob("*.json.gz")),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "pipeline_version": self._version,
+            }
+
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES)
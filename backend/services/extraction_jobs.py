@@ -0,0 +1,130 @@
+import time
+import logging
+from contextlib import closing, ExitStack
+from datetime import datetime
+from pathlib import Path
+from config import UPLOAD_DIR, EXTRACTION_DIR, CSV_FLUSH_ROWS, ARROW_OUTPUT, DEDUP_MODE
+from utils.file_utils import get_file_security_classification
+from utils.csv_writer import ChunkedCsvWriter
+from utils.arrow_writer import ChunkedArrowWriter, arrow_available
+from services.extraction_pool import extract_files
+from services.dedup import Deduplicator, dedup_rows, iter_dataset_texts
+from services.job_manager import job_manager, JobCancelled
+from utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_JOB = "extraction"
+
+CSV_HEADER = ["question", "answer", "source", "security classification", "type"]
+
+CSV_WRITE_SECONDS = Histogram("extraction_csv_write_seconds",
+                              "Seconds per extraction job spent writing (and publishing) its CSV and Arrow output.")
+ROWS_WRITTEN = Counter("extraction_rows_written_total", "Rows written to extraction CSVs.")
+
+def iter_extracted_rows(job, filenames, statuses):
+    """Yield CSV rows for the requested files as each file finishes extracting.
+
+    file -> pages -> cleaned text -> fragments -> filtered rows; per-file
+    outcomes are recorded in `statuses` and progress is reported on `job`.
+    """
+    pending = []
+    for index, filename in enumerate(filenames):
+        file_path = Path(UPLOAD_DIR) / filename
+        if not file_path.exists():
+            statuses[index] = "File not found"
+            continue
+        pending.append((index, filename, str(file_path)))
+
+    files_done = len(filenames) - len(pending)
+    pages_done = 0
+    items_extracted = 0
+    job.update(files_total=len(filenames), files_done=files_done, pages_done=0, items_extracted=0)
+
+    # Files are parsed, cleaned and filtered in parallel but merged in request order
+    file_paths = [file_path for _, _, file_path in pending]
+    use_cache = job.params.get("use_cache", True)
+    pdf_backend = job.params.get("pdf_backend")
+    segmenter = job.params.get("segmenter")
+    with closing(extract_files(file_paths, use_cache=use_cache, pdf_backend=pdf_backend,
+                               segmenter=segmenter)) as extracted_files:
+        for (index, filename, _), (_, extracted, error) in zip(pending, extracted_files):
+            job.raise_if_cancelled()
+            files_done += 1
+            if error is not None:
+                logger.error(f"Error extracting content from {filename}: {str(error)}")
+                statuses[index] = f"Error: {str(error)}"
+                job.update(files_done=files_done)
+                continue
+
+            logger.info(f"Raw content extracted from {filename}: {extracted['pages']} items")
+
+            # Get the security classification for this file
+            security_classification = get_file_security_classification(filename)
+
+            for fragment_type, fragments in (("paragraph", extracted["paragraphs"]), ("sentence", extracted["sentences"])):
+                for fragment in fragments:
+                    items_extracted += 1
+                    yield ["", fragment, filename, security_classification, fragment_type]
+
+            statuses[index] = "Content extracted successfully"
+            pages_done += extracted["pages"]
+            job.update(files_done=files_done, pages_done=pages_done, items_extracted=items_extracted)
+
+def run_extraction_job(job):
+    filenames = job.params["filenames"]
+    statuses = {}
+
+    current_date = datetime.now().strftime('%Y%m%d_%H%M%S')
+    csv_filename = f"{job.params['csv_filename']}_{current_date}.csv"
+    csv_path = Path(EXTRACTION_DIR) / csv_filename
+
+    # Repeated headers, overlapping pages and the paragraph/sentence split all
+    # produce repeated answers; drop them across every file of the request.
+    deduplicator = Deduplicator(job.params.get("dedup") or DEDUP_MODE)
+    if deduplicator.mode != "off" and job.params.get("dedup_against_datasets"):
+        deduplicator.seed(iter_dataset_texts())
+        logger.info(f"Dedup seeded with {deduplicator.seeded} rows from existing datasets")
+    rows = dedup_rows(iter_extracted_rows(job, filenames, statuses), deduplicator, CSV_HEADER.index("answer"))
+
+    # Rows are flushed in chunks to <name>.csv.part, which only becomes the
+    # real CSV once every file has been processed. The Arrow copy is entered
+    # first so it is committed last and is never older than its CSV.
+    with ExitStack() as stack:
+        writers = []
+        if ARROW_OUTPUT and arrow_available():
+            writers.append(stack.enter_context(
+                ChunkedArrowWriter(csv_path.with_suffix('.arrow'), CSV_HEADER, chunk_rows=CSV_FLUSH_ROWS)))
+        writer = stack.enter_context(ChunkedCsvWriter(csv_path, CSV_HEADER, chunk_rows=CSV_FLUSH_ROWS))
+        writers.append(writer)
+        # Only the writing is timed; waiting on `rows` is the extraction itself
+        write_seconds = 0.0
+        try:
+            for row in rows:
+                started = time.perf_counter()
+                for output in writers:
+                    output.write_row(row)
+                write_seconds += time.perf_counter() - started
+            job.raise_if_cancelled()
+        except JobCancelled:
+            for output in writers:
+                output.abort()
+            raise
+        # The writers are committed (flushed, fsynced, renamed) as the stack closes
+        started = time.perf_counter()
+    write_seconds += time.perf_counter() - started
+    CSV_WRITE_SECONDS.observe(write_seconds)
+    ROWS_WRITTEN.inc(writer.rows_written)
+
+    dedup_stats = deduplicator.stats()
+    logger.info(f"Total extracted items: {writer.rows_written} ({dedup_stats['rows_removed']} duplicates removed)")
+
+    return {
+        "status": "Extraction process completed",
+        "results": [{"filename": filename, "status": statuses[index]} for index, filename in enumerate(filenames)],
+        "csv_file": str(csv_path.name),
+        "extracted_items_count": writer.rows_written,
+        "dedup": dedup_stats
+    }
+
+job_manager.register(EXTRACTION_JOB, run_extraction_job)
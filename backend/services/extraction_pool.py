@@ -0,0 +1,189 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from config import EXTRACTION_WORKERS, PDF_PAGES_PER_TASK
+from services.extractor import extract_file, get_segmenter, merge_results
+from services.pdf_backends import resolve_chain, page_count
+from services.extraction_cache import extraction_cache
+from utils.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+PAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+STAGE_SECONDS = Histogram("extraction_stage_seconds", "Seconds per file spent in each extraction stage.", ["stage"])
+PAGE_SECONDS = Histogram("extraction_stage_seconds_per_page",
+                         "Seconds per page (block for DOCX/TXT) in each extraction stage, averaged over a file.",
+                         ["stage"], buckets=PAGE_BUCKETS)
+FILES = Counter("extraction_files_total", "Files handed to extraction, by outcome.", ["result"])
+PAGES = Counter("extraction_pages_total", "Pages (blocks for DOCX/TXT) extracted; cache hits are not counted.")
+IN_FLIGHT = Gauge("extraction_files_in_flight", "Files submitted for extraction whose results are not collected yet.")
+
+def _record(result, error, is_fresh):
+    if error is not None:
+        FILES.inc(result="failed")
+        return
+    timings = result.pop("timings", None)
+    if not is_fresh:
+        FILES.inc(result="cached")
+        return
+    FILES.inc(result="extracted")
+    PAGES.inc(result["pages"])
+    for stage, seconds in (timings or {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if result["pages"]:
+            PAGE_SECONDS.observe(seconds / result["pages"], stage=stage)
+
+def _init_worker():
+    # Each worker pays the model load once and reuses it for every file it is sent
+    get_segmenter().load()
+
+def _extract_task(file_path, pdf_backend=None, page_range=None, segmenter=None):
+    # nlp.pipe must not fork its own processes inside a pool worker
+    return extract_file(file_path, n_process=1, pdf_backend=pdf_backend, page_range=page_range, segmenter=segmenter)
+
+def get_executor():
+    global _executor
+    if _executor is None and EXTRACTION_WORKERS > 0:
+        logger.info(f"Starting extraction pool with {EXTRACTION_WORKERS} workers")
+        _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, initializer=_init_worker)
+    return _executor
+
+def _ready():
+    return True
+
+def warm_up():
+    """Load the default segmenter before the first extraction: in every pool worker, or in-process without a pool."""
+    started = time.perf_counter()
+    executor = get_executor()
+    try:
+        if executor is None:
+            get_segmenter().load()
+        else:
+            # Each worker runs _init_worker as it starts
+            for future in [executor.submit(_ready) for _ in range(EXTRACTION_WORKERS)]:
+                future.result()
+    except Exception as e:
+        logger.warning(f"Extraction warm-up failed: {str(e)}")
+        return
+    logger.info(f"Extraction warm-up finished in {time.perf_counter() - started:.1f}s")
+
+def start_warm_up():
+    threading.Thread(target=warm_up, name="extraction-warm-up", daemon=True).start()
+
+def shutdown_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _cache_options(file_path, pdf_backend, segmenter):
+    options = {"segmenter": get_segmenter(segmenter).name}
+    if Path(file_path).suffix.lower() == '.pdf':
+        options["pdf_backend_chain"] = resolve_chain(pdf_backend)
+    return options
+
+def _completed(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+def _start(executor, file_path, use_cache, pdf_backend, segmenter):
+    # Returns (futures, is_fresh). Cache hits and in-process runs come back as
+    # already-completed futures so callers treat every file the same way; a
+    # long PDF becomes one future per page range so its pages are spread
+    # across workers.
+    try:
+        if use_cache:
+            cached = extraction_cache.get(file_path, _cache_options(file_path, pdf_backend, segmenter))
+            if cached is not None:
+                return [_completed(cached)], False
+        if executor is None:
+            return [_completed(extract_file(file_path, pdf_backend=pdf_backend, segmenter=segmenter))], True
+        if Path(file_path).suffix.lower() == '.pdf':
+            total_pages = page_count(file_path, resolve_chain(pdf_backend))
+            if total_pages > PDF_PAGES_PER_TASK:
+                return [
+                    executor.submit(_extract_task, file_path, pdf_backend,
+                                    (start, min(total_pages, start + PDF_PAGES_PER_TASK)), segmenter)
+                    for start in range(0, total_pages, PDF_PAGES_PER_TASK)
+                ], True
+        return [executor.submit(_extract_task, file_path, pdf_backend, None, segmenter)], True
+    except Exception as e:
+        return [_completed(error=e)], True
+
+def extract_files(file_paths: List[str], use_cache: bool = True,
+                  pdf_backend: Optional[str] = None, segmenter: Optional[str] = None) -> Iterator[Tuple[str, dict, Exception]]:
+    """Yield (file_path, result, error) for every path, in the order given.
+
+    Files are served from the extraction cache when possible and otherwise
+    extracted concurrently by the pool; exactly one of result and error is
+    set, so one broken document never aborts the others.
+    """
+    executor = get_executor()
+
+    # Only a bounded window of files is in flight, so finished results never
+    # pile up in the parent faster than the caller consumes them.
+    window = max(2, EXTRACTION_WORKERS * 2) if executor is not None else 1
+    remaining = iter(file_paths)
+    pending = deque()
+
+    # Entries are (file_path, futures, is_fresh, the pool the futures were sent to)
+    def start(file_path):
+        return (file_path, *_start(executor, file_path, use_cache, pdf_backend, segmenter), executor)
+
+    def submit_next():
+        for file_path in remaining:
+            pending.append(start(file_path))
+            IN_FLIGHT.inc()
+            return
+
+    def succeeded(future):
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    for _ in range(window):
+        submit_next()
+    try:
+        while pending:
+            file_path, futures, is_fresh, sent_to = pending.popleft()
+            IN_FLIGHT.dec()
+            try:
+                result, error = merge_results([future.result() for future in futures]), None
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OOM on a huge PDF). This file is reported;
+                # the other files sent to the dead pool are not at fault, so
+                # any of them still unfinished start over on a fresh pool.
+                logger.error(f"Extraction pool broke while processing {file_path}")
+                if _executor is sent_to:
+                    shutdown_pool()
+                executor = get_executor()
+                for index, entry in enumerate(pending):
+                    if entry[3] is sent_to and not all(succeeded(future) for future in entry[1]):
+                        pending[index] = start(entry[0])
+                result, error = None, e
+            except Exception as e:
+                result, error = None, e
+            _record(result, error, is_fresh)
+            if error is None and is_fresh and use_cache:
+                try:
+                    extraction_cache.put(file_path, result, _cache_options(file_path, pdf_backend, segmenter))
+                except OSError as e:
+                    logger.warning(f"Could not cache extraction of {file_path}: {str(e)}")
+            submit_next()
+            yield file_path, result, error
+    finally:
+        # Abandoned (e.g. cancelled) extractions must not keep the workers busy
+        IN_FLIGHT.dec(len(pending))
+        for _, futures, _, _ in pending:
+            for future in futures:
+                future.cancel()
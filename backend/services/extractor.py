@@ -1,73 +1,337 @@
-from pathlib import Path
-from typing import List
-from PyPDF4 import PdfFileReader
-from docx import Document
-import pdfplumber
+import os
+import re
+import time
 import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from functools import lru_cache
+from importlib import metadata
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from config import SPACY_MODEL, SPACY_BATCH_SIZE, SPACY_N_PROCESS, PDF_PAGES_PER_TASK, DEFAULT_SEGMENTER
+from services.pdf_backends import resolve_chain, page_count, extract_pdf_pages
+from services.text_quality import filter_fragments
+from utils.metrics import Stopwatch
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_content(file_path: Path) -> List[str]:
-    if file_path.suffix.lower() == '.pdf':
-        return extract_from_pdf(file_path)
-    elif file_path.suffix.lower() == '.docx':
-        return extract_from_docx(file_path)
-    elif file_path.suffix.lower() == '.txt':
-        return extract_from_txt(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {file_path.suffix}")
-
-def extract_from_pdf(file_path: Path) -> List[str]:
-    sentences = []
+# The meaningful-text filter only reads POS tags and sentence boundaries, so
+# the components that produce neither are never run.
+DISABLED_COMPONENTS = ["ner", "lemmatizer"]
+
+# Bump whenever reading, cleaning, segmentation or filtering changes output,
+# so cached extractions made by older code are not reused.
+EXTRACTOR_VERSION = 2
+CLEAN_PATTERN = r'^.*?Page \d+.*?$'
+
+# Stage timings of the extract_file call running on this thread
+_timing = threading.local()
+
+def _stage(name):
+    stopwatch = getattr(_timing, "stopwatch", None)
+    return stopwatch(name) if stopwatch is not None else nullcontext()
+
+@lru_cache(maxsize=None)
+def load_spacy():
+    """Import spaCy on first use; the import alone takes most of a second."""
     try:
-        with open(file_path, 'rb') as file:
-            reader = PdfFileReader(file)
-            for page in range(reader.getNumPages()):
-                text = reader.getPage(page).extractText()
-                if text:
-                    # Split text into sentences
-                    page_sentences = [s.strip() for s in text.split('.') if s.strip()]
-                    sentences.extend(page_sentences)
-        
-        if not sentences:
-            # If PyPDF4 fails to extract text, try pdfplumber as a fallback
-            logger.info(f"PyPDF4 failed to extract text from {file_path}. Trying pdfplumber.")
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        page_sentences = [s.strip() for s in text.split('.') if s.strip()]
-                        sentences.extend(page_sentences)
-
-        if not sentences:
-            logger.warning(f"Both PyPDF4 and pdfplumber failed to extract text from {file_path}")
-            return ["[PDF text extraction failed. This PDF might be scanned or have content that's not easily extractable.]"]
-
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
-        return [f"[Error extracting text from PDF: {str(e)}]"]
-
-    return sentences
-
-def extract_from_docx(file_path: Path) -> List[str]:
+        import spacy
+        return spacy
+    except ImportError:
+        logger.warning("spaCy not found. Falling back to rule-based text segmentation.")
+        return None
+
+# Format handlers: file extension -> function yielding the text of each page
+# (PDF) or block (DOCX paragraph, whole TXT file), lazily.
+
+FORMAT_HANDLERS: Dict[str, Callable[..., Iterator[str]]] = {}
+
+def register_format(*extensions):
+    def decorator(handler):
+        for extension in extensions:
+            FORMAT_HANDLERS[extension] = handler
+        return handler
+    return decorator
+
+@register_format('.pdf')
+def extract_from_pdf(file_path, pdf_backend=None, page_range=None):
+    chain = resolve_chain(pdf_backend)
+    start, end = page_range if page_range else (0, page_count(file_path, chain))
+    # The fallback chain is applied per block of pages, so one unreadable
+    # section does not send the whole document to a slower backend.
+    for block_start in range(start, end, PDF_PAGES_PER_TASK):
+        yield from extract_pdf_pages(file_path, chain, block_start, min(end, block_start + PDF_PAGES_PER_TASK))
+
+@register_format('.docx')
+def extract_from_docx(file_path, **options):
+    from docx import Document
+    doc = Document(file_path)
+    for para in doc.paragraphs:
+        if para.text.strip():
+            yield para.text.strip()
+
+@register_format('.txt')
+def extract_from_txt(file_path, **options):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    yield content
+
+def extract_text_with_layout(file_path, pdf_backend: Optional[str] = None,
+                             page_range: Optional[Tuple[int, int]] = None) -> Iterator[str]:
+    _, ext = os.path.splitext(file_path)
+    handler = FORMAT_HANDLERS.get(ext.lower())
+    if handler is None:
+        raise ValueError(f"Unsupported file type: {ext}")
+    return handler(file_path, pdf_backend=pdf_backend, page_range=page_range)
+
+def clean_text(text):
+    # Remove headers, footers, and page numbers
+    cleaned_text = re.sub(CLEAN_PATTERN, '', text, flags=re.MULTILINE)
+    # Remove extra whitespace
+    cleaned_text = ' '.join(cleaned_text.split())
+    return cleaned_text
+
+def is_meaningful_text(text):
+    words = text.split()
+    return len(words) > 5 and any(word.isalpha() for word in words)
+
+def is_meaningful_span(span):
+    if len(span) <= 5:
+        return False
+    text = span.text
+    text_chars = sum(1 for c in text if c.isalpha())
+    if not text or text_chars / len(text) <= 0.7:
+        return False
+    from spacy.symbols import NOUN, VERB
+    has_noun = any(token.pos == NOUN for token in span)
+    has_verb = any(token.pos == VERB for token in span)
+    return has_noun and has_verb
+
+def split_doc(doc):
+    # A paragraph runs until a sentence closes with terminal punctuation, so it
+    # is a contiguous span of the same parse rather than a re-joined string.
+    paragraphs = []
     sentences = []
+    paragraph_start = None
+    for sent in doc.sents:
+        sentences.append(sent)
+        if paragraph_start is None:
+            paragraph_start = sent.start
+        if sent.text.strip().endswith(('.', '!', '?')):
+            paragraphs.append(doc[paragraph_start:sent.end])
+            paragraph_start = None
+    if paragraph_start is not None:
+        paragraphs.append(doc[paragraph_start:len(doc)])
+    return paragraphs, sentences
+
+# Segmenters turn cleaned page texts into the meaningful (paragraphs, sentences)
+# of a document.
+
+class Segmenter(ABC):
+    name = None
+
+    def load(self):
+        pass
+
+    @abstractmethod
+    def segment(self, texts: Iterable[str], batch_size: int, n_process: int) -> Tuple[List[str], List[str]]:
+        ...
+
+class RegexSegmenter(Segmenter):
+    """Punctuation-based sentence splitting; each page is one paragraph."""
+
+    name = "regex"
+
+    def segment(self, texts, batch_size, n_process):
+        paragraphs = []
+        sentences = []
+        for text in texts:
+            text_paragraphs = text.split('\n\n')
+            text_sentences = re.split(r'(?<=[.!?])\s+', text)
+            with _stage("filter"):
+                paragraphs.extend(p for p in text_paragraphs if is_meaningful_text(p))
+                sentences.extend(s for s in text_sentences if is_meaningful_text(s))
+        return paragraphs, sentences
+
+class SpacySegmenter(Segmenter):
+    """Full tagger and parser: parser sentence boundaries and a POS-based filter."""
+
+    name = "spacy"
+
+    def __init__(self):
+        self.nlp = None
+        self._loaded = False
+
+    def load(self):
+        if not self._loaded:
+            self._loaded = True
+            spacy = load_spacy()
+            if spacy is not None:
+                try:
+                    self.nlp = spacy.load(SPACY_MODEL, disable=DISABLED_COMPONENTS)
+                    logger.info(f"Loaded spaCy model {SPACY_MODEL} with components: {self.nlp.pipe_names}")
+                except OSError:
+                    logger.warning(f"spaCy model {SPACY_MODEL} not found. Some features may not work as expected.")
+        return self.nlp
+
+    def segment(self, texts, batch_size, n_process):
+        nlp = self.load()
+        if nlp is None:
+            return SEGMENTERS["regex"].segment(texts, batch_size, n_process)
+        paragraphs = []
+        sentences = []
+        for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+            doc_paragraphs, doc_sentences = split_doc(doc)
+            with _stage("filter"):
+                paragraphs.extend(span.text for span in doc_paragraphs if is_meaningful_span(span))
+                sentences.extend(span.text.strip() for span in doc_sentences if is_meaningful_span(span))
+        return paragraphs, sentences
+
+class SentencizerSegmenter(Segmenter):
+    """Rule-based spaCy sentencizer on a blank English pipeline; no model needed."""
+
+    name = "sentencizer"
+
+    def __init__(self):
+        self.nlp = None
+
+    def load(self):
+        spacy = load_spacy() if self.nlp is None else None
+        if spacy is not None:
+            self.nlp = spacy.blank("en")
+            self.nlp.add_pipe("sentencizer")
+        return self.nlp
+
+    def filter(self, fragments: List[str]) -> List[str]:
+        return [fragment for fragment in fragments if is_meaningful_text(fragment)]
+
+    def segment(self, texts, batch_size, n_process):
+        nlp = self.load()
+        paragraphs = []
+        sentences = []
+        if nlp is None:
+            for text in texts:
+                paragraphs.append(text)
+                sentences.extend(re.split(r'(?<=[.!?])\s+', text))
+        else:
+            for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+                doc_paragraphs, doc_sentences = split_doc(doc)
+                paragraphs.extend(span.text for span in doc_paragraphs)
+                sentences.extend(span.text.strip() for span in doc_sentences)
+        with _stage("filter"):
+            return self.filter(paragraphs), self.filter(sentences)
+
+class FastSegmenter(SentencizerSegmenter):
+    """Sentencizer segmentation with the vectorized lexicon filter instead of a tagger.
+
+    Meant for bulk corpus building: an order of magnitude faster than the
+    spaCy segmenter, at the cost of some disagreement on borderline fragments.
+    """
+
+    name = "fast"
+
+    def filter(self, fragments):
+        return filter_fragments(fragments)
+
+SEGMENTERS: Dict[str, Segmenter] = {
+    segmenter.name: segmenter
+    for segmenter in (SpacySegmenter(), SentencizerSegmenter(), FastSegmenter(), RegexSegmenter())
+}
+
+# Extraction modes are presets over the segmenters
+EXTRACTION_MODES = {
+    "full": DEFAULT_SEGMENTER,
+    "fast": "fast",
+}
+
+def get_segmenter(name: Optional[str] = None) -> Segmenter:
+    name = name or DEFAULT_SEGMENTER
+    if name not in SEGMENTERS:
+        raise ValueError(f"Unknown segmenter: {name}")
+    return SEGMENTERS[name]
+
+def get_nlp():
+    return SEGMENTERS["spacy"].load()
+
+def extract_fragments(pages: Iterable[str], batch_size: int = SPACY_BATCH_SIZE, n_process: int = SPACY_N_PROCESS,
+                      segmenter: Optional[str] = None) -> Tuple[List[str], List[str]]:
+    """Return the meaningful (paragraphs, sentences) of a document's pages.
+
+    Each cleaned page is segmented exactly once; with the spaCy segmenter the
+    paragraphs, sentences and noun/verb/length/alpha-ratio filter all come
+    from that one parse.
+    """
+    return get_segmenter(segmenter).segment(_cleaned(pages), batch_size, n_process)
+
+def _cleaned(pages):
+    for page in pages:
+        with _stage("clean"):
+            cleaned = clean_text(page)
+        if cleaned:
+            yield cleaned
+
+def _package_version(name):
+    # Read from the installed metadata, so the cache key does not import the package
     try:
-        doc = Document(file_path)
-        for para in doc.paragraphs:
-            sentences.extend([sentence.strip() for sentence in para.text.split('.') if sentence.strip()])
-    except Exception as e:
-        logger.error(f"Error extracting text from DOCX {file_path}: {str(e)}")
-        return [f"[Error extracting text from DOCX: {str(e)}]"]
-    return sentences
-
-def extract_from_txt(file_path: Path) -> List[str]:
-    sentences = []
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+def pipeline_signature():
+    return {
+        "extractor_version": EXTRACTOR_VERSION,
+        "clean_pattern": CLEAN_PATTERN,
+        "spacy_version": _package_version("spacy"),
+        "spacy_model": SPACY_MODEL,
+        "disabled_components": DISABLED_COMPONENTS,
+        "pdf_pages_per_task": PDF_PAGES_PER_TASK,
+    }
+
+def _collected(items, collected):
+    for item in items:
+        collected.append(item)
+        yield item
+
+def _parsed(pages, stopwatch):
+    # Pages are read lazily, so reading is timed page by page
+    pages = iter(pages)
+    while True:
+        with stopwatch("parse"):
+            page = next(pages, None)
+        if page is None:
+            return
+        yield page
+
+def extract_file(file_path, n_process: int = SPACY_N_PROCESS, pdf_backend: Optional[str] = None,
+                 page_range: Optional[Tuple[int, int]] = None, segmenter: Optional[str] = None):
+    # Pages stream from the reader through cleaning into the segmenter; only
+    # this file's raw page text (kept for the extraction cache) and filtered
+    # fragments are held in memory. "timings" holds the seconds spent in each
+    # stage; segmentation is what is left once reading, cleaning and filtering
+    # (which run inside it) are taken out.
+    stopwatch = Stopwatch()
+    page_texts = []
+    pages = _collected(_parsed(extract_text_with_layout(str(file_path), pdf_backend, page_range), stopwatch),
+                       page_texts)
+    _timing.stopwatch = stopwatch
+    started = time.perf_counter()
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-            sentences.extend([sentence.strip() for sentence in text.split('.') if sentence.strip()])
-    except Exception as e:
-        logger.error(f"Error extracting text from TXT {file_path}: {str(e)}")
-        return [f"[Error extracting text from TXT: {str(e)}]"]
-    return sentences
\ No newline at end of file
+        paragraphs, sentences = extract_fragments(pages, n_process=n_process, segmenter=segmenter)
+    finally:
+        _timing.stopwatch = None
+    stopwatch.add("segment", time.perf_counter() - started - sum(stopwatch.seconds.values()))
+    return {"pages": len(page_texts), "page_texts": page_texts, "paragraphs": paragraphs, "sentences": sentences,
+            "timings": stopwatch.seconds}
+
+def merge_results(results):
+    # Page ranges of one document, in page order, combine into the same
+    # result a single whole-document extraction would have produced.
+    merged = {"pages": 0, "page_texts": [], "paragraphs": [], "sentences": [], "timings": {}}
+    for result in results:
+        merged["pages"] += result["pages"]
+        for key in ("page_texts", "paragraphs", "sentences"):
+            merged[key].extend(result[key])
+        for stage, seconds in result.get("timings", {}).items():
+            merged["timings"][stage] = merged["timings"].get(stage, 0.0) + seconds
+    return merged
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from config import UPLOAD_DIR, FILE_CATALOG_PATH
+from services.extraction_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLASSIFICATION = "Unclassified"
+
+FILE_TYPES = {'.pdf': 'PDF', '.docx': 'DOCX', '.txt': 'TXT'}
+
+# Sort keys accepted by list_entries, mapped to catalog columns
+SORT_COLUMNS = {
+    "name": "name COLLATE NOCASE",
+    "size": "size",
+    "uploadDate": "mtime",
+    "type": "type",
+    "securityClassification": "security_classification",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    sha256 TEXT,
+    security_classification TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent, name);
+CREATE INDEX IF NOT EXISTS entries_parent_type ON entries (parent, type);
+CREATE INDEX IF NOT EXISTS entries_parent_classification ON entries (parent, security_classification);
+CREATE TABLE IF NOT EXISTS catalog_state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+ENTRY_COLUMNS = ("path", "parent", "name", "type", "size", "mtime", "sha256", "security_classification")
+
+# Python equivalents of SORT_COLUMNS, for listings read from disk
+SORT_KEYS = {
+    "name": lambda entry: entry["name"].lower(),
+    "size": lambda entry: entry["size"],
+    "uploadDate": lambda entry: entry["mtime"],
+    "type": lambda entry: entry["type"],
+    "securityClassification": lambda entry: entry["security_classification"],
+}
+
+def get_file_type(file_name: str) -> str:
+    return FILE_TYPES.get(Path(file_name).suffix.lower(), 'Unknown')
+
+def read_classification(file_path: Path) -> str:
+    metadata_path = Path(file_path).with_suffix('.metadata')
+    if metadata_path.exists():
+        try:
+            with open(metadata_path, 'r') as f:
+                return json.load(f).get("security_classification", DEFAULT_CLASSIFICATION)
+        except (OSError, ValueError):
+            logger.warning(f"Unreadable metadata file {metadata_path}")
+    return DEFAULT_CLASSIFICATION
+
+class FileCatalog:
+    """SQLite index of everything under UPLOAD_DIR.
+
+    Rows are keyed by POSIX path relative to UPLOAD_DIR ("" is the root, and
+    is never stored). Routes that change files keep the catalog current;
+    `reconcile()` picks up changes made behind the API's back. `.metadata`
+    sidecars stay the source of truth for classification and are only read
+    when a file is (re)indexed.
+
+    Until the first reconcile has recorded what is on disk, listings are read
+    from the directory itself.
+    """
+
+    def __init__(self, db_path: Path, root: Path):
+        self.db_path = Path(db_path)
+        self.root = Path(root)
+        self._lock = threading.RLock()
+        self._conn = None
+        self._reconciled = False
+        # Called with no arguments after files are added, changed or removed
+        self.listeners: List[Callable[[], None]] = []
+
+    def _changed(self):
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"File catalog listener failed: {str(e)}")
+
+    def _connection(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _relative(self, path) -> str:
+        path = Path(path)
+        if path.is_absolute():
+            path = path.resolve().relative_to(self.root.resolve())
+        relative = path.as_posix()
+        return "" if relative == "." else relative
+
+    @staticmethod
+    def _parent(relative: str) -> str:
+        return relative.rsplit("/", 1)[0] if "/" in relative else ""
+
+    def _file_row(self, relative: str, sha256: Optional[str] = None, known=None, hash_file: bool = True):
+        # With hash_file=False a new or changed file is stored without a hash, to be hashed by _hash_pending
+        full_path = self.root / relative
+        stats = full_path.stat()
+        unchanged = known is not None and known["size"] == stats.st_size and known["mtime"] == stats.st_mtime
+        if sha256 is None:
+            if unchanged and known["sha256"]:
+                sha256 = known["sha256"]
+            elif hash_file:
+                sha256 = file_sha256(full_path)
+        return (relative, self._parent(relative), full_path.name, get_file_type(full_path.name),
+                stats.st_size, stats.st_mtime, sha256, read_classification(full_path))
+
+    def _folder_row(self, relative: str):
+        return (relative, self._parent(relative), Path(relative).name, "folder", None, None, None, None)
+
+    def _upsert_rows(self, rows):
+        self._connection().executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _ensure_parents(self, relative: str):
+        parent = self._parent(relative)
+        rows = []
+        while parent:
+            rows.append(self._folder_row(parent))
+            parent = self._parent(parent)
+        self._upsert_rows(rows)
+
+    def _known(self, relative: str):
+        return self._connection().execute("SELECT * FROM entries WHERE path = ?", (relative,)).fetchone()
+
+    def upsert_file(self, path, sha256: Optional[str] = None):
+        relative = self._relative(path)
+        with self._lock:
+            known = self._known(relative)
+        row = self._file_row(relative, sha256, known)
+        with self._lock, self._connection():
+            self._ensure_parents(relative)
+            self._upsert_rows([row])
+        self._changed()
+
+    def upsert_folder(self, path):
+        relative = self._relative(path)
+        with self._lock, self._connection():
+            self._ensure_parents(relative)
+            self._upsert_rows([self._folder_row(relative)])
+
+    def remove(self, path):
+        """Drop a file, or a folder and everything below it."""
+        relative = self._relative(path)
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM entries WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                         (relative, self._escape(relative) + "/%"))
+        self._changed()
+
+    def move(self, old_path, new_path):
+        """Re-key a file or folder subtree after a rename or move, keeping hashes."""
+        old, new = self._relative(old_path), self._relative(new_path)
+        with self._lock, self._connection() as conn:
+            rows = conn.execute("SELECT * FROM entries WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                                (old, self._escape(old) + "/%")).fetchall()
+            conn.execute("DELETE FROM entries WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                         (old, self._escape(old) + "/%"))
+            moved = []
+            for row in rows:
+                relative = new + row["path"][len(old):]
+                name = Path(relative).name
+                file_type = row["type"] if row["type"] == "folder" else get_file_type(name)
+                moved.append((relative, self._parent(relative), name, file_type, row["size"], row["mtime"],
+                              row["sha256"], row["security_classification"]))
+            self._ensure_parents(new)
+            self._upsert_rows(moved)
+        # Sidecars travel with (or stay behind) their files; refresh from disk
+        if (self.root / new).is_file():
+            self.upsert_file(self.root / new)
+        else:
+            self._changed()
+
+    def set_classification(self, path, classification: str):
+        relative = self._relative(path)
+        with self._lock, self._connection() as conn:
+            conn.execute("UPDATE entries SET security_classification = ? WHERE path = ?", (classification, relative))
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def list_entries(self, folder: str = "", offset: int = 0, limit: Optional[int] = None, sort: str = "name",
+                     descending: bool = False, file_type: Optional[str] = None,
+                     classification: Optional[str] = None) -> Tuple[int, List[dict]]:
+        """Return (total matching, page of entries) of one folder; folders sort before files."""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        if not self.is_reconciled():
+            return self._list_directory(folder, offset, limit, sort, descending, file_type, classification)
+        conditions = ["parent = ?"]
+        params = [self._relative(folder)]
+        if file_type:
+            conditions.append("type = ? COLLATE NOCASE")
+            params.append(file_type)
+        if classification:
+            conditions.append("security_classification = ?")
+            params.append(classification)
+        where = " AND ".join(conditions)
+        direction = "DESC" if descending else "ASC"
+        query = (f"SELECT * FROM entries WHERE {where} "
+                 f"ORDER BY type != 'folder', {SORT_COLUMNS[sort]} {direction}, name LIMIT ? OFFSET ?")
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(f"SELECT COUNT(*) FROM entries WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(query, params + [-1 if limit is None else limit, offset]).fetchall()
+        return total, [dict(row) for row in rows]
+
+    def _list_directory(self, folder, offset, limit, sort, descending, file_type, classification):
+        """list_entries read straight from disk, for before the catalog is first filled."""
+        relative_folder = self._relative(folder)
+        entries = []
+        with os.scandir(self.root / relative_folder) as scan:
+            for item in scan:
+                relative = f"{relative_folder}/{item.name}" if relative_folder else item.name
+                try:
+                    if item.is_dir():
+                        entries.append(dict(zip(ENTRY_COLUMNS, self._folder_row(relative))))
+                    elif not item.name.endswith('.metadata'):
+                        stats = item.stat()
+                        entries.append(dict(zip(ENTRY_COLUMNS, (
+                            relative, relative_folder, item.name, get_file_type(item.name), stats.st_size,
+                            stats.st_mtime, None, read_classification(item.path)))))
+                except OSError:
+                    continue  # Removed mid-listing
+        if file_type:
+            entries = [entry for entry in entries if entry["type"].lower() == file_type.lower()]
+        if classification:
+            entries = [entry for entry in entries if entry["security_classification"] == classification]
+        key = SORT_KEYS[sort]
+        # Stable sorts, innermost key first, as in the catalog query
+        entries.sort(key=lambda entry: entry["name"])
+        entries.sort(key=lambda entry: (key(entry) is not None, key(entry)), reverse=descending)
+        entries.sort(key=lambda entry: entry["type"] != "folder")
+        end = None if limit is None else offset + limit
+        return len(entries), entries[offset:end]
+
+    def file_hashes(self) -> Dict[str, str]:
+        """Return {relative path: sha256} of every cataloged file; sha256 is None until the file is hashed."""
+        with self._lock:
+            rows = self._connection().execute("SELECT path, sha256 FROM entries WHERE type != 'folder'").fetchall()
+        return {row["path"]: row["sha256"] for row in rows}
+
+    def is_reconciled(self) -> bool:
+        if not self._reconciled:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT value FROM catalog_state WHERE key = 'last_reconciled'").fetchone()
+            self._reconciled = row is not None
+        return self._reconciled
+
+    def reconcile(self):
+        """Bring the catalog in line with the files on disk.
+
+        The walk only stats files, so listings come from the catalog as soon
+        as it is done; new and changed files are hashed afterwards.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            known = {row["path"]: row for row in self._connection().execute("SELECT * FROM entries")}
+        seen = set()
+        added = updated = 0
+        for root, dirs, files in os.walk(self.root):
+            relative_root = self._relative(root)
+            rows = []
+            for name in dirs:
+                relative = f"{relative_root}/{name}" if relative_root else name
+                seen.add(relative)
+                if relative not in known:
+                    rows.append(self._folder_row(relative))
+            for name in files:
+                if name.endswith('.metadata'):
+                    continue
+                relative = f"{relative_root}/{name}" if relative_root else name
+                seen.add(relative)
+                try:
+                    row = self._file_row(relative, known=known.get(relative), hash_file=False)
+                except OSError:
+                    continue  # Removed mid-scan
+                previous = known.get(relative)
+                if previous is None:
+                    added += 1
+                elif tuple(previous) == row:
+                    continue
+                else:
+                    updated += 1
+                rows.append(row)
+            if rows:
+                with self._lock, self._connection():
+                    self._upsert_rows(rows)
+        removed = [path for path in known if path not in seen]
+        with self._lock, self._connection() as conn:
+            conn.executemany("DELETE FROM entries WHERE path = ?", [(path,) for path in removed])
+            conn.execute("INSERT OR REPLACE INTO catalog_state VALUES ('last_reconciled', ?)", (str(time.time()),))
+        self._reconciled = True
+        self._changed()
+        logger.info(f"File catalog reconciled in {time.perf_counter() - start:.2f}s: "
+                     f"{added} added, {updated} updated, {len(removed)} removed")
+        hashed = self._hash_pending()
+        if hashed:
+            self._changed()
+            logger.info(f"File catalog hashed {hashed} new or changed files in {time.perf_counter() - start:.2f}s")
+
+    def _hash_pending(self) -> int:
+        with self._lock:
+            pending = self._connection().execute(
+                "SELECT path, size, mtime FROM entries WHERE type != 'folder' AND sha256 IS NULL").fetchall()
+        hashed = 0
+        for row in pending:
+            try:
+                sha256 = file_sha256(self.root / row["path"])
+            except OSError:
+                continue  # Removed since the walk; the next reconcile drops it
+            # Only if the file is still the one that was walked; a change through the API re-hashed it already
+            with self._lock, self._connection() as conn:
+                hashed += conn.execute("UPDATE entries SET sha256 = ? WHERE path = ? AND size = ? AND mtime = ? "
+                                       "AND sha256 IS NULL", (sha256, row["path"], row["size"], row["mtime"])).rowcount
+        return hashed
+
+    def start_reconcile(self):
+        # Always in the background, so startup never waits on a walk of
+        # UPLOAD_DIR; listings fall back to reading the directory meanwhile.
+        threading.Thread(target=self._reconcile_logged, name="catalog-reconcile", daemon=True).start()
+
+    def _reconcile_logged(self):
+        try:
+            self.reconcile()
+        except Exception as e:
+            logger.error(f"File catalog reconciliation failed: {str(e)}")
+
+file_catalog = FileCatalog(FILE_CATALOG_PATH, UPLOAD_DIR)
@@ -0,0 +1,437 @@
+import os
+import sys
+import json
+import time
+import uuid
+import heapq
+import logging
+import threading
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+import psutil
+from config import (DATASET_DIR, BASE_MODELS_DIR, FINE_TUNED_MODELS_DIR, FINE_TUNE_JOURNAL_PATH, FINE_TUNE_CPU_BUDGET,
+                    FINE_TUNE_MEMORY_BUDGET_MB, FINE_TUNE_NICE, FINE_TUNE_STOP_TIMEOUT, FINE_TUNE_MONITOR_INTERVAL,
+                    FINE_TUNE_METRICS_KEPT, FINE_TUNE_TRAINERS)
+from services.job_manager import QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED, INTERRUPTED, FINISHED_STATES
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RUN_CONFIG_FILE = "run_config.json"
+METRICS_FILE = "metrics.jsonl"
+TRAINER_LOG_FILE = "trainer.log"
+CHECKPOINT_DIR = "checkpoints"
+BASE_MODEL_SUFFIXES = (".modelfile", ".gguf")
+# Thread pools of numpy/BLAS/torch follow these, which keeps a trainer to its declared CPUs
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+# Progress updates are journaled at most this often; state changes always are
+JOURNAL_INTERVAL = 5.0
+
+def resolve_base_model(name: str) -> Optional[Path]:
+    for suffix in BASE_MODEL_SUFFIXES:
+        path = BASE_MODELS_DIR / f"{name}{suffix}"
+        if path.is_file():
+            return path
+    return None
+
+def run_dir(run_name: str) -> Path:
+    return FINE_TUNED_MODELS_DIR / run_name
+
+def _parse_event(line: str) -> Optional[dict]:
+    # Anything a trainer prints that isn't a JSON event goes to its log
+    if not line.startswith("{"):
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and "event" in event else None
+
+class FineTuneScheduler:
+    """Runs fine-tuning jobs one trainer subprocess each.
+
+    Jobs declare the CPUs and memory they need. Queued jobs start highest
+    priority first (oldest first within a priority) while the declared
+    totals of the running jobs fit within the budgets; the queue head waits
+    rather than being overtaken, so a large job is not starved by smaller
+    ones behind it.
+
+    A trainer is started as `python -m <module> --config <run_config.json>`
+    from the backend directory and prints JSON events, one per line, to
+    stdout: {"event": "metrics", "step", "total_steps", "loss", ...},
+    {"event": "checkpoint", "step", "path"} and a final {"event": "done", ...}.
+    On SIGTERM it should write a checkpoint and exit; with "resume" in its
+    config it continues from the run's latest checkpoint.
+    """
+
+    def __init__(self, journal_path: Path, cpu_budget: int, memory_budget_mb: int):
+        self._journal_path = journal_path
+        self.cpu_budget = cpu_budget
+        self.memory_budget_mb = memory_budget_mb
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        self._queue = []  # heap of (-priority, sequence, job id)
+        self._sequence = 0
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._watchers: Dict[str, threading.Thread] = {}
+        self._metrics: Dict[str, deque] = {}
+        self._stop_requested = set()
+        self._last_journaled: Dict[str, float] = {}
+        self._monitor = None
+        self._shutting_down = False
+
+    def submit(self, params: dict) -> dict:
+        if params["trainer"] not in FINE_TUNE_TRAINERS:
+            raise ValueError(f"Unknown trainer: {params['trainer']}")
+        if params["cpus"] > self.cpu_budget or params["memory_mb"] > self.memory_budget_mb:
+            raise ValueError(f"Job needs more than the fine-tuning budget of {self.cpu_budget} CPUs "
+                             f"and {self.memory_budget_mb} MB")
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "params": params,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._enqueue(job)
+            self._journal(job)
+            self._schedule()
+        logger.info(f"Queued fine-tuning job {job['id']} ({params['run_name']}, priority {params['priority']})")
+        return self.get(job["id"])
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [self._snapshot(job) for job in self._jobs.values()]
+
+    def active_job(self, run_name: str) -> Optional[dict]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job["params"]["run_name"] == run_name and job["status"] not in FINISHED_STATES:
+                    return self._snapshot(job)
+        return None
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == QUEUED:
+                # Left in the heap; _schedule() skips it
+                self._finish(job, CANCELLED)
+            elif job["status"] == RUNNING:
+                self._stop(job_id)
+            return self._snapshot(job)
+
+    def resources(self) -> dict:
+        with self._lock:
+            cpus, memory_mb = self._in_use()
+            return {
+                "cpu_budget": self.cpu_budget,
+                "memory_budget_mb": self.memory_budget_mb,
+                "cpus_in_use": cpus,
+                "memory_mb_in_use": memory_mb,
+                "running": len(self._processes),
+                "queued": sum(1 for job in self._jobs.values() if job["status"] == QUEUED),
+            }
+
+    def metrics(self, job_id: str, after: int = 0) -> List[dict]:
+        """Events of a job with a sequence number above `after`, oldest first."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return []
+            events = self._metrics.get(job_id)
+            if events is not None:
+                return [event for event in events if event["seq"] > after]
+        # Jobs from before a restart: read back the run's metrics file
+        metrics_path = run_dir(job["params"]["run_name"]) / METRICS_FILE
+        if not metrics_path.exists():
+            return []
+        events = deque(maxlen=FINE_TUNE_METRICS_KEPT)
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                event = _parse_event(line)
+                if event is not None and event.get("job_id") == job_id and event.get("seq", 0) > after:
+                    events.append(event)
+        return list(events)
+
+    def _enqueue(self, job):
+        self._sequence += 1
+        heapq.heappush(self._queue, (-job["params"]["priority"], self._sequence, job["id"]))
+
+    def _in_use(self):
+        running = [self._jobs[job_id]["params"] for job_id in self._processes]
+        return sum(params["cpus"] for params in running), sum(params["memory_mb"] for params in running)
+
+    def _schedule(self):
+        # Called with the lock held
+        while self._queue and not self._shutting_down:
+            job = self._jobs[self._queue[0][2]]
+            if job["status"] != QUEUED:
+                heapq.heappop(self._queue)
+                continue
+            cpus, memory_mb = self._in_use()
+            if (cpus + job["params"]["cpus"] > self.cpu_budget
+                    or memory_mb + job["params"]["memory_mb"] > self.memory_budget_mb):
+                break
+            heapq.heappop(self._queue)
+            self._start(job)
+
+    def _start(self, job):
+        params = job["params"]
+        output_dir = run_dir(params["run_name"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        base_model_path = resolve_base_model(params["base_model"])
+        config_path = output_dir / RUN_CONFIG_FILE
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "job_id": job["id"],
+                "dataset_path": str(DATASET_DIR / params["dataset"]),
+                "base_model": params["base_model"],
+                "base_model_path": str(base_model_path) if base_model_path else None,
+                "output_dir": str(output_dir),
+                "checkpoint_dir": str(output_dir / CHECKPOINT_DIR),
+                "resume": params["resume"],
+                "cpus": params["cpus"],
+                "hyperparameters": params["hyperparameters"],
+            }, f, indent=2)
+
+        env = dict(os.environ, PYTHONUNBUFFERED="1", **{name: str(params["cpus"]) for name in THREAD_ENV_VARS})
+        log = open(output_dir / TRAINER_LOG_FILE, 'a', encoding='utf-8')
+        try:
+            # Own session: a Ctrl-C meant for the server doesn't reach the trainers; shutdown() stops them
+            process = subprocess.Popen(
+                [sys.executable, "-m", FINE_TUNE_TRAINERS[params["trainer"]], "--config", str(config_path)],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=log, text=True, encoding='utf-8',
+                start_new_session=True)
+        except OSError as e:
+            log.close()
+            job["error"] = f"Could not start trainer: {str(e)}"
+            self._finish(job, FAILED)
+            return
+        try:
+            psutil.Process(process.pid).nice(FINE_TUNE_NICE)
+        except (psutil.Error, OSError) as e:
+            logger.warning(f"Could not lower the priority of trainer {process.pid}: {str(e)}")
+
+        job["status"] = RUNNING
+        job["started_at"] = time.time()
+        job["progress"]["pid"] = process.pid
+        self._processes[job["id"]] = process
+        self._metrics[job["id"]] = deque(maxlen=FINE_TUNE_METRICS_KEPT)
+        self._journal(job)
+        watcher = threading.Thread(target=self._watch, args=(job["id"], process, log),
+                                   name=f"fine-tune-{job['id'][:8]}", daemon=True)
+        self._watchers[job["id"]] = watcher
+        watcher.start()
+        # Called with the lock held; the monitor clears _monitor under the same lock as it exits
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._monitor_memory, name="fine-tune-monitor", daemon=True)
+            self._monitor.start()
+        logger.info(f"Started fine-tuning job {job['id']} as process {process.pid}")
+
+    def _watch(self, job_id, process, log):
+        job = self._jobs[job_id]
+        last_event = None
+        lost = None
+        try:
+            metrics_path = run_dir(job["params"]["run_name"]) / METRICS_FILE
+            with open(metrics_path, 'a', encoding='utf-8') as metrics_file:
+                for line in process.stdout:
+                    event = _parse_event(line)
+                    if event is None:
+                        log.write(line)
+                        log.flush()
+                        continue
+                    last_event = event
+                    self._record(job_id, event, metrics_file)
+        except Exception as e:
+            # A trainer nobody reads from would block on a full pipe; stop it so its budget is released
+            lost = f"Lost track of the trainer: {str(e)}"
+            logger.error(f"Fine-tuning job {job_id}: {lost}")
+            process.kill()
+        finally:
+            returncode = process.wait()
+            process.stdout.close()
+            log.close()
+            self._reaped(job, returncode, last_event, lost)
+
+    def _reaped(self, job, returncode, last_event, lost):
+        job_id = job["id"]
+        with self._lock:
+            self._processes.pop(job_id, None)
+            self._watchers.pop(job_id, None)
+            job["progress"].pop("pid", None)
+            if lost:
+                job["error"] = lost
+                self._finish(job, FAILED)
+            elif job["error"]:
+                # Stopped by the memory monitor
+                self._finish(job, FAILED)
+            elif job_id in self._stop_requested:
+                # Jobs stopped by a shutdown were not cancelled by anyone
+                self._finish(job, INTERRUPTED if self._shutting_down else CANCELLED)
+            elif returncode == 0 and last_event is not None and last_event["event"] == "done":
+                job["result"] = {key: value for key, value in last_event.items() if key not in ("event", "seq")}
+                self._finish(job, COMPLETED)
+            elif last_event is not None and last_event["event"] == "error":
+                job["error"] = last_event.get("detail") or f"Trainer exited with code {returncode}"
+                self._finish(job, FAILED)
+            else:
+                job["error"] = f"Trainer exited with code {returncode}: {self._log_tail(job)}"
+                self._finish(job, FAILED)
+            self._stop_requested.discard(job_id)
+            self._schedule()
+
+    def _record(self, job_id, event, metrics_file):
+        with self._lock:
+            job = self._jobs[job_id]
+            events = self._metrics[job_id]
+            event["seq"] = events[-1]["seq"] + 1 if events else 1
+            event["job_id"] = job_id
+            event.setdefault("time", time.time())
+            events.append(event)
+            if event["event"] == "metrics":
+                job["progress"].update({key: value for key, value in event.items()
+                                        if key not in ("event", "seq", "job_id", "time")})
+            elif event["event"] == "checkpoint":
+                job["progress"]["last_checkpoint"] = event.get("path")
+            if time.time() - self._last_journaled.get(job_id, 0) >= JOURNAL_INTERVAL:
+                self._journal(job)
+        metrics_file.write(json.dumps(event) + "\n")
+        metrics_file.flush()
+
+    def _log_tail(self, job, lines: int = 5) -> str:
+        log_path = run_dir(job["params"]["run_name"]) / TRAINER_LOG_FILE
+        try:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                return " | ".join(line.strip() for line in deque(f, maxlen=lines) if line.strip())
+        except OSError:
+            return ""
+
+    def _stop(self, job_id):
+        # Called with the lock held. SIGTERM lets the trainer checkpoint; it is killed if it takes too long
+        process = self._processes.get(job_id)
+        if process is None or job_id in self._stop_requested:
+            return
+        self._stop_requested.add(job_id)
+        process.terminate()
+        timer = threading.Timer(FINE_TUNE_STOP_TIMEOUT, lambda: process.poll() is None and process.kill())
+        timer.daemon = True
+        timer.start()
+        logger.info(f"Stopping fine-tuning job {job_id}")
+
+    def _monitor_memory(self):
+        while True:
+            with self._lock:
+                running = [(job_id, process.pid) for job_id, process in self._processes.items()]
+                if not running:
+                    # Decided under the lock, so a job started from now on starts a new monitor
+                    self._monitor = None
+                    return
+            for job_id, pid in running:
+                try:
+                    process = psutil.Process(pid)
+                    rss = process.memory_info().rss + sum(child.memory_info().rss
+                                                          for child in process.children(recursive=True))
+                except psutil.Error:
+                    continue
+                with self._lock:
+                    job = self._jobs[job_id]
+                    if job["status"] != RUNNING:
+                        continue
+                    used_mb = rss / (1024 * 1024)
+                    job["progress"]["memory_mb"] = round(used_mb)
+                    if used_mb > job["params"]["memory_mb"] and job_id not in self._stop_requested:
+                        job["error"] = (f"Trainer used {used_mb:.0f} MB, over the {job['params']['memory_mb']} MB "
+                                        "it declared")
+                        logger.warning(f"Fine-tuning job {job_id}: {job['error']}")
+                        self._stop(job_id)
+            time.sleep(FINE_TUNE_MONITOR_INTERVAL)
+
+    def _snapshot(self, job):
+        snapshot = json.loads(json.dumps(job))
+        progress = snapshot["progress"]
+        step, total = progress.get("step"), progress.get("total_steps")
+        start_step = progress.get("start_step") or 0
+        if job["status"] == RUNNING and step and total and step > start_step and job["started_at"]:
+            elapsed = time.time() - job["started_at"]
+            progress["eta_seconds"] = round(elapsed / (step - start_step) * (total - step), 1)
+        return snapshot
+
+    def _finish(self, job, status):
+        job["status"] = status
+        job["finished_at"] = time.time()
+        self._journal(job)
+        logger.info(f"Fine-tuning job {job['id']} {status}")
+
+    def _journal(self, job):
+        self._last_journaled[job["id"]] = time.time()
+        try:
+            with open(self._journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps(job) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing fine-tuning journal: {str(e)}")
+
+    def restore(self):
+        """Reload jobs from the journal after a restart.
+
+        Jobs that were running when the process died are marked interrupted
+        (resuming one continues from its last checkpoint); queued jobs are
+        queued again. The journal is then compacted to one line per job.
+        """
+        if not self._journal_path.exists():
+            return
+        jobs = {}
+        with open(self._journal_path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    job = json.loads(line)
+                    jobs[job["id"]] = job
+                except (ValueError, KeyError):
+                    logger.warning("Skipping corrupt fine-tuning journal line")
+
+        with self._lock:
+            for job_id, job in jobs.items():
+                if job["status"] == RUNNING:
+                    job["status"] = INTERRUPTED
+                    job["finished_at"] = time.time()
+                    job["progress"].pop("pid", None)
+                self._jobs[job_id] = job
+            for job in sorted(jobs.values(), key=lambda job: job["created_at"]):
+                if job["status"] == QUEUED:
+                    self._enqueue(job)
+            tmp_path = self._journal_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as journal:
+                for job in self._jobs.values():
+                    journal.write(json.dumps(job) + "\n")
+            tmp_path.replace(self._journal_path)
+            self._schedule()
+        logger.info(f"Restored {len(jobs)} fine-tuning jobs from journal")
+
+    def shutdown(self):
+        """Stop running trainers (they checkpoint first) and mark their jobs interrupted."""
+        with self._lock:
+            self._shutting_down = True
+            for job_id in list(self._processes):
+                self._stop(job_id)
+            watchers = list(self._watchers.values())
+        # One deadline for all of them; the trainers were all signalled at once
+        deadline = time.monotonic() + FINE_TUNE_STOP_TIMEOUT + 5
+        for watcher in watchers:
+            watcher.join(max(0.0, deadline - time.monotonic()))
+
+fine_tune_scheduler = FineTuneScheduler(FINE_TUNE_JOURNAL_PATH, FINE_TUNE_CPU_BUDGET, FINE_TUNE_MEMORY_BUDGET_MB)
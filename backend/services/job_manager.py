@@ -0,0 +1,225 @@
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from config import JOB_JOURNAL_PATH, JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED, INTERRUPTED}
+
+# Progress updates are journaled at most this often; state changes always are
+JOURNAL_INTERVAL = 1.0
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """Handle given to a job runner for reporting progress and checking for cancellation."""
+
+    def __init__(self, manager, job_id):
+        self._manager = manager
+        self.job_id = job_id
+        self.params = manager.get(job_id)["params"]
+        self._cancel_event = manager._cancel_events[job_id]
+
+    def update(self, **progress):
+        self._manager._update_progress(self.job_id, progress)
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+class JobManager:
+    def __init__(self, journal_path, max_workers):
+        self._journal_path = journal_path
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        self._runners: Dict[str, Callable] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._last_journaled: Dict[str, float] = {}
+        self._shutting_down = False
+
+    def register(self, kind: str, runner: Callable):
+        self._runners[kind] = runner
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="job")
+        return self._executor
+
+    def submit(self, kind: str, params: dict) -> dict:
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job type: {kind}")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "params": params,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._cancel_events[job["id"]] = threading.Event()
+            self._journal(job)
+        self._get_executor().submit(self._run, job["id"])
+        logger.info(f"Queued {kind} job {job['id']}")
+        return self.get(job["id"])
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def list(self, kind: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            return [self._snapshot(job) for job in self._jobs.values() if kind is None or job["kind"] == kind]
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] not in FINISHED_STATES:
+                self._cancel_events[job_id].set()
+                if job["status"] == QUEUED:
+                    self._finish(job, CANCELLED)
+            return self._snapshot(job)
+
+    def queue_depth(self, kind: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values()
+                       if job["status"] == QUEUED and (kind is None or job["kind"] == kind))
+
+    def status_counts(self) -> Dict[Tuple[str, str], int]:
+        """Number of jobs per (kind, status), without copying them as list() does."""
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                key = (job["kind"], job["status"])
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _snapshot(self, job):
+        snapshot = json.loads(json.dumps(job))
+        progress = snapshot["progress"]
+        done, total = progress.get("files_done"), progress.get("files_total")
+        if job["status"] == RUNNING and done and total and job["started_at"]:
+            elapsed = time.time() - job["started_at"]
+            progress["eta_seconds"] = round(elapsed / done * (total - done), 1)
+        return snapshot
+
+    def _run(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] != QUEUED:
+                return
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+            self._journal(job)
+        try:
+            result = self._runners[job["kind"]](JobContext(self, job_id))
+            with self._lock:
+                job["result"] = result
+                self._finish(job, COMPLETED)
+        except JobCancelled:
+            with self._lock:
+                # Jobs stopped by a shutdown were not cancelled by anyone
+                self._finish(job, INTERRUPTED if self._shutting_down else CANCELLED)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            with self._lock:
+                job["error"] = str(e)
+                self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        job["status"] = status
+        job["finished_at"] = time.time()
+        self._journal(job)
+        logger.info(f"Job {job['id']} {status}")
+
+    def _update_progress(self, job_id, progress):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["progress"].update(progress)
+            if time.time() - self._last_journaled.get(job_id, 0) >= JOURNAL_INTERVAL:
+                self._journal(job)
+
+    def _journal(self, job):
+        self._last_journaled[job["id"]] = time.time()
+        try:
+            with open(self._journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps(job) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing job journal: {str(e)}")
+
+    def restore(self):
+        """Reload jobs from the journal after a restart.
+
+        Jobs that were running when the process died are marked interrupted;
+        jobs still waiting in the queue are queued again. The journal is then
+        compacted to one line per job.
+        """
+        if not self._journal_path.exists():
+            return
+        jobs = {}
+        with open(self._journal_path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    job = json.loads(line)
+                    jobs[job["id"]] = job
+                except (ValueError, KeyError):
+                    logger.warning("Skipping corrupt job journal line")
+
+        requeue = []
+        with self._lock:
+            for job_id, job in jobs.items():
+                if job["status"] == RUNNING:
+                    job["status"] = INTERRUPTED
+                    job["finished_at"] = time.time()
+                elif job["status"] == QUEUED:
+                    requeue.append(job_id)
+                self._jobs[job_id] = job
+                self._cancel_events[job_id] = threading.Event()
+            tmp_path = self._journal_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as journal:
+                for job in self._jobs.values():
+                    journal.write(json.dumps(job) + "\n")
+            tmp_path.replace(self._journal_path)
+
+        for job_id in requeue:
+            if jobs[job_id]["kind"] in self._runners:
+                self._get_executor().submit(self._run, job_id)
+        logger.info(f"Restored {len(jobs)} jobs from journal, requeued {len(requeue)}")
+
+    def shutdown(self):
+        with self._lock:
+            self._shutting_down = True
+            for event in self._cancel_events.values():
+                event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+job_manager = JobManager(JOB_JOURNAL_PATH, JOB_WORKERS)
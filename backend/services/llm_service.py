@@ -1,15 +1,108 @@
-import ollama
-import os
-from config import BASE_MODELS_DIR
+import sys
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from config import (BASE_MODELS_DIR, OLLAMA_HOST, LLM_MAX_CONNECTIONS, LLM_MODEL_CONCURRENCY, LLM_CONNECT_TIMEOUT,
+                    LLM_REQUEST_TIMEOUT)
+from services.response_cache import response_cache, response_key, is_deterministic
+from services.model_registry import model_registry
+from utils.metrics import Counter, Gauge, Histogram, TOKEN_RATE_BUCKETS
 import logging
 
 logger = logging.getLogger(__name__)
 
-def initialize_model(model_name):
+# One client for the whole server, so connections to Ollama are pooled and
+# kept alive between requests. Created on first use inside the event loop.
+_client = None
+# Per-model semaphores: a burst of requests for one model queues here
+# instead of piling onto Ollama or starving the other models.
+_model_slots = {}
+
+STAT_FIELDS = ("total_duration", "load_duration", "prompt_eval_count", "eval_count", "eval_duration")
+
+OLLAMA_LATENCY = Histogram("ollama_request_duration_seconds",
+                           "Wall time of Ollama calls, from sending the request to the last token.", ["model", "kind"])
+OLLAMA_ERRORS = Counter("ollama_request_errors_total", "Ollama calls that failed.", ["model", "kind"])
+OLLAMA_TOKENS = Counter("ollama_tokens_total", "Tokens Ollama evaluated, from prompt_eval_count and eval_count.",
+                        ["model", "kind", "phase"])
+OLLAMA_TOKEN_RATE = Histogram("ollama_eval_tokens_per_second", "Generation speed reported by Ollama "
+                              "(eval_count / eval_duration).", ["model"], buckets=TOKEN_RATE_BUCKETS)
+OLLAMA_LOAD = Histogram("ollama_load_duration_seconds", "Time Ollama spent loading the model for a call.", ["model"])
+SLOT_WAITING = Gauge("ollama_requests_waiting", "Requests queued for one of a model's LLM_MODEL_CONCURRENCY slots.",
+                     ["model"])
+SLOT_ACTIVE = Gauge("ollama_requests_active", "Requests holding a model slot.", ["model"])
+
+def record_ollama_call(model_name, kind, seconds, stats):
+    """Record a finished Ollama call from its wall time and the counters of its final response."""
+    OLLAMA_LATENCY.observe(seconds, model=model_name, kind=kind)
+    prompt_tokens = stats.get("prompt_eval_count") or 0
+    eval_tokens = stats.get("eval_count") or 0
+    OLLAMA_TOKENS.inc(prompt_tokens, model=model_name, kind=kind, phase="prompt")
+    OLLAMA_TOKENS.inc(eval_tokens, model=model_name, kind=kind, phase="eval")
+    # Durations are in nanoseconds
+    eval_duration = stats.get("eval_duration")
+    if eval_tokens and eval_duration:
+        OLLAMA_TOKEN_RATE.observe(eval_tokens / eval_duration * 1e9, model=model_name)
+    if stats.get("load_duration"):
+        OLLAMA_LOAD.observe(stats["load_duration"] / 1e9, model=model_name)
+
+def get_client() -> "ollama.AsyncClient":
+    global _client
+    if _client is None:
+        # Imported on first use to keep them off the server's import path
+        import httpx
+        import ollama
+        _client = ollama.AsyncClient(
+            host=OLLAMA_HOST,
+            timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        )
+    return _client
+
+def is_timeout(error: BaseException) -> bool:
+    # A timeout can only come from httpx once something has imported it
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, httpx.TimeoutException)
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client._client.aclose()
+        _client = None
+    _model_slots.clear()
+    response_cache.spill_all()
+
+@asynccontextmanager
+async def _model_slot(model_name):
+    slots = _model_slots.get(model_name)
+    if slots is None:
+        slots = _model_slots[model_name] = asyncio.Semaphore(LLM_MODEL_CONCURRENCY)
+    SLOT_WAITING.inc(model=model_name)
+    try:
+        await slots.acquire()
+    finally:
+        SLOT_WAITING.dec(model=model_name)
+    SLOT_ACTIVE.inc(model=model_name)
     try:
-        # Check if the model already exists in Ollama
-        models = ollama.list()
-        if any(model['name'] == model_name for model in models['models']):
+        yield
+    finally:
+        SLOT_ACTIVE.dec(model=model_name)
+        slots.release()
+
+async def model_digest(model_name):
+    """Digest of the model Ollama currently serves under `model_name`, or None if it has none."""
+    if not model_registry.ollama_listed:
+        # Only before the registry's first refresh; afterwards it refreshes in the background
+        await model_registry.refresh()
+    return model_registry.digest(model_name)
+
+async def initialize_model(model_name):
+    try:
+        # Check if the model already exists in Ollama; the registry is asked
+        # again only on a miss, in case the model was created elsewhere
+        if not model_registry.in_ollama(model_name):
+            await model_registry.refresh(force=True)
+        if model_registry.in_ollama(model_name):
             logger.info(f"Model {model_name} is already initialized")
             return
 
@@ -19,63 +112,139 @@ def initialize_model(model_name):
             raise FileNotFoundError(f"Modelfile not found: {modelfile_path}")
 
         # Create the model in Ollama using the existing modelfile
-        ollama.create(model=model_name, path=str(modelfile_path))
+        await get_client().create(model=model_name, path=str(modelfile_path))
+        await model_registry.refresh(force=True)
+        # Replies cached for an earlier build of this model are stale
+        response_cache.invalidate_model(model_name)
         logger.info(f"Model {model_name} initialized successfully")
 
     except Exception as e:
         logger.error(f"Error initializing model: {str(e)}")
         raise
 
-def chat_with_model(model_name, messages, stream=False):
+async def _cache_key(kind, model_name, request_input, options, use_cache):
+    if not use_cache:
+        return None
+    if not is_deterministic(options):
+        response_cache.bypassed += 1
+        return None
+    digest = await model_digest(model_name)
+    return response_key(kind, model_name, digest, request_input, options) if digest else None
+
+def _cache_entry(model_name, kind, chunks, final):
+    return {"model": model_name, "kind": kind, "chunks": chunks,
+            "stats": {field: final.get(field) for field in STAT_FIELDS}}
+
+def _cached_response(entry):
+    content = "".join(entry["chunks"])
+    response = {"model": entry["model"]}
+    if entry["kind"] == "chat":
+        response["message"] = {"role": "assistant", "content": content}
+    else:
+        response["response"] = content
+    return dict(response, **entry["stats"], cached=True)
+
+async def _replay(entry):
+    for content in entry["chunks"]:
+        yield {"content": content}
+    yield dict(entry["stats"], model=entry["model"], done=True, cached=True)
+
+async def chat_with_model(model_name, messages, stream=False, options=None, use_cache=False):
     try:
         logger.info(f"Starting chat with model: {model_name}")
-        response = ollama.chat(model=model_name, messages=messages, stream=stream)
-        
+        key = await _cache_key("chat", model_name, messages, options, use_cache)
+        entry = await response_cache.lookup(key, model_name) if key else None
+        if entry is not None:
+            return _replay(entry) if stream else _cached_response(entry)
         if stream:
-            return _stream_generator(response)
-        else:
-            # For non-streaming, construct a more detailed response
-            return {
-                "model": model_name,
-                "message": response['message'],
-                "total_duration": response['total_duration'],
-                "load_duration": response['load_duration'],
-                "prompt_eval_count": response['prompt_eval_count'],
-                "eval_count": response['eval_count'],
-                "eval_duration": response['eval_duration']
-            }
-    except ollama.ResponseError as e:
-        logger.error(f"Ollama ResponseError in chat_with_model: {str(e)}")
-        raise
+            return _stream_generator(model_name, "chat", lambda: get_client().chat(
+                model=model_name, messages=messages, options=options, stream=True,
+                keep_alive=model_registry.keep_alive_for(model_name)), key)
+
+        async with _model_slot(model_name):
+            started = time.perf_counter()
+            response = await get_client().chat(model=model_name, messages=messages, options=options,
+                                               keep_alive=model_registry.keep_alive_for(model_name))
+        record_ollama_call(model_name, "chat", time.perf_counter() - started, response)
+        if key:
+            await response_cache.store(key, _cache_entry(model_name, "chat", [response['message']['content']], response))
+        # For non-streaming, construct a more detailed response
+        return {
+            "model": model_name,
+            "message": response['message'],
+            "total_duration": response['total_duration'],
+            "load_duration": response['load_duration'],
+            "prompt_eval_count": response['prompt_eval_count'],
+            "eval_count": response['eval_count'],
+            "eval_duration": response['eval_duration']
+        }
     except Exception as e:
-        logger.error(f"Unexpected error in chat_with_model: {str(e)}")
+        OLLAMA_ERRORS.inc(model=model_name, kind="chat")
+        logger.error(f"{type(e).__name__} in chat_with_model: {str(e)}")
         raise
 
-def generate_text(model_name, prompt, stream=False):
+async def generate_text(model_name, prompt, stream=False, options=None, use_cache=False):
     try:
         logger.info(f"Generating text with model: {model_name}")
-        response = ollama.generate(model=model_name, prompt=prompt, stream=stream)
-        
+        key = await _cache_key("generate", model_name, prompt, options, use_cache)
+        entry = await response_cache.lookup(key, model_name) if key else None
+        if entry is not None:
+            return _replay(entry) if stream else _cached_response(entry)
         if stream:
-            return _stream_generator(response)
-        else:
-            # For non-streaming, construct a more detailed response
-            return {
-                "model": model_name,
-                "response": response['response'],
-                "total_duration": response['total_duration'],
-                "load_duration": response['load_duration'],
-                "prompt_eval_count": response['prompt_eval_count'],
-                "eval_count": response['eval_count'],
-                "eval_duration": response['eval_duration']
-            }
-    except ollama.ResponseError as e:
-        logger.error(f"Ollama ResponseError in generate_text: {str(e)}")
-        raise
+            return _stream_generator(model_name, "generate", lambda: get_client().generate(
+                model=model_name, prompt=prompt, options=options, stream=True,
+                keep_alive=model_registry.keep_alive_for(model_name)), key)
+
+        async with _model_slot(model_name):
+            started = time.perf_counter()
+            response = await get_client().generate(model=model_name, prompt=prompt, options=options,
+                                                   keep_alive=model_registry.keep_alive_for(model_name))
+        record_ollama_call(model_name, "generate", time.perf_counter() - started, response)
+        if key:
+            await response_cache.store(key, _cache_entry(model_name, "generate", [response['response']], response))
+        # For non-streaming, construct a more detailed response
+        return {
+            "model": model_name,
+            "response": response['response'],
+            "total_duration": response['total_duration'],
+            "load_duration": response['load_duration'],
+            "prompt_eval_count": response['prompt_eval_count'],
+            "eval_count": response['eval_count'],
+            "eval_duration": response['eval_duration']
+        }
     except Exception as e:
-        logger.error(f"Unexpected error in generate_text: {str(e)}")
+        OLLAMA_ERRORS.inc(model=model_name, kind="generate")
+        logger.error(f"{type(e).__name__} in generate_text: {str(e)}")
         raise
 
-def _stream_generator(response):
-    for chunk in response:
-        yield chunk['message']['content']
\ No newline at end of file
+async def _stream_generator(model_name, kind, start_stream, cache_key=None):
+    # Yields {"content": ...} per token, then {"done": True, ...} with Ollama's
+    # counters. The model slot is held for the whole stream; closing this
+    # generator (the client went away) closes the upstream connection, which
+    # makes Ollama stop generating.
+    chunks = []
+    async with _model_slot(model_name):
+        started = time.perf_counter()
+        try:
+            stream = await start_stream()
+        except Exception:
+            OLLAMA_ERRORS.inc(model=model_name, kind=kind)
+            raise
+        try:
+            async for chunk in stream:
+                content = chunk['message']['content'] if kind == "chat" else chunk['response']
+                chunks.append(content)
+                if content:
+                    yield {"content": content}
+                if chunk.get('done'):
+                    record_ollama_call(model_name, kind, time.perf_counter() - started, chunk)
+                    if cache_key:
+                        # Only streams that ran to the end are cached
+                        await response_cache.store(cache_key, _cache_entry(model_name, kind, chunks, chunk))
+                    yield dict({field: chunk.get(field) for field in STAT_FIELDS}, model=model_name, done=True)
+        except Exception:
+            # Client disconnects close the generator with GeneratorExit, which is not an error
+            OLLAMA_ERRORS.inc(model=model_name, kind=kind)
+            raise
+        finally:
+            await stream.aclose()
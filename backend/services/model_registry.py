@@ -0,0 +1,269 @@
+import re
+import time
+import struct
+import asyncio
+import importlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import (BASE_MODELS_DIR, MODEL_REGISTRY_POLL_INTERVAL, MODEL_REGISTRY_TTL, LLM_KEEP_ALIVE,
+                    PINNED_MODELS)
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MODEL_SUFFIXES = {".modelfile", ".gguf"}
+QUANTIZATION_RE = re.compile(r"(?i)(?<![A-Za-z0-9])(IQ\d_[A-Z]+|Q\d_K_[SML]|Q\d_K|Q\d_\d|BF16|F16|F32)(?![A-Za-z0-9])")
+
+# llama.cpp's general.file_type values
+GGUF_FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1", 10: "Q2_K", 11: "Q3_K_S",
+    12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M", 16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K",
+    19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S", 22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL",
+    26: "IQ3_S", 27: "IQ3_M", 28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+# GGUF value type -> struct format of a scalar; 8 is a string and 9 an array
+GGUF_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+GGUF_STRING, GGUF_ARRAY = 8, 9
+
+def _read(f, fmt):
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated GGUF header")
+    return struct.unpack(fmt, data)[0]
+
+def _read_gguf_value(f, value_type, keep=True):
+    if value_type in GGUF_SCALARS:
+        return _read(f, GGUF_SCALARS[value_type])
+    if value_type == GGUF_STRING:
+        length = _read(f, "<Q")
+        if not keep:
+            f.seek(length, 1)
+            return None
+        return f.read(length).decode('utf-8', errors='replace')
+    if value_type == GGUF_ARRAY:
+        element_type, count = _read(f, "<I"), _read(f, "<Q")
+        if element_type in GGUF_SCALARS:
+            # Arrays (the tokenizer vocabulary, mostly) are never needed; skip them
+            f.seek(count * struct.calcsize(GGUF_SCALARS[element_type]), 1)
+        else:
+            for _ in range(count):
+                _read_gguf_value(f, element_type, keep=False)
+        return None
+    raise ValueError(f"Unknown GGUF value type {value_type}")
+
+def read_gguf_metadata(path, wanted=("general.architecture", "general.name", "general.file_type")) -> Dict:
+    """Read selected key/value pairs from a GGUF header, stopping once all of them are found."""
+    found = {}
+    with open(path, 'rb') as f:
+        if f.read(4) != b"GGUF":
+            raise ValueError(f"{Path(path).name} is not a GGUF file")
+        version = _read(f, "<I")
+        count_format = "<I" if version == 1 else "<Q"
+        _read(f, count_format)  # tensor count
+        for _ in range(_read(f, count_format)):
+            key_length = _read(f, count_format)
+            key = f.read(key_length).decode('utf-8', errors='replace')
+            value = _read_gguf_value(f, _read(f, "<I"), keep=key in wanted)
+            if key in wanted:
+                found[key] = value
+                if len(found) == len(wanted):
+                    break
+    return found
+
+def _quantization_from_name(text: str) -> Optional[str]:
+    match = QUANTIZATION_RE.search(text)
+    return match.group(1).upper() if match else None
+
+def _describe_gguf(path: Path) -> dict:
+    try:
+        metadata = read_gguf_metadata(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Could not read GGUF metadata of {path.name}: {str(e)}")
+        metadata = {}
+    file_type = metadata.get("general.file_type")
+    return {
+        "architecture": metadata.get("general.architecture"),
+        "quantization": GGUF_FILE_TYPES.get(file_type, f"type {file_type}") if file_type is not None
+        else _quantization_from_name(path.name),
+    }
+
+def _describe_modelfile(path: Path) -> dict:
+    base = None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip().upper().startswith("FROM "):
+                    base = line.strip()[5:].strip()
+                    break
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning(f"Could not read {path.name}: {str(e)}")
+    description = {"from": base, "quantization": _quantization_from_name(base) if base else None}
+    if base and base.lower().endswith(".gguf"):
+        base_path = (path.parent / base).resolve()
+        if base_path.exists():
+            description.update({key: value for key, value in _describe_gguf(base_path).items() if value})
+    return description
+
+def base_name(model_name: str) -> str:
+    return model_name[:-len(":latest")] if model_name.endswith(":latest") else model_name
+
+class ModelRegistry:
+    """Ollama's models merged with the .modelfile/.gguf files in BASE_MODELS_DIR.
+
+    Requests read an in-memory snapshot. A background task re-scans the model
+    directory when its listing changes and asks Ollama for its models (and
+    which are loaded) every MODEL_REGISTRY_TTL seconds, or at once after
+    refresh(). Pinned models are loaded with keep_alive=-1 and every request
+    to them repeats that, since each request otherwise resets the expiry.
+    """
+
+    def __init__(self, models_dir: Path, pinned: Optional[List[str]] = None):
+        self.models_dir = Path(models_dir)
+        self.pinned = set(base_name(name) for name in pinned or [])
+        self._local: Dict[str, dict] = {}
+        self._local_signature = None
+        self._described: Dict[tuple, dict] = {}
+        self._ollama: Dict[str, dict] = {}
+        self._loaded: Dict[str, dict] = {}
+        self._ollama_refreshed = 0.0
+        self._ollama_error = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def _scan_local(self):
+        entries = sorted((path for path in self.models_dir.glob('*')
+                          if path.is_file() and path.suffix.lower() in LOCAL_MODEL_SUFFIXES),
+                         key=lambda path: path.name)
+        stats = [(path, path.stat()) for path in entries]
+        signature = tuple((path.name, stat.st_size, stat.st_mtime_ns) for path, stat in stats)
+        if signature == self._local_signature:
+            return
+        local = {}
+        # Sorted by name, so a .modelfile (what initialize_model creates from) wins over a .gguf of the same stem
+        for path, stat in stats:
+            version = (path.name, stat.st_size, stat.st_mtime_ns)
+            if version not in self._described:
+                self._described[version] = (_describe_gguf(path) if path.suffix.lower() == ".gguf"
+                                            else _describe_modelfile(path))
+            local[path.stem] = dict(self._described[version], file=path.name, type=path.suffix.lower()[1:],
+                                    size=stat.st_size, modified_at=stat.st_mtime)
+        self._local = local
+        self._local_signature = signature
+        logger.info(f"Model registry found {len(local)} local model files")
+
+    async def _refresh_ollama(self):
+        # Imported here: llm_service imports this module for keep_alive_for()
+        from services.llm_service import get_client
+        try:
+            models = await get_client().list()
+            running = await get_client().ps()
+        except Exception as e:
+            self._ollama_error = str(e)
+            logger.warning(f"Model registry could not reach Ollama: {str(e)}")
+            return
+        self._ollama = {base_name(model['name']): {
+            "name": model['name'],
+            "digest": model.get('digest'),
+            "size": model.get('size'),
+            "modified_at": model.get('modified_at'),
+            "family": model.get('details', {}).get('family'),
+            "parameter_size": model.get('details', {}).get('parameter_size'),
+            "quantization": model.get('details', {}).get('quantization_level'),
+        } for model in models.get('models', [])}
+        self._loaded = {base_name(model['name']): {"expires_at": model.get('expires_at'),
+                                                   "size_vram": model.get('size_vram')}
+                        for model in running.get('models', [])}
+        self._ollama_refreshed = time.monotonic()
+        self._ollama_error = None
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            await asyncio.to_thread(self._scan_local)
+            if force or time.monotonic() - self._ollama_refreshed > MODEL_REGISTRY_TTL:
+                await self._refresh_ollama()
+
+    async def _run(self):
+        # Pinned models are loaded in the background so a slow load doesn't hold up startup.
+        # The Ollama client is imported in a thread first, so the import doesn't stall the event loop.
+        await asyncio.to_thread(importlib.import_module, "ollama")
+        await self.refresh(force=True)
+        for name in sorted(self.pinned):
+            try:
+                await self.warm(name, keep_alive=-1)
+            except Exception as e:
+                logger.warning(f"Could not pin model {name}: {str(e)}")
+        while True:
+            await asyncio.sleep(MODEL_REGISTRY_POLL_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Model registry refresh failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def ollama_listed(self) -> bool:
+        return self._ollama_refreshed > 0
+
+    def local_names(self) -> List[str]:
+        return sorted(self._local)
+
+    def in_ollama(self, model_name: str) -> bool:
+        return base_name(model_name) in self._ollama
+
+    def digest(self, model_name: str) -> Optional[str]:
+        entry = self._ollama.get(base_name(model_name))
+        return entry["digest"] if entry else None
+
+    def keep_alive_for(self, model_name: str):
+        return -1 if base_name(model_name) in self.pinned else LLM_KEEP_ALIVE
+
+    def models(self) -> List[dict]:
+        names = sorted(set(self._local) | set(self._ollama))
+        return [{
+            "name": name,
+            "ollama": self._ollama.get(name),
+            "local": self._local.get(name),
+            "loaded": name in self._loaded,
+            "expires_at": self._loaded.get(name, {}).get("expires_at"),
+            "pinned": name in self.pinned,
+        } for name in names]
+
+    def status(self) -> dict:
+        return {
+            "model_count": len(set(self._local) | set(self._ollama)),
+            "ollama_age_seconds": round(time.monotonic() - self._ollama_refreshed, 1) if self._ollama_refreshed else None,
+            "ollama_error": self._ollama_error,
+        }
+
+    async def warm(self, model_name: str, keep_alive=None):
+        """Load a model into memory now (an empty prompt only loads it) and keep it for `keep_alive`."""
+        from services.llm_service import get_client
+        started = time.monotonic()
+        response = await get_client().generate(model=model_name, prompt="",
+                                               keep_alive=keep_alive if keep_alive is not None
+                                               else self.keep_alive_for(model_name))
+        await self.refresh(force=True)
+        return {"model": model_name, "load_duration": response.get('load_duration'),
+                "seconds": round(time.monotonic() - started, 3)}
+
+    async def pin(self, model_name: str):
+        self.pinned.add(base_name(model_name))
+        return await self.warm(model_name, keep_alive=-1)
+
+    async def unpin(self, model_name: str):
+        # Hand the model back to the normal expiry rather than unloading it at once
+        self.pinned.discard(base_name(model_name))
+        if base_name(model_name) not in self._loaded:
+            return {"model": model_name, "loaded": False}
+        return await self.warm(model_name, keep_alive=LLM_KEEP_ALIVE if LLM_KEEP_ALIVE is not None else "5m")
+
+model_registry = ModelRegistry(BASE_MODELS_DIR, PINNED_MODELS)
@@ -0,0 +1,166 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from config import PDF_BACKEND_CHAIN
+
+logger = logging.getLogger(__name__)
+
+class PdfBackend(ABC):
+    """Reads the text of a range of pages from a PDF.
+
+    `extract_pages` returns one string per page in [start, end), using an
+    empty string for pages without extractable text so page numbers stay
+    aligned across backends.
+    """
+
+    name = None
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        ...
+
+    @abstractmethod
+    def page_count(self, file_path) -> int:
+        ...
+
+    @abstractmethod
+    def extract_pages(self, file_path, start: int = 0, end: Optional[int] = None) -> List[str]:
+        ...
+
+class PdfPlumberBackend(PdfBackend):
+    """Full layout analysis; slowest, best at preserving reading order."""
+
+    name = "pdfplumber"
+
+    def is_available(self):
+        try:
+            import pdfplumber  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, file_path):
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+    def extract_pages(self, file_path, start=0, end=None):
+        import pdfplumber
+        texts = []
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages[start:end]:
+                texts.append(page.extract_text() or "")
+                # Cached layout objects would otherwise pile up for every page read
+                page.flush_cache()
+        return texts
+
+class PdfiumBackend(PdfBackend):
+    """PDFium's native text layer (pypdfium2 ships with pdfplumber); much faster."""
+
+    name = "pypdfium2"
+
+    def is_available(self):
+        try:
+            import pypdfium2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, file_path):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(str(file_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def extract_pages(self, file_path, start=0, end=None):
+        import pypdfium2
+        texts = []
+        pdf = pypdfium2.PdfDocument(str(file_path))
+        try:
+            end = len(pdf) if end is None else min(end, len(pdf))
+            for index in range(start, end):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_range().replace('\r\n', '\n'))
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+        return texts
+
+class PyPdf4Backend(PdfBackend):
+    """Pure-Python text operators only; fast but loses spacing on many PDFs."""
+
+    name = "pypdf4"
+
+    def is_available(self):
+        try:
+            import PyPDF4  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, file_path):
+        from PyPDF4 import PdfFileReader
+        with open(file_path, 'rb') as file:
+            return PdfFileReader(file).getNumPages()
+
+    def extract_pages(self, file_path, start=0, end=None):
+        from PyPDF4 import PdfFileReader
+        texts = []
+        with open(file_path, 'rb') as file:
+            reader = PdfFileReader(file)
+            end = reader.getNumPages() if end is None else min(end, reader.getNumPages())
+            for index in range(start, end):
+                texts.append(reader.getPage(index).extractText() or "")
+        return texts
+
+PDF_BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend for backend in (PdfPlumberBackend(), PdfiumBackend(), PyPdf4Backend())
+}
+
+def resolve_chain(preferred: Optional[str] = None) -> List[str]:
+    """Return the backends to try in order: the preferred one, then the configured chain."""
+    if preferred is not None and preferred not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {preferred}")
+    names = ([preferred] if preferred else []) + [name for name in PDF_BACKEND_CHAIN if name != preferred]
+    chain = [name for name in names if PDF_BACKENDS[name].is_available()]
+    if not chain:
+        raise RuntimeError(f"None of the PDF backends {names} are installed")
+    return chain
+
+def page_count(file_path, chain: List[str]) -> int:
+    last_error = None
+    for name in chain:
+        try:
+            return PDF_BACKENDS[name].page_count(file_path)
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+def extract_pdf_pages(file_path, chain: List[str], start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Extract a page range with the first backend in `chain` that yields any text.
+
+    A range no backend finds text in (e.g. scanned pages) comes back as the
+    first successful backend's empty pages; only if every backend fails is
+    the last error raised.
+    """
+    last_error = None
+    empty_pages = None
+    for name in chain:
+        try:
+            texts = PDF_BACKENDS[name].extract_pages(file_path, start, end)
+        except Exception as e:
+            logger.warning(f"{name} failed on {file_path} pages {start}-{end}: {str(e)}")
+            last_error = e
+            continue
+        if any(text.strip() for text in texts):
+            return texts
+        logger.info(f"{name} found no text in {file_path} pages {start}-{end}; trying next backend")
+        if empty_pages is None:
+            empty_pages = texts
+    if empty_pages is not None:
+        return empty_pages
+    raise last_error
@@ -0,0 +1,302 @@
+import io
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from config import (DATASET_DIR, EXTRACTION_DIR, OLLAMA_HOST, QUESTION_GEN_MAX_CONCURRENCY,
+                    QUESTION_GEN_MIN_CONCURRENCY, QUESTION_GEN_TIMEOUT, QUESTION_GEN_RETRIES,
+                    QUESTION_GEN_CHECKPOINT_INTERVAL, QUESTION_GEN_PROMPT)
+from utils.csv_index import csv_row_index
+from services.job_manager import job_manager, JobCancelled
+from services.llm_service import record_ollama_call
+
+logger = logging.getLogger(__name__)
+
+QUESTION_JOB = "question_generation"
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Rows read ahead of the last one written, per unit of maximum concurrency;
+# bounds the buffer that puts out-of-order replies back in order
+REORDER_WINDOW = 4
+
+class AdaptiveLimiter:
+    """Concurrency limit that follows observed latency: additive increase, multiplicative decrease.
+
+    Latency is measured per generated token, so long and short answers are
+    comparable, and the lowest value seen is taken as the unloaded baseline.
+    While replies stay within `tolerance` times the baseline the limit grows
+    by about one per `limit` replies; a slower reply or a failure shrinks it
+    by `backoff`, at most once per `limit` replies.
+    """
+
+    def __init__(self, minimum: int, maximum: int, initial: Optional[int] = None,
+                 tolerance: float = 2.0, backoff: float = 0.75):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial or minimum)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.baseline = None
+        self._since_decrease = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float] = None):
+        """Return a slot; `latency` is seconds per token, or None if the request failed."""
+        async with self._condition:
+            self.in_flight -= 1
+            self._since_decrease += 1
+            if latency is not None:
+                self.baseline = latency if self.baseline is None else min(self.baseline, latency)
+            if latency is None or latency > self.tolerance * self.baseline:
+                if self._since_decrease >= self.limit:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._since_decrease = 0
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+def clean_question(text: str) -> str:
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    question = lines[0] if lines else ""
+    if question.lower().startswith("question:"):
+        question = question[len("question:"):].strip()
+    return question.strip('"“” ')
+
+async def generate_question(client: "httpx.AsyncClient", model: str, answer: str,
+                            options: Optional[dict] = None) -> Tuple[str, int]:
+    """Ask the model for one question answered by `answer`; returns (question, generated tokens)."""
+    import httpx
+    payload = {"model": model, "prompt": QUESTION_GEN_PROMPT.format(answer=answer), "stream": False}
+    if options:
+        payload["options"] = options
+    for attempt in range(QUESTION_GEN_RETRIES):
+        try:
+            started = time.perf_counter()
+            response = await client.post("/api/generate", json=payload)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                data = response.json()
+                record_ollama_call(model, "question", time.perf_counter() - started, data)
+                return clean_question(data.get("response", "")), data.get("eval_count", 0)
+            error = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            error = str(e) or type(e).__name__
+        if attempt + 1 < QUESTION_GEN_RETRIES:
+            logger.warning(f"Question generation attempt {attempt + 1} failed ({error}), retrying")
+            await asyncio.sleep(2 ** attempt)
+    raise RuntimeError(f"Question generation failed after {QUESTION_GEN_RETRIES} attempts: {error}")
+
+def _encode_row(row) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+def _source_version(source_path: Path) -> Dict[str, int]:
+    stats = source_path.stat()
+    return {"source_size": stats.st_size, "source_mtime_ns": stats.st_mtime_ns}
+
+def load_checkpoint(checkpoint_path: Path, source_path: Path, part_path: Path, model: str,
+                    options: Optional[dict] = None) -> Optional[dict]:
+    """Return the checkpoint if it belongs to this source file, model and options and the partial output is intact."""
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(checkpoint.get(key) != value for key, value in _source_version(source_path).items()):
+        logger.warning(f"{source_path.name} changed since {checkpoint_path.name} was written; starting over")
+        return None
+    # Resuming with another model or other options would mix two generators' questions in one dataset
+    if checkpoint.get("model") != model or (checkpoint.get("options") or None) != (options or None):
+        logger.warning(f"{checkpoint_path.name} was written with another model or options; starting over")
+        return None
+    if not part_path.exists() or part_path.stat().st_size < checkpoint["output_bytes"]:
+        return None
+    return checkpoint
+
+def _write_checkpoint(checkpoint_path: Path, checkpoint: dict):
+    tmp_path = checkpoint_path.with_name(checkpoint_path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+async def generate_questions(source_path: Path, output_path: Path, model: str, host: str = OLLAMA_HOST,
+                             max_concurrency: int = QUESTION_GEN_MAX_CONCURRENCY, options: Optional[dict] = None,
+                             progress: Optional[Callable] = None, cancelled: Optional[Callable] = None) -> dict:
+    """Fill the empty `question` of every row of `source_path` and write the result to `output_path`.
+
+    Rows are streamed from the source and written in source order to
+    `<output>.part`; every QUESTION_GEN_CHECKPOINT_INTERVAL seconds the number
+    of rows written and the part file's length are saved next to it, and a
+    later call with the same paths resumes from there. Rows that already have
+    a question, or have no answer, are copied through unchanged.
+    """
+    source_path, output_path = Path(source_path), Path(output_path)
+    part_path = output_path.with_name(output_path.name + ".part")
+    checkpoint_path = output_path.with_name(output_path.name + CHECKPOINT_SUFFIX)
+    offsets = csv_row_index.offsets(source_path)
+    rows_total = max(0, len(offsets) - 1)
+
+    with open(source_path, 'r', newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f), [])
+    if "question" not in header or "answer" not in header:
+        raise ValueError(f"{source_path.name} has no question/answer columns")
+    question_index, answer_index = header.index("question"), header.index("answer")
+
+    checkpoint = load_checkpoint(checkpoint_path, source_path, part_path, model, options)
+    resumed_from = checkpoint["rows_done"] if checkpoint else 0
+    stats = dict(checkpoint["stats"]) if checkpoint else {"rows_generated": 0, "rows_copied": 0, "rows_empty": 0,
+                                                          "tokens": 0}
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output = open(part_path, 'r+b' if checkpoint else 'wb')
+    if checkpoint:
+        output.truncate(checkpoint["output_bytes"])
+        output.seek(checkpoint["output_bytes"])
+        logger.info(f"Resuming question generation for {output_path.name} at row {resumed_from}")
+    else:
+        output.write(_encode_row(header))
+
+    limiter = AdaptiveLimiter(QUESTION_GEN_MIN_CONCURRENCY, max_concurrency)
+    window = asyncio.Semaphore(REORDER_WINDOW * max_concurrency)
+    completed: Dict[int, list] = {}
+    next_write = resumed_from
+    tokens_this_run = 0
+    failure = None
+    started = time.monotonic()
+    last_checkpoint = started
+
+    def save_checkpoint():
+        nonlocal last_checkpoint
+        output.flush()
+        _write_checkpoint(checkpoint_path, {
+            "source": source_path.name, **_source_version(source_path), "model": model, "options": options,
+            "rows_done": next_write, "output_bytes": output.tell(), "stats": stats,
+        })
+        last_checkpoint = time.monotonic()
+
+    def report():
+        elapsed = max(time.monotonic() - started, 1e-9)
+        rows_per_second = (next_write - resumed_from) / elapsed
+        if progress is not None:
+            progress(rows_total=rows_total, rows_done=next_write, concurrency=int(limiter.limit),
+                     in_flight=limiter.in_flight, rows_per_second=round(rows_per_second, 2),
+                     tokens_per_second=round(tokens_this_run / elapsed, 1),
+                     eta_seconds=round((rows_total - next_write) / rows_per_second, 1) if rows_per_second else None,
+                     **stats)
+
+    def finish_row(index, row, outcome, tokens=0):
+        nonlocal next_write
+        completed[index] = (row, outcome, tokens)
+        # Stats only count written rows, so a checkpoint never counts a row twice
+        while next_write in completed:
+            row, outcome, tokens = completed.pop(next_write)
+            output.write(_encode_row(row))
+            stats[outcome] += 1
+            stats["tokens"] += tokens
+            next_write += 1
+            window.release()
+        report()
+        if time.monotonic() - last_checkpoint >= QUESTION_GEN_CHECKPOINT_INTERVAL:
+            save_checkpoint()
+
+    async def fill(client, index, row):
+        nonlocal tokens_this_run, failure
+        request_started = time.monotonic()
+        try:
+            question, tokens = await generate_question(client, model, row[answer_index], options)
+        except Exception as e:
+            await limiter.release(None)
+            failure = failure or e
+            # Wake the reader, which may be waiting for this row to be written
+            window.release()
+            return
+        await limiter.release((time.monotonic() - request_started) / max(tokens, 1))
+        row[question_index] = question
+        tokens_this_run += tokens
+        finish_row(index, row, "rows_generated" if question else "rows_empty", tokens)
+
+    # Imported here so the server does not load httpx until a job runs
+    import httpx
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    tasks = set()
+    try:
+        async with httpx.AsyncClient(base_url=host, timeout=QUESTION_GEN_TIMEOUT, limits=limits) as client:
+            with open(source_path, 'rb') as raw:
+                # Jump straight to the first row not yet written
+                if resumed_from + 1 < len(offsets):
+                    raw.seek(int(offsets[resumed_from + 1]))
+                else:
+                    raw.seek(0, os.SEEK_END)
+                reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+                for index, row in enumerate(reader, start=resumed_from):
+                    await window.acquire()
+                    if failure is not None or (cancelled is not None and cancelled()):
+                        break
+                    row.extend([""] * (len(header) - len(row)))
+                    if row[question_index].strip() or not row[answer_index].strip():
+                        finish_row(index, row, "rows_copied")
+                        continue
+                    await limiter.acquire()
+                    task = asyncio.create_task(fill(client, index, row))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if cancelled is not None and cancelled():
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        save_checkpoint()
+        output.close()
+
+    if failure is not None:
+        raise failure
+    if cancelled is not None and cancelled():
+        raise JobCancelled()
+
+    os.replace(part_path, output_path)
+    checkpoint_path.unlink(missing_ok=True)
+    report()
+    elapsed = time.monotonic() - started
+    logger.info(f"Question generation for {output_path.name} finished: {next_write} rows in {elapsed:.1f}s")
+    return {
+        "dataset": output_path.name,
+        "rows": next_write,
+        "resumed_from": resumed_from,
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round((next_write - resumed_from) / elapsed, 2) if elapsed else None,
+        "tokens_per_second": round(tokens_this_run / elapsed, 1) if elapsed else None,
+        **stats,
+    }
+
+def question_job_paths(params: dict) -> Tuple[Path, Path]:
+    return Path(EXTRACTION_DIR) / params["source_file"], Path(DATASET_DIR) / f"{params['dataset_name']}.csv"
+
+def job_checkpoint(params: dict) -> Optional[dict]:
+    """The checkpoint a job with these params would resume from, or None if it would start over."""
+    source_path, output_path = question_job_paths(params)
+    return load_checkpoint(output_path.with_name(output_path.name + CHECKPOINT_SUFFIX), source_path,
+                           output_path.with_name(output_path.name + ".part"), params["model"], params.get("options"))
+
+def run_question_job(job):
+    source_path, output_path = question_job_paths(job.params)
+    return asyncio.run(generate_questions(
+        source_path, output_path, job.params["model"],
+        # Always the configured server; a job never picks where the backend sends requests
+        host=OLLAMA_HOST,
+        max_concurrency=job.params.get("max_concurrency") or QUESTION_GEN_MAX_CONCURRENCY,
+        options=job.params.get("options"),
+        progress=job.update,
+        cancelled=lambda: job.cancelled,
+    ))
+
+job_manager.register(QUESTION_JOB, run_question_job)
@@ -0,0 +1,199 @@
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from config import LLM_CACHE_DIR, LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+def is_deterministic(options: Optional[dict]) -> bool:
+    """Only greedy (temperature 0) or seeded sampling gives the same reply twice."""
+    return bool(options) and (options.get("temperature") == 0 or options.get("seed") is not None)
+
+def response_key(kind: str, model_name: str, digest: str, request_input, options: Optional[dict]) -> str:
+    payload = {"kind": kind, "model": model_name, "digest": digest, "input": request_input, "options": options or {}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def _model_tag(model_name: str) -> str:
+    return hashlib.sha1(model_name.encode()).hexdigest()[:12]
+
+class ResponseCache:
+    """Chat/generate replies keyed by model digest, full input and options.
+
+    The newest entries are kept in memory (LRU, `memory_entries`); entries
+    pushed out of memory spill to gzipped JSON files in `cache_dir`, which is
+    itself trimmed least recently used first past `max_bytes`. Entries older
+    than `ttl` seconds are dropped on lookup. An entry keeps the streamed
+    chunks, so a hit can be replayed as a stream.
+
+    From async code use `lookup()` and `store()`, which keep disk reads and
+    spills off the event loop.
+    """
+
+    def __init__(self, cache_dir: Path, memory_entries: int, max_bytes: int, ttl: float):
+        self.cache_dir = Path(cache_dir)
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.spills = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def _entry_path(self, key: str, model_name: str) -> Path:
+        # The model tag prefix lets invalidate_model() find a model's entries by name
+        return self.cache_dir / f"{_model_tag(model_name)}-{key}.json.gz"
+
+    def _load_disk_size(self):
+        if self._disk_bytes is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in self.cache_dir.glob("*.json.gz"))
+
+    def _read_disk(self, key: str, model_name: str) -> Optional[dict]:
+        # Read outside the lock; a spilled entry moves back into memory
+        entry_path = self._entry_path(key, model_name)
+        try:
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning(f"Discarding unreadable response cache entry {entry_path.name}")
+            entry = None
+        with self._lock:
+            self._remove(entry_path)
+            if entry is not None:
+                self._remember(key, entry)
+        return entry
+
+    def get(self, key: str, model_name: str) -> Optional[dict]:
+        with self._lock:
+            self._load_disk_size()
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._read_disk(key, model_name)
+        with self._lock:
+            if entry is not None and time.time() - entry["created_at"] > self.ttl:
+                self._memory.pop(key, None)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self._load_disk_size()
+            self._remember(key, dict(entry, created_at=time.time()))
+
+    async def lookup(self, key: str, model_name: str) -> Optional[dict]:
+        """get() for the event loop: memory hits are answered inline, anything else is read in a thread."""
+        with self._lock:
+            in_memory = self._disk_bytes is not None and key in self._memory
+        if in_memory:
+            return self.get(key, model_name)
+        return await asyncio.to_thread(self.get, key, model_name)
+
+    async def store(self, key: str, entry: dict):
+        """put() for the event loop; it may spill and evict entries on disk."""
+        await asyncio.to_thread(self.put, key, entry)
+
+    def _remember(self, key: str, entry: dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._spill(*self._memory.popitem(last=False))
+
+    def _spill(self, key: str, entry: dict):
+        entry_path = self._entry_path(key, entry["model"])
+        tmp_path = entry_path.with_suffix('.tmp')
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.error(f"Error spilling response cache entry: {str(e)}")
+            return
+        self._disk_bytes += entry_path.stat().st_size
+        self.spills += 1
+        self._evict()
+
+    def _remove(self, entry_path: Path):
+        try:
+            size = entry_path.stat().st_size
+            entry_path.unlink()
+            self._disk_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        if self._disk_bytes <= self.max_bytes:
+            return
+        entries = sorted(self.cache_dir.glob("*.json.gz"), key=lambda entry: entry.stat().st_mtime)
+        for entry_path in entries:
+            if self._disk_bytes <= self.max_bytes:
+                break
+            self._remove(entry_path)
+            self.evictions += 1
+
+    def spill_all(self):
+        """Write every in-memory entry to disk, e.g. before shutting down."""
+        with self._lock:
+            self._load_disk_size()
+            while self._memory:
+                self._spill(*self._memory.popitem(last=False))
+
+    def invalidate_model(self, model_name: str):
+        """Drop every entry of a model, e.g. after it was recreated from its modelfile."""
+        with self._lock:
+            self._load_disk_size()
+            for key in [key for key, entry in self._memory.items() if entry["model"] == model_name]:
+                del self._memory[key]
+            for entry_path in self.cache_dir.glob(f"{_model_tag(model_name)}-*.json.gz"):
+                self._remove(entry_path)
+            self.invalidations += 1
+        logger.info(f"Invalidated response cache for model {model_name}")
+
+    def clear(self):
+        with self._lock:
+            self._load_disk_size()
+            self._memory.clear()
+            for entry_path in self.cache_dir.glob("*.json.gz"):
+                self._remove(entry_path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_disk_size()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "memory_entries": len(self._memory),
+                "disk_entries": sum(1 for _ in self.cache_dir.glob("*.json.gz")),
+                "disk_bytes": self._disk_bytes,
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+            }
+
+response_cache = ResponseCache(LLM_CACHE_DIR, LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL)
@@ -0,0 +1,209 @@
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+from config import SEARCH_INDEX_PATH, SEARCH_PDF_BACKEND
+from services.extractor import FORMAT_HANDLERS, extract_text_with_layout
+from services.file_catalog import file_catalog
+
+logger = logging.getLogger(__name__)
+
+# FTS rowids encode (doc_id, page) so a document's pages are one rowid range,
+# which FTS5 can delete or look up without scanning the whole index.
+PAGE_BITS = 20
+PAGE_MASK = (1 << PAGE_BITS) - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    sha256 TEXT,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    indexed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text, tokenize='porter unicode61 remove_diacritics 2');
+"""
+
+def _quote_terms(query: str) -> str:
+    # Plain words, each as a quoted FTS5 string, for input that is not valid query syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+class SearchIndex:
+    """Full-text index (SQLite FTS5) of the text of every document in the file catalog.
+
+    A background thread keeps it in line with the catalog: documents whose
+    hash changed are re-read with the format handlers, moved or renamed ones
+    are re-keyed without re-reading, and removed ones are dropped. Each PDF
+    page (DOCX paragraph, TXT file) is one FTS row.
+    """
+
+    def __init__(self, db_path: Path, catalog):
+        self.db_path = Path(db_path)
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._conn = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.pending = 0
+        self.current = None
+
+    def _connection(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.catalog.listeners.append(self.notify)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="search-indexer", daemon=True)
+        self._thread.start()
+        self.notify()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Search indexing failed: {str(e)}")
+
+    def sync(self):
+        """Index new and changed documents, re-key moved ones and drop removed ones."""
+        wanted = {path: sha256 for path, sha256 in self.catalog.file_hashes().items()
+                  if Path(path).suffix.lower() in FORMAT_HANDLERS}
+        with self._lock:
+            indexed = {row["path"]: (row["doc_id"], row["sha256"])
+                       for row in self._connection().execute("SELECT doc_id, path, sha256 FROM documents")}
+        gone = {sha256: path for path, (_, sha256) in indexed.items() if path not in wanted}
+        # Files the catalog has not hashed yet are picked up once it has
+        todo = [(path, sha256) for path, sha256 in wanted.items()
+                if sha256 and (path not in indexed or indexed[path][1] != sha256)]
+        self.pending = len(todo)
+        if not todo and not gone:
+            return
+        start = time.perf_counter()
+        try:
+            for path, sha256 in todo:
+                if self._stop.is_set():
+                    return
+                source = gone.pop(sha256, None)
+                if source is not None:
+                    self._rekey(source, path)
+                else:
+                    self._index_document(path, sha256, indexed.get(path, (None, None))[0])
+                self.pending -= 1
+        finally:
+            self.current = None
+        for path in gone.values():
+            self._remove(indexed[path][0])
+        logger.info(f"Search index updated in {time.perf_counter() - start:.2f}s: "
+                    f"{len(todo)} documents indexed, {len(gone)} removed")
+
+    def _index_document(self, path: str, sha256: str, doc_id: Optional[int]):
+        self.current = path
+        pages: List[str] = []
+        error = None
+        try:
+            pages = list(extract_text_with_layout(str(self.catalog.root / path), pdf_backend=SEARCH_PDF_BACKEND))
+        except FileNotFoundError:
+            return  # Deleted since the catalog listed it; the next sync drops it
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Could not index {path}: {error}")
+        pages = pages[:PAGE_MASK]
+        with self._lock, self._connection() as conn:
+            if doc_id is None:
+                doc_id = conn.execute("INSERT INTO documents (path) VALUES (?)", (path,)).lastrowid
+            else:
+                self._delete_pages(conn, doc_id)
+            conn.executemany("INSERT INTO pages (rowid, text) VALUES (?, ?)",
+                             (((doc_id << PAGE_BITS) | number, text)
+                              for number, text in enumerate(pages, start=1) if text.strip()))
+            conn.execute("UPDATE documents SET sha256 = ?, page_count = ?, error = ?, indexed_at = ? WHERE doc_id = ?",
+                         (sha256, len(pages), error, time.time(), doc_id))
+
+    @staticmethod
+    def _delete_pages(conn, doc_id: int):
+        conn.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?",
+                     (doc_id << PAGE_BITS, (doc_id << PAGE_BITS) | PAGE_MASK))
+
+    def _rekey(self, old_path: str, new_path: str):
+        with self._lock, self._connection() as conn:
+            replaced = conn.execute("SELECT doc_id FROM documents WHERE path = ?", (new_path,)).fetchone()
+            if replaced is not None:
+                self._delete_pages(conn, replaced["doc_id"])
+                conn.execute("DELETE FROM documents WHERE doc_id = ?", (replaced["doc_id"],))
+            conn.execute("UPDATE documents SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def _remove(self, doc_id: int):
+        with self._lock, self._connection() as conn:
+            self._delete_pages(conn, doc_id)
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, folder: Optional[str] = None,
+               snippet_tokens: int = 16) -> Tuple[int, List[dict]]:
+        """Return (total hits, ranked page of hits) for an FTS5 query.
+
+        Queries that are not valid FTS5 syntax are searched as plain words.
+        """
+        conditions = "pages MATCH ?"
+        folder_params = []
+        if folder:
+            conditions += " AND (documents.path LIKE ? ESCAPE '\\')"
+            escaped = folder.strip("/").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            folder_params.append(escaped + "/%")
+        join = f"FROM pages JOIN documents ON documents.doc_id = (pages.rowid >> {PAGE_BITS}) WHERE {conditions}"
+        hits_query = (f"SELECT documents.path AS path, pages.rowid & {PAGE_MASK} AS page, "
+                      f"snippet(pages, 0, '<mark>', '</mark>', '...', ?) AS snippet, bm25(pages) AS score "
+                      f"{join} ORDER BY score LIMIT ? OFFSET ?")
+        for match in (query, _quote_terms(query)):
+            try:
+                with self._lock:
+                    conn = self._connection()
+                    total = conn.execute(f"SELECT COUNT(*) {join}", [match] + folder_params).fetchone()[0]
+                    rows = conn.execute(hits_query, [snippet_tokens, match] + folder_params + [limit, offset]).fetchall()
+                break
+            except sqlite3.OperationalError:
+                if match != query:
+                    raise
+        hits = [{"path": row["path"], "page": row["page"], "snippet": row["snippet"], "score": round(-row["score"], 6)}
+                for row in rows]
+        return total, hits
+
+    def status(self) -> dict:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COUNT(*) AS documents, COALESCE(SUM(page_count), 0) AS pages, COUNT(error) AS errors "
+                "FROM documents").fetchone()
+        return {
+            "documents": row["documents"],
+            "pages": row["pages"],
+            "errors": row["errors"],
+            "pending": self.pending,
+            "indexing": self.current,
+        }
+
+search_index = SearchIndex(SEARCH_INDEX_PATH, file_catalog)
@@ -0,0 +1,160 @@
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+# Used when spaCy is not installed; otherwise its English list is used, loaded
+# on first use because importing it imports all of spaCy.
+FALLBACK_STOP_WORDS = set("""a about above after again against all am an and any are as at be because been before being
+    below between both but by can could did do does doing down during each few for from further had has have
+    having he her here hers herself him himself his how i if in into is it its itself just me more most my
+    myself no nor not now of off on once only or other our ours ourselves out over own same she should so some
+    such than that the their theirs them themselves then there these they this those through to too under
+    until up very was we were what when where which while who whom why will with would you your yours
+    yourself yourselves""".split())
+
+@lru_cache(maxsize=None)
+def stop_words():
+    try:
+        from spacy.lang.en.stop_words import STOP_WORDS
+        return STOP_WORDS
+    except ImportError:
+        return FALLBACK_STOP_WORDS
+
+# A cheap stand-in for the tagger's NOUN/VERB check. Auxiliaries (be, have,
+# do, modals) are stop words and deliberately not verbs here, matching spaCy,
+# which tags them AUX rather than VERB.
+BASE_VERBS = set("""accept achieve acquire act add address adjust advise affect agree aim allow alter analyze
+    announce answer appear apply appoint approve argue arrange arrive ask assess assign assist assume attach attack
+    attempt attend authorize avoid base become begin believe belong bring build buy calculate call capture carry
+    cause change check choose claim clean clear close collect combine come commit communicate compare complete
+    comply compute concern conclude conduct confirm connect consider consist contact contain continue contribute
+    control convert coordinate copy correct cost count cover create cut deal decide declare decrease define
+    delay delete deliver demonstrate deny depend deploy describe design destroy detect determine develop die
+    direct discover discuss display distribute divide document draw drive drop earn eat educate eliminate emerge
+    employ enable encourage end engage enhance ensure enter establish estimate evaluate examine exceed exchange
+    execute exercise exist expand expect experience explain explore express extend face fail fall feel fight
+    file fill find finish fire fit fix fly focus follow forget form forward fund gain gather generate get give
+    go grant grow guide handle happen hear help hold hope identify ignore illustrate implement improve include
+    increase indicate inform initiate inspect install integrate intend introduce investigate involve issue join
+    keep kill know land last launch lead learn leave let lie like limit link list live load locate look lose
+    maintain make manage mark matter mean measure meet mention minimize modify monitor move need note notify
+    observe obtain occur offer open operate order organize own participate pass pay perform permit place plan
+    play point position possess post prepare present preserve prevent print proceed process produce program
+    promote propose protect prove provide publish pull purchase pursue put qualify raise reach read realize
+    receive recognize recommend record reduce refer reflect refuse regard register reject relate release rely
+    remain remember remove repair repeat replace report represent request require rescue research reserve
+    resolve respond rest restore result retain return reveal review rise run save say schedule secure see seek
+    seem select sell send serve set settle share ship show sign signal solve speak specify spend stand start
+    state stay stop store strike study submit succeed suffer suggest supply support suppose survive suspend take
+    talk target teach tell tend test think threaten track trade train transfer transmit transport travel treat
+    try turn understand undergo update use utilize validate verify view visit wait walk want warn watch win
+    wish work write""".split())
+
+IRREGULAR_VERBS = set("""arose became began bought brought built came caught chose chosen come did done drew
+    drawn drove driven fell fallen felt fought found flew flown forgot forgotten gave given got gotten went gone
+    grew grown heard held kept knew known laid led left lent lost made meant met paid put read ran rose risen run
+    said saw seen sent set shown shut sold spoke spoken spent stood stolen struck taken taught told thought threw
+    thrown took understood undergone underwent won written wrote""".split())
+
+def _inflections(verb):
+    forms = {verb, verb + "s", verb + "es"}
+    if verb.endswith("e"):
+        forms.update({verb + "d", verb[:-1] + "ing"})
+    elif verb.endswith("y") and len(verb) > 2 and verb[-2] not in "aeiou":
+        forms.update({verb[:-1] + "ies", verb[:-1] + "ied", verb + "ing"})
+    else:
+        forms.update({verb + "ed", verb + "ing", verb + verb[-1] + "ed", verb + verb[-1] + "ing"})
+    return forms
+
+VERB_FORMS = set(IRREGULAR_VERBS)
+for _verb in BASE_VERBS:
+    VERB_FORMS.update(_inflections(_verb))
+
+ALPHA = 1
+STOPWORD = 2
+VERB_LIKE = 4
+NOUN_LIKE = 8
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+VERB_SUFFIXES = ("ize", "izes", "ized", "izing", "ise", "ised", "ify", "ified")
+
+_token_flags: Dict[str, int] = {}
+
+def _flags(token):
+    flags = _token_flags.get(token)
+    if flags is None:
+        lower = token.lower()
+        flags = 0
+        if lower.isalpha():
+            flags |= ALPHA
+            if lower in stop_words():
+                flags |= STOPWORD
+            else:
+                if lower in VERB_FORMS or lower.endswith(VERB_SUFFIXES):
+                    flags |= VERB_LIKE
+                # Base verbs double as nouns ("report", "plan", "review")
+                if len(lower) > 2 and not lower.endswith(("ly", "ing", "ed")) and lower not in IRREGULAR_VERBS:
+                    flags |= NOUN_LIKE
+        if len(_token_flags) < 500000:
+            _token_flags[token] = flags
+    return flags
+
+@lru_cache(maxsize=None)
+def _bmp_alpha():
+    # str.isalpha for every Basic Multilingual Plane code point, built on first use
+    return np.fromiter((chr(codepoint).isalpha() for codepoint in range(0x10000)), dtype=bool, count=0x10000)
+
+def _alpha_counts(texts: Sequence[str]):
+    # Code points of all fragments in one array, looked up in the str.isalpha
+    # table; the rare ones past the BMP (mostly emoji) are checked one by one.
+    # Lone surrogates, which broken PDF text maps produce, pass through as non-letters.
+    joined = "".join(texts)
+    codepoints = np.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    is_alpha = _bmp_alpha()[np.minimum(codepoints, 0xFFFF)]
+    astral = np.flatnonzero(codepoints > 0xFFFF)
+    if astral.size:
+        is_alpha[astral] = [chr(codepoint).isalpha() for codepoint in codepoints[astral].tolist()]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    cumulative = np.concatenate(([0], np.cumsum(is_alpha, dtype=np.int64)))
+    return cumulative[bounds[1:]] - cumulative[bounds[:-1]], lengths
+
+def score_fragments(texts: Sequence[str], min_tokens: int = 6, min_alpha_ratio: float = 0.7,
+                    max_stopword_density: float = 0.75) -> np.ndarray:
+    """Return a boolean mask of the fragments that look like meaningful prose.
+
+    Mirrors the tagger-based filter (more than five tokens, alpha ratio above
+    0.7, a noun and a verb) with per-token flags from a lexicon, computed for
+    the whole batch at once with NumPy segment sums. Stop-word density also
+    rejects function-word runs that carry no content.
+    """
+    if not texts:
+        return np.zeros(0, dtype=bool)
+    token_lists = [TOKEN_PATTERN.findall(text) for text in texts]
+    token_counts = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(texts))
+    flags = np.fromiter((_flags(token) for tokens in token_lists for token in tokens),
+                        dtype=np.uint8, count=int(token_counts.sum()))
+    segment_ids = np.repeat(np.arange(len(texts)), token_counts)
+
+    def per_fragment(bit):
+        return np.bincount(segment_ids, weights=(flags & bit) > 0, minlength=len(texts))
+
+    words = per_fragment(ALPHA)
+    stopwords = per_fragment(STOPWORD)
+    verbs = per_fragment(VERB_LIKE)
+    nouns = per_fragment(NOUN_LIKE)
+    alpha_chars, lengths = _alpha_counts(texts)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha_ratio = np.where(lengths > 0, alpha_chars / lengths, 0.0)
+        stopword_density = np.where(words > 0, stopwords / words, 1.0)
+    return ((token_counts >= min_tokens)
+            & (alpha_ratio > min_alpha_ratio)
+            & (stopword_density <= max_stopword_density)
+            & (verbs > 0)
+            & (nouns > 0))
+
+def filter_fragments(texts: List[str]) -> List[str]:
+    mask = score_fragments(texts)
+    return [text for text, keep in zip(texts, mask) if keep]
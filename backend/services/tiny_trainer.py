@@ -0,0 +1,146 @@
+"""A tiny CPU-only trainer that speaks the fine-tuning scheduler's protocol.
+
+Fits a byte-level bigram language model to the dataset's text with numpy,
+which takes seconds, so the scheduler, metrics and checkpoint/resume paths
+can be exercised without a GPU or model weights. The base model is only
+recorded. Run by services/fine_tuner.py as:
+
+    python -m services.tiny_trainer --config <run_dir>/run_config.json
+"""
+import sys
+import json
+import time
+import signal
+import argparse
+from pathlib import Path
+import numpy as np
+
+VOCAB = 256  # bytes
+DEFAULTS = {
+    "steps": 200,
+    "batch_size": 32,
+    "seq_len": 64,
+    "learning_rate": 1.0,
+    "log_every": 10,
+    "checkpoint_every": 50,
+    "keep_checkpoints": 3,
+    "text_columns": ["question", "answer"],
+    "seed": 0,
+    "step_delay": 0.0,  # Seconds slept per step, to make runs long enough to watch in tests
+}
+
+stop_requested = False
+
+def emit(event, **fields):
+    print(json.dumps({"event": event, **fields}), flush=True)
+
+def load_text(dataset_path, columns):
+    # Imported here so a trainer that can't read the dataset still reports it as an event
+    from services.dataset_store import load_table
+    table = load_table(dataset_path)
+    columns = [name for name in columns if name in table.column_names] or table.column_names
+    parts = []
+    for name in columns:
+        parts.extend(value for value in table.column(name).to_pylist() if value)
+    return np.frombuffer("\n".join(parts).encode('utf-8'), dtype=np.uint8)
+
+def latest_checkpoint(checkpoint_dir: Path):
+    checkpoints = sorted(checkpoint_dir.glob("step-*.npz"))
+    return checkpoints[-1] if checkpoints else None
+
+def save_checkpoint(checkpoint_dir: Path, weights, step, rng, keep):
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    path = checkpoint_dir / f"step-{step:07d}.npz"
+    tmp_path = path.with_suffix(".tmp.npz")
+    np.savez(tmp_path, weights=weights, step=step, rng_state=json.dumps(rng.bit_generator.state))
+    tmp_path.replace(path)
+    for old in sorted(checkpoint_dir.glob("step-*.npz"))[:-keep]:
+        old.unlink()
+    emit("checkpoint", step=step, path=str(path))
+
+def train(config):
+    params = dict(DEFAULTS, **config.get("hyperparameters", {}))
+    output_dir = Path(config["output_dir"])
+    checkpoint_dir = Path(config["checkpoint_dir"])
+    data = load_text(config["dataset_path"], params["text_columns"])
+    if len(data) <= params["seq_len"] + 1:
+        raise ValueError("Dataset has too little text to train on")
+
+    weights = np.zeros((VOCAB, VOCAB), dtype=np.float32)  # logits of the next byte given the current one
+    rng = np.random.default_rng(params["seed"])
+    step = 0
+    checkpoint = latest_checkpoint(checkpoint_dir) if config.get("resume") else None
+    if checkpoint is not None:
+        with np.load(checkpoint) as saved:
+            weights = saved["weights"]
+            step = int(saved["step"])
+            rng.bit_generator.state = json.loads(str(saved["rng_state"]))
+        emit("resumed", step=step, path=str(checkpoint))
+
+    start_step = step
+    total_steps = params["steps"]
+    batch, seq_len = params["batch_size"], params["seq_len"]
+    window_started, window_tokens, loss = time.perf_counter(), 0, None
+    while step < total_steps and not stop_requested:
+        starts = rng.integers(0, len(data) - seq_len - 1, size=batch)
+        index = starts[:, None] + np.arange(seq_len + 1)
+        tokens = data[index]
+        current, following = tokens[:, :-1].ravel(), tokens[:, 1:].ravel()
+        logits = weights[current]
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        rows = np.arange(len(current))
+        loss = float(-np.log(probs[rows, following] + 1e-12).mean())
+        probs[rows, following] -= 1
+        gradient = np.zeros_like(weights)
+        np.add.at(gradient, current, probs)
+        weights -= params["learning_rate"] * gradient / len(current)
+        step += 1
+        window_tokens += len(current)
+        if params["step_delay"]:
+            time.sleep(params["step_delay"])
+
+        if step % params["log_every"] == 0 or step == total_steps:
+            elapsed = time.perf_counter() - window_started
+            emit("metrics", step=step, total_steps=total_steps, start_step=start_step, loss=round(loss, 5),
+                 tokens_per_second=round(window_tokens / elapsed, 1) if elapsed else None,
+                 samples_per_second=round(window_tokens / seq_len / elapsed, 2) if elapsed else None)
+            window_started, window_tokens = time.perf_counter(), 0
+        if step % params["checkpoint_every"] == 0:
+            save_checkpoint(checkpoint_dir, weights, step, rng, params["keep_checkpoints"])
+
+    if stop_requested:
+        # Stopped by the scheduler: checkpoint so a resumed job loses nothing
+        save_checkpoint(checkpoint_dir, weights, step, rng, params["keep_checkpoints"])
+        emit("stopped", step=step)
+        return
+
+    model_path = output_dir / "model.npz"
+    np.savez(model_path, weights=weights)
+    with open(output_dir / "model.json", 'w', encoding='utf-8') as f:
+        json.dump({"trainer": "tiny", "base_model": config.get("base_model"), "dataset": config["dataset_path"],
+                   "steps": step, "hyperparameters": params}, f, indent=2)
+    emit("done", step=step, loss=round(loss, 5) if loss is not None else None, model_path=str(model_path))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", required=True)
+    args = parser.parse_args()
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    def request_stop(signum, frame):
+        global stop_requested
+        stop_requested = True
+    signal.signal(signal.SIGTERM, request_stop)
+
+    try:
+        train(config)
+    except Exception as e:
+        emit("error", detail=str(e))
+        print(f"Training failed: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import aiofiles
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from config import UPLOAD_DIR, UPLOAD_SESSION_DIR, UPLOAD_SESSION_TTL
+from services.extraction_cache import extraction_cache, file_sha256
+from services.file_catalog import file_catalog
+
+logger = logging.getLogger(__name__)
+
+TMP_DIR = UPLOAD_SESSION_DIR / "tmp"
+SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+class UploadTooLarge(Exception):
+    pass
+
+class OffsetMismatch(Exception):
+    """A chunk does not start where the received data ends."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected chunk at offset {offset}")
+        self.offset = offset
+
+class ChecksumMismatch(Exception):
+    pass
+
+class MultipartError(Exception):
+    pass
+
+class MultipartFile:
+    """Reads one file field out of a multipart/form-data body as it arrives.
+
+    The body is fed to python-multipart's push parser chunk by chunk, and the
+    file's bytes are handed on as soon as they are parsed, so nothing is
+    spooled. Raises UploadTooLarge once more than `max_body` bytes of body
+    have been received, without reading the rest.
+    """
+
+    def __init__(self, stream: AsyncIterator[bytes], content_type: str, max_body: int, field: str = "file"):
+        from multipart.multipart import MultipartParser, parse_options_header
+
+        self._parse_options_header = parse_options_header
+        _, options = parse_options_header(content_type)
+        if b"boundary" not in options:
+            raise MultipartError("Expected a multipart/form-data body with a boundary")
+        self._stream = stream.__aiter__()
+        self._max_body = max_body
+        self._field = field
+        self.received = 0
+        self.filename: Optional[str] = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._in_file = False
+        self._file_done = False
+        self._ended = False
+        self._pending: List[bytes] = []
+        self._parser = MultipartParser(options[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def _on_part_begin(self):
+        self._disposition = b""
+
+    def _on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = self._parse_options_header(self._disposition)
+        # Only the first matching file is taken; other fields are skipped over
+        if self.filename is None and options.get(b"name") == self._field.encode() and b"filename" in options:
+            self.filename = options[b"filename"].decode('utf-8', errors='replace')
+            self._in_file = True
+
+    def _on_part_data(self, data, start, end):
+        if self._in_file:
+            self._pending.append(bytes(data[start:end]))
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    def _on_end(self):
+        self._ended = True
+
+    async def _feed(self) -> bool:
+        """Parse the next chunk of the body; False once the body is exhausted."""
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            return False
+        self.received += len(chunk)
+        if self.received > self._max_body:
+            raise UploadTooLarge(f"Request body exceeds the {self._max_body} byte limit")
+        try:
+            self._parser.write(chunk)
+        except Exception as e:
+            raise MultipartError(f"Malformed multipart body: {e}")
+        return True
+
+    async def open(self) -> str:
+        """Read up to the start of the file field and return its filename."""
+        while self.filename is None:
+            if self._ended or not await self._feed():
+                raise MultipartError(f"No file in field '{self._field}'")
+        return self.filename
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            while self._pending:
+                yield self._pending.pop(0)
+            if self._file_done:
+                return
+            if not await self._feed():
+                raise MultipartError("Body ended inside the file field")
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+def _publish(source: Path, destination: Path, sha256: str):
+    # Same filesystem (both under DATA_DIR), so readers only ever see the old
+    # file or the complete new one.
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(source, destination)
+    extraction_cache.invalidate(destination)
+    file_catalog.upsert_file(destination, sha256=sha256)
+
+async def write_stream(chunks: AsyncIterator[bytes], destination: Path, max_bytes: int) -> int:
+    """Stream chunks into a temp file and atomically move it to `destination`.
+
+    Raises UploadTooLarge as soon as more than `max_bytes` have arrived; the
+    partial temp file is removed and `destination` is left untouched.
+    """
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = TMP_DIR / f"{uuid.uuid4().hex}.part"
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                await f.write(chunk)
+        _publish(tmp_path, destination, digest.hexdigest())
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return size
+
+# Resumable uploads. A session is a metadata JSON file plus the data received
+# so far; the size of the data file is the resume offset, so a session
+# survives both dropped connections and server restarts.
+
+_session_locks: Dict[str, asyncio.Lock] = {}
+
+def _paths(session_id: str):
+    if not SESSION_ID_PATTERN.match(session_id):
+        raise KeyError(session_id)
+    return UPLOAD_SESSION_DIR / f"{session_id}.json", UPLOAD_SESSION_DIR / f"{session_id}.data"
+
+def _load(session_id: str) -> dict:
+    meta_path, data_path = _paths(session_id)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+    except FileNotFoundError:
+        raise KeyError(session_id)
+    session["offset"] = data_path.stat().st_size if data_path.exists() else 0
+    return session
+
+def _save(session: dict):
+    meta_path, _ = _paths(session["session_id"])
+    tmp_path = meta_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({key: value for key, value in session.items() if key != "offset"}, f)
+    os.replace(tmp_path, meta_path)
+
+def _lock(session_id: str) -> asyncio.Lock:
+    return _session_locks.setdefault(session_id, asyncio.Lock())
+
+def expire_sessions():
+    if not UPLOAD_SESSION_DIR.exists():
+        return
+    cutoff = time.time() - UPLOAD_SESSION_TTL
+    for meta_path in UPLOAD_SESSION_DIR.glob("*.json"):
+        session_id = meta_path.stem
+        data_path = meta_path.with_suffix('.data')
+        last_activity = max(path.stat().st_mtime for path in (meta_path, data_path) if path.exists())
+        if last_activity < cutoff:
+            logger.info(f"Expiring idle upload session {session_id}")
+            _discard(session_id)
+
+def create_session(filename: str, folder: str, total_size: int, sha256: Optional[str] = None) -> dict:
+    expire_sessions()
+    UPLOAD_SESSION_DIR.mkdir(parents=True, exist_ok=True)
+    session = {
+        "session_id": uuid.uuid4().hex,
+        "filename": filename,
+        "folder": folder or "",
+        "total_size": total_size,
+        "sha256": sha256.lower() if sha256 else None,
+        "created": time.time(),
+    }
+    _save(session)
+    _paths(session["session_id"])[1].touch()
+    session["offset"] = 0
+    logger.info(f"Started upload session {session['session_id']} for {filename} ({total_size} bytes)")
+    return session
+
+def get_session(session_id: str) -> dict:
+    return _load(session_id)
+
+async def write_chunk(session_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+    """Append a chunk at `offset`, which must not be past the data received so far.
+
+    A chunk starting before the end (a retry of one whose acknowledgement was
+    lost) overwrites from its offset onwards.
+    """
+    async with _lock(session_id):
+        session = _load(session_id)
+        if offset > session["offset"]:
+            raise OffsetMismatch(session["offset"])
+        _, data_path = _paths(session_id)
+        position = offset
+        async with aiofiles.open(data_path, 'r+b') as f:
+            await f.seek(offset)
+            await f.truncate()
+            async for chunk in chunks:
+                position += len(chunk)
+                if position > session["total_size"]:
+                    await f.truncate(offset)
+                    raise UploadTooLarge(f"Chunk runs past the declared size of {session['total_size']} bytes")
+                await f.write(chunk)
+        session["offset"] = position
+        return session
+
+async def finalize_session(session_id: str, sha256: Optional[str] = None) -> dict:
+    async with _lock(session_id):
+        session = _load(session_id)
+        if session["offset"] != session["total_size"]:
+            raise OffsetMismatch(session["offset"])
+        _, data_path = _paths(session_id)
+        digest = await asyncio.to_thread(file_sha256, data_path)
+        expected = (sha256 or session["sha256"] or "").lower()
+        if expected and digest != expected:
+            # Corruption cannot be located, so the transfer starts over
+            _discard(session_id)
+            raise ChecksumMismatch(f"Checksum mismatch: expected {expected}, received data hashes to {digest}")
+        destination = Path(UPLOAD_DIR) / session["folder"] / session["filename"]
+        _publish(data_path, destination, digest)
+        _discard(session_id)
+    logger.info(f"Completed upload session {session_id}: {destination}")
+    return {"filename": session["filename"], "folder": session["folder"], "size": session["total_size"], "sha256": digest}
+
+def _discard(session_id: str):
+    meta_path, data_path = _paths(session_id)
+    _remove(data_path)
+    _remove(meta_path)
+    _session_locks.pop(session_id, None)
+
+def abort_session(session_id: str):
+    _load(session_id)
+    _discard(session_id)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+
+from routes import upload_routes
+from services import upload_store
+
+LIMIT = 64 * 1024
+CHUNK = 4 * 1024
+BOUNDARY = "testboundary"
+
+def multipart_body(filename, content):
+    return (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/plain\r\n\r\n").encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def post_upload(app, body, content_length=False):
+    """POST `body` to /api/upload/ in CHUNK-sized messages; return (status, response body, bytes handed to the app)."""
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": "/api/upload/", "raw_path": b"/api/upload/", "root_path": "", "query_string": b"",
+             "headers": headers, "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+    chunks = [body[start:start + CHUNK] for start in range(0, len(body), CHUNK)]
+    state = {"sent": 0, "index": 0}
+    response = {"body": b""}
+
+    async def receive():
+        if state["index"] >= len(chunks):
+            return {"type": "http.disconnect"}
+        chunk = chunks[state["index"]]
+        state["index"] += 1
+        state["sent"] += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": state["index"] < len(chunks)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    asyncio.run(app(scope, receive, send))
+    return response, state["sent"]
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_routes, "MAX_UPLOAD_SIZE", LIMIT)
+    monkeypatch.setattr(upload_routes, "MULTIPART_OVERHEAD", 1024)
+    monkeypatch.setattr(upload_routes, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(upload_store, "TMP_DIR", tmp_path / "tmp")
+    monkeypatch.setattr(upload_store, "_publish",
+                        lambda source, destination, sha256: (destination.parent.mkdir(parents=True, exist_ok=True),
+                                                             os.replace(source, destination)))
+    app = FastAPI()
+    app.include_router(upload_routes.router, prefix="/api")
+    return app
+
+def test_oversized_upload_is_cut_off_while_streaming(app, tmp_path):
+    body = multipart_body("big.txt", b"x" * (LIMIT * 4))
+    response, sent = post_upload(app, body)
+    assert response["status"] == 413
+    assert response["headers"][b"connection"] == b"close"
+    assert sent < LIMIT + 2 * CHUNK < len(body)
+    assert not (tmp_path / "uploads" / "big.txt").exists()
+    assert not list((tmp_path / "tmp").iterdir())
+
+def test_oversized_content_length_is_rejected_before_reading(app):
+    body = multipart_body("big.txt", b"x" * (LIMIT * 4))
+    response, sent = post_upload(app, body, content_length=True)
+    assert response["status"] == 413
+    assert sent == 0
+
+def test_upload_within_limit_is_stored(app, tmp_path):
+    content = os.urandom(LIMIT - 100)
+    response, sent = post_upload(app, multipart_body("small.txt", content))
+    assert response["status"] == 200, response["body"]
+    assert json.loads(response["body"])["filename"] == "small.txt"
+    assert (tmp_path / "uploads" / "small.txt").read_bytes() == content
+
+def test_body_without_file_field_is_rejected(app):
+    body = f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"other\"\r\n\r\nvalue\r\n--{BOUNDARY}--\r\n".encode()
+    response, _ = post_upload(app, body)
+    assert response["status"] == 400
@@ -0,0 +1,80 @@
+import os
+import logging
+from pathlib import Path
+from typing import Iterable, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+def arrow_available() -> bool:
+    return pa is not None
+
+class ChunkedArrowWriter:
+    """Arrow IPC counterpart of ChunkedCsvWriter: string columns, one record batch per chunk.
+
+    Writes `<path>.part` and renames it into place on `commit()`, so readers
+    never memory-map a half-written file.
+    """
+
+    def __init__(self, path: Path, header: List[str], chunk_rows: int = 1000):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed")
+        self.path = Path(path)
+        self.part_path = self.path.with_name(self.path.name + ".part")
+        self.header = header
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._buffer = []
+        self.schema = pa.schema([(name, pa.string()) for name in header])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._sink = pa.OSFile(str(self.part_path), 'wb')
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write_row(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def write_rows(self, rows: Iterable):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        if self._buffer:
+            columns = [pa.array([row[i] for row in self._buffer], type=pa.string()) for i in range(len(self.header))]
+            self._writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self.schema))
+            self.rows_written += len(self._buffer)
+            self._buffer.clear()
+
+    def _close(self):
+        if not self._sink.closed:
+            self._writer.close()
+            self._sink.close()
+
+    def commit(self):
+        self.flush()
+        self._close()
+        os.replace(self.part_path, self.path)
+        logger.info(f"Arrow file created: {self.path} ({self.rows_written} rows)")
+
+    def abort(self):
+        self._buffer.clear()
+        self._close()
+        if self.part_path.exists():
+            self.part_path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            # Unlike CSV, an unterminated IPC file is unreadable, so there is nothing worth keeping
+            self.abort()
+        return False
@@ -0,0 +1,142 @@
+import io
+import csv
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from config import CSV_INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+
+def scan_row_offsets(csv_path) -> np.ndarray:
+    """Return the byte offset at which each record starts, the header included.
+
+    A newline ends a record only when it sits outside a quoted field, i.e.
+    after an even number of quote characters since the file start (escaped
+    quotes are doubled, so they never change the parity). Quotes and newlines
+    are located a chunk at a time with NumPy.
+    """
+    starts = [np.zeros(1, dtype=np.int64)]
+    quotes_seen = 0
+    base = 0
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(SCAN_CHUNK_SIZE), b''):
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            quote_counts = np.cumsum(data == QUOTE, dtype=np.int64) + quotes_seen
+            newlines = np.flatnonzero(data == NEWLINE)
+            outside_quotes = newlines[quote_counts[newlines] % 2 == 0]
+            starts.append(outside_quotes.astype(np.int64) + base + 1)
+            quotes_seen = int(quote_counts[-1])
+            base += len(chunk)
+    offsets = np.concatenate(starts)
+    # A trailing newline does not start another record
+    if len(offsets) > 1 and offsets[-1] >= base:
+        offsets = offsets[:-1]
+    if base == 0:
+        offsets = offsets[:0]
+    return offsets
+
+class CsvRowIndex:
+    """Row-offset indexes of CSV files, kept under `index_dir` and rebuilt when a file's size or mtime changes.
+
+    Indexes are also held in a small in-memory LRU, so repeated previews of
+    the same file do not touch the index file at all.
+    """
+
+    def __init__(self, index_dir: Path, memory_entries: int = 16):
+        self.index_dir = Path(index_dir)
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[tuple, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index_path(self, csv_path: Path) -> Path:
+        digest = hashlib.sha1(str(Path(csv_path).resolve()).encode()).hexdigest()
+        return self.index_dir / f"{digest}.npz"
+
+    def offsets(self, csv_path) -> np.ndarray:
+        csv_path = Path(csv_path)
+        stats = csv_path.stat()
+        version = (stats.st_size, stats.st_mtime_ns)
+        key = str(csv_path.resolve())
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and cached[0] == version:
+                self._memory.move_to_end(key)
+                return cached[1]
+        index_path = self._index_path(csv_path)
+        offsets = None
+        try:
+            with np.load(index_path) as stored:
+                if tuple(int(v) for v in stored["version"]) == version:
+                    offsets = stored["offsets"]
+        except (OSError, KeyError, ValueError):
+            pass
+        if offsets is None:
+            offsets = scan_row_offsets(csv_path)
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_suffix('.tmp.npz')
+            np.savez(tmp_path, offsets=offsets, version=np.array(version, dtype=np.int64))
+            tmp_path.replace(index_path)
+            logger.info(f"Indexed {len(offsets)} records of {csv_path.name}")
+        with self._lock:
+            self._memory[key] = (version, offsets)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return offsets
+
+    def forget(self, csv_path):
+        """Drop the index of a CSV that was deleted."""
+        with self._lock:
+            self._memory.pop(str(Path(csv_path).resolve()), None)
+        self._index_path(csv_path).unlink(missing_ok=True)
+
+    def move(self, old_path, new_path):
+        """Re-key the index of a renamed CSV; a rename keeps the mtime, so the index stays valid."""
+        with self._lock:
+            self._memory.pop(str(Path(old_path).resolve()), None)
+        try:
+            self._index_path(old_path).replace(self._index_path(new_path))
+        except FileNotFoundError:
+            pass
+
+    def read_rows(self, csv_path, offset: int = 0, limit: int = 100,
+                  columns: Optional[List[str]] = None) -> Tuple[int, List[str], List[dict]]:
+        """Return (total data rows, header, rows offset..offset+limit as dicts).
+
+        Only the bytes of the header and the requested rows are read.
+        Raises KeyError for a requested column the file does not have.
+        """
+        offsets = self.offsets(csv_path)
+        total = max(0, len(offsets) - 1)
+        if not len(offsets):
+            return 0, [], []
+        with open(csv_path, 'rb') as f:
+            header_end = int(offsets[1]) if len(offsets) > 1 else None
+            header_bytes = f.read(header_end) if header_end is not None else f.read()
+            header = next(csv.reader(io.StringIO(header_bytes.decode('utf-8-sig'))), [])
+            selected = columns or header
+            missing = [column for column in selected if column not in header]
+            if missing:
+                raise KeyError(", ".join(missing))
+            first = offset + 1
+            if first >= len(offsets) or limit <= 0:
+                rows = []
+            else:
+                last = first + limit
+                f.seek(int(offsets[first]))
+                block = f.read(int(offsets[last]) - int(offsets[first])) if last < len(offsets) else f.read()
+                rows = list(csv.reader(io.StringIO(block.decode('utf-8'), newline='')))
+        positions = [header.index(column) for column in selected]
+        data = [{column: (row[position] if position < len(row) else None) for column, position in zip(selected, positions)}
+                for row in rows]
+        return total, header, data
+
+csv_row_index = CsvRowIndex(CSV_INDEX_DIR)
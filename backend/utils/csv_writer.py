@@ -0,0 +1,72 @@
+import csv
+import os
+import logging
+from pathlib import Path
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+class ChunkedCsvWriter:
+    """Write rows to `<path>.part` in fixed-size chunks and publish the file atomically.
+
+    Rows are flushed to disk every `chunk_rows` rows, so memory stays flat and
+    a failure leaves everything written so far in the `.part` file. `commit()`
+    renames the part file into place; `abort()` removes it.
+    """
+
+    def __init__(self, path: Path, header: List[str], chunk_rows: int = 1000):
+        self.path = Path(path)
+        self.part_path = self.path.with_name(self.path.name + ".part")
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._buffer = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.part_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write_row(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def write_rows(self, rows: Iterable):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+
+    def commit(self):
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.part_path, self.path)
+        logger.info(f"CSV file created: {self.path} ({self.rows_written} rows)")
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def abort(self):
+        self._buffer.clear()
+        if not self._file.closed:
+            self._file.close()
+        if self.part_path.exists():
+            self.part_path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        elif not self._file.closed:
+            self.close()
+            logger.error(f"CSV write interrupted; partial output kept at {self.part_path}")
+        return False
@@ -0,0 +1,82 @@
+import time
+from config import METRICS_TRANSFER_MIN_BYTES
+from utils.metrics import Counter, Gauge, Histogram, THROUGHPUT_BUCKETS
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status.",
+                        ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds",
+                         "Time until the response body is complete (whole stream for streamed responses).",
+                         ["method", "route"])
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served.")
+TRANSFER_BYTES = Counter("http_transfer_bytes_total", "Request (upload) and response (download) body bytes.",
+                         ["direction", "route"])
+TRANSFER_RATE = Histogram("http_transfer_bytes_per_second",
+                          f"Body throughput of transfers of at least {METRICS_TRANSFER_MIN_BYTES} bytes.",
+                          ["direction", "route"], buckets=THROUGHPUT_BUCKETS)
+
+UNMATCHED = "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and body throughput per route template.
+
+    Routes are labelled by their path template ("/api/files/{file_path:path}"),
+    never the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            # Built on first use, once the routers are included
+            self._route_paths = {getattr(route, "endpoint", None): route.path for route in scope["app"].routes}
+            path = self._route_paths.get(endpoint, UNMATCHED)
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        # status, bytes received, time of the last request body chunk, bytes sent, time the response started
+        state = {"status": 500, "received": 0, "received_at": started, "sent": 0, "response_at": None}
+
+        async def receive_counted():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                state["received_at"] = time.perf_counter()
+            return message
+
+        async def send_counted(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                state["response_at"] = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            finished = time.perf_counter()
+            method = scope["method"]
+            route = self._route(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=state["status"])
+            HTTP_LATENCY.observe(finished - started, method=method, route=route)
+            _record_transfer("upload", route, state["received"], state["received_at"] - started)
+            if state["response_at"] is not None:
+                _record_transfer("download", route, state["sent"], finished - state["response_at"])
+
+def _record_transfer(direction, route, size, seconds):
+    if size:
+        TRANSFER_BYTES.inc(size, direction=direction, route=route)
+        if size >= METRICS_TRANSFER_MIN_BYTES and seconds > 0:
+            TRANSFER_RATE.observe(size / seconds, direction=direction, route=route)
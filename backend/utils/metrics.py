@@ -0,0 +1,184 @@
+import time
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# In-process metrics in the Prometheus text format. Recording a value is a
+# dict lookup and a few additions under a per-metric lock, cheap enough for
+# every request and every extracted file.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; request latency, from a cached lookup up to a long extraction or stream
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Bytes per second, 64 KB/s to 1 GB/s
+THROUGHPUT_BUCKETS = tuple(64 * 1024 * 4 ** power for power in range(8))
+# Tokens per second
+TOKEN_RATE_BUCKETS = (1, 2.5, 5, 10, 20, 40, 80, 160, 320, 640)
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric(ABC):
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        if len(self.labelnames) > 1:
+            self._label_values = itemgetter(*self.labelnames)
+        elif self.labelnames:
+            getter = itemgetter(self.labelnames[0])
+            self._label_values = lambda labels: (getter(labels),)
+        else:
+            self._label_values = lambda labels: ()
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        # Label values are kept as given and only turned into text when rendered
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return self._label_values(labels)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class _ValueMetric(Metric):
+    """One number per label set; `set_function` reads them from elsewhere when scraped instead."""
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._function: Optional[Callable[[], Dict[Tuple, float]]] = None
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, function: Callable[[], Dict[Tuple, float]]):
+        """`function` returns {label values: value}; `()` is the key for a metric without labels."""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            values = list(self._function().items())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+class Counter(_ValueMetric):
+    kind = "counter"
+
+class Gauge(_ValueMetric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (made cumulative when rendered), sum
+                state = self._values[key] = [[0] * len(self.buckets), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class Stopwatch:
+    """Adds up the time spent in named stages, e.g. `with stopwatch("parse"): ...`."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def __call__(self, stage: str):
+        return _Stage(self, stage)
+
+class _Stage:
+    __slots__ = ("stopwatch", "stage", "started")
+
+    def __init__(self, stopwatch, stage):
+        self.stopwatch = stopwatch
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stopwatch.add(self.stage, time.perf_counter() - self.started)
+        return False
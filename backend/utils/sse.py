@@ -0,0 +1,69 @@
+import json
+import time
+import logging
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Keep proxies (nginx) from buffering the stream
+}
+
+def sse_event(event: str, data) -> str:
+    """One server-sent event; `data` is sent as a single line of JSON."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def token_events(chunks: AsyncIterator[dict], started: Optional[float] = None) -> AsyncIterator[str]:
+    """Turn a model stream into SSE events with token-level timing.
+
+    `chunks` yields {"content": ...} per token and a final {"done": True, ...}
+    with Ollama's counters. Each token becomes a `token` event; the end of
+    the stream a `stats` event with time to first token and tokens per
+    second; a failure an `error` event. `started` (time.perf_counter()) is
+    when the request arrived, so queueing counts towards time to first token.
+
+    Events are produced one at a time as the response sends them, so a slow
+    client slows the upstream read instead of piling up events in memory.
+    """
+    started = time.perf_counter() if started is None else started
+    first_token_at = last_token_at = None
+    tokens = 0
+    try:
+        async for chunk in chunks:
+            if chunk.get("done"):
+                finished = time.perf_counter()
+                eval_count, eval_duration = chunk.get("eval_count"), chunk.get("eval_duration")
+                stats = {key: value for key, value in chunk.items() if key != "done"}
+                stats.update({
+                    "tokens": tokens,
+                    "time_to_first_token": round(first_token_at - started, 4) if first_token_at else None,
+                    "elapsed": round(finished - started, 4),
+                    # Generation speed as Ollama measured it, and as the tokens actually reached us
+                    "tokens_per_second": round(eval_count / (eval_duration / 1e9), 2)
+                    if eval_count and eval_duration else None,
+                    "delivered_tokens_per_second": round((tokens - 1) / (last_token_at - first_token_at), 2)
+                    if tokens > 1 and last_token_at > first_token_at else None,
+                })
+                yield sse_event("stats", stats)
+                return
+            if chunk.get("content"):
+                last_token_at = time.perf_counter()
+                if first_token_at is None:
+                    first_token_at = last_token_at
+                tokens += 1
+                yield sse_event("token", {"content": chunk["content"]})
+        yield sse_event("error", {"detail": "The model stream ended early"})
+    except Exception as e:
+        # httpx is already loaded by the client that raised; imported here to keep it off the import path
+        import httpx
+        if isinstance(e, httpx.TimeoutException):
+            logger.error(f"Timed out streaming from model: {str(e)}")
+            yield sse_event("error", {"detail": "Timed out waiting for the model"})
+        else:
+            logger.error(f"Error streaming from model: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+    finally:
+        # Close the upstream stream now rather than whenever the generator is
+        # collected, so Ollama stops generating as soon as the client is gone
+        await chunks.aclose()
@@ -0,0 +1,59 @@
+import io
+import logging
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that hands out whatever zipfile wrote since the last pop.
+
+    Because it cannot seek, zipfile writes a data descriptor after each entry
+    instead of going back to patch the local header, so nothing ever needs to
+    be rewritten once it has been sent.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_zip(entries: Iterable[Tuple[Path, str]], store_extensions=frozenset(),
+             chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Yield a ZIP archive of (file_path, arcname) entries as it is produced.
+
+    Memory use is bounded by `chunk_size` regardless of file or archive size.
+    Files whose extension is in `store_extensions` (already compressed
+    formats) are stored as-is instead of being deflated again.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for file_path, arcname in entries:
+            zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+            if Path(file_path).suffix.lower() in store_extensions:
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+            with open(file_path, "rb") as src, zf.open(zinfo, "w") as dest:
+                for chunk in iter(lambda: src.read(chunk_size), b""):
+                    dest.write(chunk)
+                    data = sink.pop()
+                    if data:
+                        yield data
+            data = sink.pop()
+            if data:
+                yield data
+            logger.info(f"Added file to zip: {arcname}")
+    # Central directory
+    yield sink.pop()
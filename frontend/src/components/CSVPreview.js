@@ -1,18 +1,27 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import { Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Paper, Typography } from '@material-ui/core';
+import { Table, TableBody, TableCell, TableContainer, TableHead, TableRow, TablePagination, Paper, Typography } from '@material-ui/core';
 
 function CSVPreview({ filename }) {
   const [previewData, setPreviewData] = useState([]);
   const [error, setError] = useState(null);
+  const [page, setPage] = useState(0);
+  const [rowsPerPage, setRowsPerPage] = useState(100);
+  const [totalRows, setTotalRows] = useState(0);
+
+  useEffect(() => {
+    setPage(0);
+  }, [filename]);
 
   useEffect(() => {
     const fetchCSVPreview = async () => {
       console.log("Fetching preview for:", filename);
       try {
-        const response = await axios.get(`http://localhost:8000/api/csv-preview/${filename}`);
-        console.log("Preview data:", response.data);
+        const response = await axios.get(`http://localhost:8000/api/csv-preview/${filename}`, {
+          params: { offset: page * rowsPerPage, limit: rowsPerPage }
+        });
         setPreviewData(response.data);
+        setTotalRows(parseInt(response.headers['x-total-count'], 10) || response.data.length);
         setError(null);
       } catch (error) {
         console.error('Error fetching CSV preview:', error);
@@ -24,7 +33,7 @@ function CSVPreview({ filename }) {
     if (filename) {
       fetchCSVPreview();
     }
-  }, [filename]);
+  }, [filename, page, rowsPerPage]);
 
   if (error) {
     return (
@@ -62,6 +71,18 @@ function CSVPreview({ filename }) {
           ))}
         </TableBody>
       </Table>
+      <TablePagination
+        component="div"
+        count={totalRows}
+        page={page}
+        rowsPerPage={rowsPerPage}
+        rowsPerPageOptions={[50, 100, 500]}
+        onPageChange={(event, newPage) => setPage(newPage)}
+        onRowsPerPageChange={(event) => {
+          setRowsPerPage(parseInt(event.target.value, 10));
+          setPage(0);
+        }}
+      />
     </TableContainer>
   );
 }
@@ -100,16 +100,22 @@ function ExtractComponent() {
 
     console.log('Extracting files:', selectedFiles);
     try {
-      const response = await axios.post('http://localhost:8000/api/extract/', {
+      const submitted = await axios.post('http://localhost:8000/api/extract/', {
         filenames: selectedFiles,
         csv_filename: csvFilename.trim()
       });
-      setMessage(`Extraction process completed.\nCSV file created: ${response.data.csv_file}`);
-      response.data.results.forEach(result => {
-        setMessage(prev => prev + `\n${result.filename}: ${result.status}`);
+      const job = await waitForExtractionJob(submitted.data.job_id);
+      if (job.status !== 'completed') {
+        setMessage(`Extraction ${job.status}${job.error ? `: ${job.error}` : ''}`);
+        return;
+      }
+      const result = job.result;
+      setMessage(`Extraction process completed.\nCSV file created: ${result.csv_file}`);
+      result.results.forEach(fileResult => {
+        setMessage(prev => prev + `\n${fileResult.filename}: ${fileResult.status}`);
       });
       
-      setNewlyCreatedCsvFile(response.data.csv_file);
+      setNewlyCreatedCsvFile(result.csv_file);
       fetchCsvFiles();
     } catch (error) {
       setMessage('Error extracting content');
@@ -119,6 +125,22 @@ function ExtractComponent() {
     }
   };
 
+  const waitForExtractionJob = async (jobId) => {
+    while (true) {
+      const response = await axios.get(`http://localhost:8000/api/extract/jobs/${jobId}`);
+      const job = response.data;
+      if (!['queued', 'running'].includes(job.status)) {
+        return job;
+      }
+      const progress = job.progress || {};
+      if (progress.files_total) {
+        const eta = progress.eta_seconds !== undefined ? `, about ${Math.ceil(progress.eta_seconds)}s left` : '';
+        setMessage(`Extracting: ${progress.files_done}/${progress.files_total} files, ${progress.pages_done} pages, ${progress.items_extracted} items${eta}`);
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
   useEffect(() => {
     if (newlyCreatedCsvFile) {
       setSelectedCsvFile(newlyCreatedCsvFile);
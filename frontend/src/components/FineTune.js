@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './FineTune.css';
 import { Typography, Button, Paper, Grid, Container, FormControl, InputLabel, Select, MenuItem } from '@material-ui/core';
 import axios from 'axios';
@@ -10,10 +10,13 @@ function FineTune() {
   const [baseModels, setBaseModels] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [message, setMessage] = useState('');
+  const [job, setJob] = useState(null);
+  const pollRef = useRef(null);
 
   useEffect(() => {
     fetchDatasets();
     fetchBaseModels();
+    return () => clearInterval(pollRef.current);
   }, []);
 
   const fetchDatasets = async () => {
@@ -44,21 +47,59 @@ function FineTune() {
     setSelectedBaseModel(event.target.value);
   };
 
-  const handleSubmit = () => {
+  const FINISHED = ['completed', 'failed', 'cancelled', 'interrupted'];
+
+  const pollJob = (jobId) => {
+    clearInterval(pollRef.current);
+    pollRef.current = setInterval(async () => {
+      try {
+        const response = await axios.get(`http://localhost:8000/api/fine-tune/jobs/${jobId}`);
+        setJob(response.data);
+        if (FINISHED.includes(response.data.status)) {
+          clearInterval(pollRef.current);
+          setIsLoading(false);
+          setMessage(response.data.status === 'completed'
+            ? `Fine-tuning completed with dataset: ${selectedDataset} and base model: ${selectedBaseModel}`
+            : `Fine-tuning ${response.data.status}${response.data.error ? `: ${response.data.error}` : ''}`);
+        }
+      } catch (error) {
+        console.error('Error fetching fine-tuning job:', error);
+      }
+    }, 2000);
+  };
+
+  const handleSubmit = async () => {
     if (selectedDataset && selectedBaseModel) {
       setIsLoading(true);
-      // TODO: Implement fine-tuning process
-      console.log('Starting fine-tuning with dataset:', selectedDataset, 'and base model:', selectedBaseModel);
-      // Simulating a process
-      setTimeout(() => {
+      setMessage('');
+      try {
+        const response = await axios.post('http://localhost:8000/api/fine-tune/jobs/', {
+          dataset: selectedDataset,
+          base_model: selectedBaseModel,
+        });
+        setJob(response.data.job);
+        pollJob(response.data.job_id);
+      } catch (error) {
+        console.error('Error starting fine-tuning:', error);
         setIsLoading(false);
-        setMessage(`Fine-tuning completed with dataset: ${selectedDataset} and base model: ${selectedBaseModel}`);
-      }, 3000);
+        setMessage(error.response?.data?.detail || 'Error starting fine-tuning. Please try again.');
+      }
     } else {
       setMessage('Please select both a dataset and a base model.');
     }
   };
 
+  const handleCancel = async () => {
+    try {
+      await axios.post(`http://localhost:8000/api/fine-tune/jobs/${job.id}/cancel`);
+    } catch (error) {
+      console.error('Error cancelling fine-tuning:', error);
+    }
+  };
+
+  const progress = job ? job.progress : {};
+  const percent = progress.total_steps ? Math.round((100 * progress.step) / progress.total_steps) : 0;
+
   return (
     <Container maxWidth="xl" className="fine-tune-container">
       <h2>Fine-Tune Model</h2>
@@ -128,12 +169,23 @@ function FineTune() {
       <Container maxWidth="xl" className="fine-tuning-process-container">
         <Paper className="fine-tune-section">
           <h3>Fine-Tuning Process</h3>
-          {isLoading ? (
+          {job ? (
             <div className="fine-tuning-process">
-              <Typography>Fine-tuning in progress...</Typography>
+              <Typography>
+                {job.status === 'queued' ? 'Waiting for resources...' : `Fine-tuning ${job.status}`}
+                {progress.step ? ` · step ${progress.step} of ${progress.total_steps}` : ''}
+                {progress.loss !== undefined ? ` · loss ${progress.loss}` : ''}
+                {progress.tokens_per_second ? ` · ${progress.tokens_per_second} tokens/s` : ''}
+                {progress.eta_seconds !== undefined ? ` · ${Math.round(progress.eta_seconds)}s left` : ''}
+              </Typography>
               <div className="progress-bar">
-                <div className="progress" style={{ width: '50%' }}></div>
+                <div className="progress" style={{ width: `${percent}%` }}></div>
               </div>
+              {isLoading && (
+                <Button onClick={handleCancel} variant="outlined" color="secondary" style={{ marginTop: '10px' }}>
+                  Cancel
+                </Button>
+              )}
             </div>
           ) : (
             <Typography>
@@ -6,6 +6,7 @@ function LLMInteraction() {
   const [modelName, setModelName] = useState('');
   const [prompt, setPrompt] = useState('');
   const [response, setResponse] = useState('');
+  const [stats, setStats] = useState(null);
   const [availableModels, setAvailableModels] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [isInitializing, setIsInitializing] = useState(false);
@@ -39,27 +40,50 @@ function LLMInteraction() {
     }
   };
 
+  // The stream is server-sent events: `token` events carry text deltas, the
+  // final `stats` event the timing (time to first token, tokens/s) and an
+  // `error` event replaces it if generation fails.
+  const handleEvent = (rawEvent) => {
+    let event = 'message';
+    let data = '';
+    rawEvent.split('\n').forEach((line) => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    if (!data) return;
+    const payload = JSON.parse(data);
+    if (event === 'token') {
+      setResponse(prev => prev + payload.content);
+    } else if (event === 'stats') {
+      setStats(payload);
+    } else if (event === 'error') {
+      setResponse(prev => `${prev}\n[Error: ${payload.detail}]`);
+    }
+  };
+
   const generateText = async () => {
     setIsLoading(true);
     setResponse('');
+    setStats(null);
     try {
-      const response = await axios.post(
-        `http://localhost:8000/api/generate-text/${modelName}`,
-        { prompt },
-        { 
-          params: { stream: true },
-          responseType: 'stream'
-        }
-      );
+      const response = await fetch(`http://localhost:8000/api/generate-text/${modelName}?stream=true`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ prompt }),
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
-      const reader = response.data.getReader();
+      const reader = response.body.getReader();
       const decoder = new TextDecoder();
+      let buffer = '';
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
-        const chunk = decoder.decode(value);
-        setResponse(prev => prev + chunk);
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        events.forEach(handleEvent);
       }
     } catch (error) {
       console.error('Error generating text:', error);
@@ -125,6 +149,12 @@ function LLMInteraction() {
       >
         <Typography>{response}</Typography>
       </Paper>
+      {stats && (
+        <Typography variant="body2" style={{ marginTop: '10px' }}>
+          {stats.eval_count} tokens · first token after {stats.time_to_first_token}s · {stats.tokens_per_second} tokens/s
+          {stats.cached ? ' · cached' : ''}
+        </Typography>
+      )}
     </Paper>
   );
 }
@@ -33,6 +33,48 @@ import CheckCircleOutlineIcon from '@material-ui/icons/CheckCircleOutline';
 import { makeStyles } from '@material-ui/core/styles';
 import './UploadComponent.css';
 
+const API_URL = 'http://localhost:8000/api';
+// Files above this size use the resumable chunked upload protocol
+const RESUMABLE_THRESHOLD = 32 * 1024 * 1024;
+const RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
+
+const sha256Hex = async (file) => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+const uploadResumable = async (file, onProgress) => {
+  const sha256 = await sha256Hex(file);
+  const { data: session } = await axios.post(`${API_URL}/uploads/`, {
+    filename: file.name,
+    total_size: file.size,
+    sha256
+  });
+  let offset = session.offset;
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const chunk = file.slice(offset, offset + RESUMABLE_CHUNK_SIZE);
+      const { data } = await axios.put(`${API_URL}/uploads/${session.session_id}?offset=${offset}`, chunk, {
+        headers: { 'Content-Type': 'application/octet-stream' }
+      });
+      offset = data.offset;
+      retries = 0;
+      onProgress(offset);
+    } catch (error) {
+      if (++retries > MAX_CHUNK_RETRIES) {
+        throw error;
+      }
+      // Resume from whatever the server actually received
+      await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+      const { data } = await axios.get(`${API_URL}/uploads/${session.session_id}`);
+      offset = data.offset;
+    }
+  }
+  await axios.post(`${API_URL}/uploads/${session.session_id}/finalize`, { sha256 });
+};
+
 const useStyles = makeStyles((theme) => ({
   titleContainer: {
     display: 'flex',
@@ -118,15 +160,20 @@ function UploadComponent() {
     }
 
     for (const file of files) {
-      const formData = new FormData();
-      formData.append('file', file);
-
       try {
-        await axios.post('http://localhost:8000/api/upload/', formData, {
-          headers: {
-            'Content-Type': 'multipart/form-data'
-          }
-        });
+        if (file.size > RESUMABLE_THRESHOLD) {
+          await uploadResumable(file, (sent) => {
+            setMessage(`Uploading ${file.name}: ${Math.round((sent / file.size) * 100)}%`);
+          });
+        } else {
+          const formData = new FormData();
+          formData.append('file', file);
+          await axios.post('http://localhost:8000/api/upload/', formData, {
+            headers: {
+              'Content-Type': 'multipart/form-data'
+            }
+          });
+        }
       } catch (error) {
         console.error('Error uploading file:', error);
         setMessage(`Error uploading ${file.name}: ${error.response?.data?.detail || error.message}`);